@@ -0,0 +1,67 @@
+"""
+Memory and load-time benchmark of the columnar transaction store.
+
+Compares one million transactions kept as a list of dicts (the previous in-memory format)
+with a TransactionStore. Run from the repository root:
+
+    python benchmarks/columnar_memory.py --rows 1000000
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from storage.columnar import TransactionStore
+
+SYMBOLS = ['AAPL', 'MSFT', 'GOOG', 'AMZN', 'NVDA', 'META', 'TSLA', 'JPM', 'V', 'XOM']
+
+
+def make_transactions(rows):
+    started = datetime.datetime(2024, 1, 1, 9, 30)
+    return [{
+        'id': index + 1,
+        'symbol': SYMBOLS[index % len(SYMBOLS)],
+        'quantity': index % 100 + 1,
+        'price': 100.0 + (index % 5000) / 100,
+        'transaction_type': 'buy' if index % 3 else 'sell',
+        'timestamp': (started + datetime.timedelta(microseconds=index * 1234567)).isoformat()
+    } for index in range(rows)]
+
+
+def measure(build):
+    """Return what build() returns, the bytes it keeps allocated and the seconds it took."""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, allocated, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    contents = json.dumps(make_transactions(args.rows))
+    dicts, dict_bytes, dict_seconds = measure(lambda: json.loads(contents))
+    store, store_bytes, store_seconds = measure(lambda: TransactionStore(dicts, capacity=len(dicts)))
+    assert store[args.rows // 2] == dicts[args.rows // 2]
+
+    print(f"{args.rows:,} transactions")
+    print(f"  list of dicts:    {dict_bytes / 2**20:8.1f} MiB  {dict_bytes / args.rows:6.1f} bytes/row  parsed in {dict_seconds:.2f}s")
+    print(f"  TransactionStore: {store_bytes / 2**20:8.1f} MiB  {store_bytes / args.rows:6.1f} bytes/row  built in {store_seconds:.2f}s")
+    print(f"  {dict_bytes / store_bytes:.1f}x smaller")
+
+
+if __name__ == '__main__':
+    main()
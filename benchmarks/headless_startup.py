@@ -0,0 +1,82 @@
+"""
+Startup time and per-call latency of the headless CLI and RPC server.
+
+Compares starting a process for one CLI command with starting one that imports the
+interface module (gradio, pandas and the data views; without gradio installed, the rest of
+its imports), and one trade made in process, through a CLI process, over RPC one call at a
+time and over RPC streamed. Run from the repository root:
+
+    python benchmarks/headless_startup.py --runs 10 --trades 2000
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+
+from rpc_server import RpcClient, start_rpc_server
+from trading_database import TradingDatabase
+
+INTERFACE_IMPORT = ("import sys; sys.path.insert(0, sys.argv[1])\n"
+                    "try:\n    import gradio\nexcept ImportError:\n    pass\n"
+                    "import pandas, data_views, trading_database")
+
+
+def process_seconds(argv, runs):
+    """Median wall time of running a Python process to completion."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *argv], check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def per_call(function, calls):
+    started = time.perf_counter()
+    function()
+    return (time.perf_counter() - started) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10, help='Process starts to time.')
+    parser.add_argument('--trades', type=int, default=2000, help='Trades per in-process and RPC measurement.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        cli = [os.path.join(SRC, 'cli.py'), '--data-dir', data_dir, '--journal']
+        subprocess.run([sys.executable, *cli, 'balance', 'add', '1000000000'], check=True, stdout=subprocess.DEVNULL)
+        cli_start = process_seconds(cli + ['balance'], args.runs)
+        ui_start = process_seconds(['-c', INTERFACE_IMPORT, SRC], args.runs)
+        cli_trade = process_seconds(cli + ['trade', 'buy', 'AAPL', '1', '100'], args.runs)
+
+        database = TradingDatabase(in_memory=True)
+        database.add_account_balance(1e12)
+        in_process = per_call(lambda: [database.add_transaction('AAPL', 1, 100.0, 'buy') for _ in range(args.trades)], args.trades)
+        server = start_rpc_server(database, port=0)
+        with RpcClient(port=server.server_address[1]) as client:
+            rpc_call = per_call(lambda: [client.call('add_transaction', 'AAPL', 1, 100.0, 'buy') for _ in range(args.trades)], args.trades)
+            rpc_stream = per_call(lambda: client.call_many([('add_transaction', ['AAPL', 1, 100.0, 'buy'])] * args.trades), args.trades)
+        server.shutdown()
+        server.server_close()
+
+    gradio = subprocess.run([sys.executable, '-c', 'import gradio'], capture_output=True).returncode == 0
+    print("Process startup (median)")
+    print(f"  CLI command:            {cli_start * 1e3:8.1f} ms")
+    print(f"  interface imports:      {ui_start * 1e3:8.1f} ms{'' if gradio else '  (gradio not installed, so not included)'}")
+    print(f"  {ui_start / cli_start:.1f}x faster to start")
+    print("Per trade")
+    print(f"  in process:             {in_process * 1e6:8.1f} us")
+    print(f"  RPC, one call at a time:{rpc_call * 1e6:8.1f} us")
+    print(f"  RPC, streamed:          {rpc_stream * 1e6:8.1f} us")
+    print(f"  CLI process per trade:  {cli_trade * 1e3:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+Performance benchmark suite for the database, the UI data paths and the bot pipeline.
+
+Every benchmark runs at each requested scale (number of stored transactions and history
+entries). Results are written as JSON and compared against a stored baseline; a benchmark
+that got slower than the baseline by more than the threshold is flagged as a regression
+and makes the run exit with status 1. Run from the repository root:
+
+    python benchmarks/suite.py --scales 1k 100k 1M --baseline benchmarks/baseline.json
+    python benchmarks/suite.py --scales 1k 100k --save-baseline benchmarks/baseline.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from bot.abstract_bot import TrackingTradingBot
+from data_views import TransactionsView
+from metrics import MetricsRegistry
+from net_worth import net_worth_series
+from storage.binary_snapshot import convert_json_files
+from storage.delta_history import HistoryEncoder
+from trading_database import TradingDatabase
+
+SCALES = {'1k': 1_000, '100k': 100_000, '1M': 1_000_000}
+SYMBOLS = [f'SYM{index}' for index in range(50)]
+DEFAULT_THRESHOLD = 0.2
+MIN_DIFFERENCE = 1e-4
+
+
+def populate(directory, rows):
+    """Write database files holding `rows` transactions and history entries; returns the TradingDatabase file arguments."""
+    files = {
+        'transactions_file': os.path.join(directory, 'transactions.json'),
+        'owned_stocks_file': os.path.join(directory, 'owned_stocks.json'),
+        'owned_stocks_history_file': os.path.join(directory, 'owned_stocks_history.json'),
+        'account_balance_file': os.path.join(directory, 'account_balance.json'),
+    }
+    started = datetime.datetime(2024, 1, 1, 9, 30)
+    encoder = HistoryEncoder(100)
+    transactions, history, owned_stocks = [], [], {}
+    balance = 1e12
+    for index in range(rows):
+        symbol = SYMBOLS[index % len(SYMBOLS)]
+        timestamp = (started + datetime.timedelta(seconds=index)).isoformat()
+        price = 100.0 + index % 97
+        transactions.append({'id': index + 1, 'symbol': symbol, 'quantity': 1, 'price': price,
+                             'transaction_type': 'buy', 'timestamp': timestamp})
+        position = owned_stocks.get(symbol)
+        quantity = position['quantity'] + 1 if position else 1
+        average = ((position['purchase_price'] * position['quantity'] if position else 0) + price) / quantity
+        owned_stocks = {**owned_stocks, symbol: {'quantity': quantity, 'purchase_price': average}}
+        balance -= price
+        history.append(encoder.encode(timestamp, owned_stocks, balance, {symbol}))
+    for name, contents in (
+        ('transactions_file', {'transaction_id_counter': rows + 1, 'transactions': transactions}),
+        ('owned_stocks_file', owned_stocks),
+        ('owned_stocks_history_file', history),
+        ('account_balance_file', {'account_balance': balance}),
+    ):
+        with open(files[name], 'w') as file:
+            json.dump(contents, file)
+    return files
+
+
+def repeat(function, budget=2.0, min_runs=1):
+    """Call function until it ran min_runs times and budget seconds passed; returns the mean seconds per call."""
+    runs, elapsed = 0, 0.0
+    while runs < min_runs or elapsed < budget:
+        started = time.perf_counter()
+        function()
+        elapsed += time.perf_counter() - started
+        runs += 1
+    return {'seconds': elapsed / runs, 'ops_per_sec': runs / elapsed, 'runs': runs}
+
+
+class MockTrackingBot(TrackingTradingBot):
+    """A bot whose fetcher returns canned data, so only the pipeline itself is measured."""
+
+    data = {'prices': [100.0 + index % 7 for index in range(50)], 'news': []}
+
+    def fetch_current_data(self, symbol):
+        return {'symbol': symbol, **self.data}
+
+    def analyze_stock_performance(self, data):
+        prices = data['prices']
+        return {'symbol': data['symbol'], 'momentum': prices[-1] / prices[0] - 1}
+
+    def make_tracking_decision(self, analysis_results):
+        return 'buy more' if analysis_results['momentum'] > 0 else 'hold'
+
+    def execute_trade(self, decision):
+        return decision
+
+
+def run_scale(rows, budget=2.0):
+    """Run every benchmark on a database with `rows` records; returns {benchmark: timing}."""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        files = populate(directory, rows)
+        journal_files = {**files, 'journal_file': os.path.join(directory, 'journal.jsonl'),
+                         'snapshot_file': os.path.join(directory, 'snapshot.json')}
+
+        results['cold_start'] = repeat(lambda: TradingDatabase(verbose=False, **files).close(), budget)
+        database = TradingDatabase(verbose=False, **files)
+        results['add_transaction'] = repeat(lambda: database.add_transaction('SYM1', 1, 100.0, 'buy'), budget)
+        database.close()
+
+        results['cold_start_journal'] = repeat(lambda: TradingDatabase(use_journal=True, verbose=False, **journal_files).close(), budget)
+        database = TradingDatabase(use_journal=True, verbose=False, **journal_files)
+        results['add_transaction_journal'] = repeat(lambda: database.add_transaction('SYM1', 1, 100.0, 'buy'), budget)
+        database.close()
+
+        binary_files = {**files, 'journal_file': os.path.join(directory, 'binary_journal.jsonl'),
+                        'snapshot_file': os.path.join(directory, 'snapshot.bin')}
+        convert_json_files(directory, binary_files['snapshot_file'])
+        results['cold_start_binary'] = repeat(
+            lambda: TradingDatabase(use_journal=True, snapshot_format='binary', verbose=False, **binary_files).close(), budget)
+
+        database = TradingDatabase(verbose=False, **files)
+        # The TransactionsView behind interface.view_data (importing the interface would open the real data/
+        # directory); the first page builds the cached DataFrame, later pages only slice it
+        results['view_data_first_page'] = repeat(lambda: TransactionsView(database).page(), budget)
+        view = TransactionsView(database)
+        view.page()
+        results['view_data_next_page'] = repeat(lambda: view.page(page=2), budget)
+
+        prices = {symbol: 150.0 for symbol in SYMBOLS}
+        results['calculate_net_worth'] = repeat(lambda: database.calculate_net_worth(prices), budget)
+        database.close()
+
+    results['net_worth_series'] = net_worth_series_per_price(rows, budget)
+
+    bot = MockTrackingBot({}, None)
+    symbols = [SYMBOLS[index % len(SYMBOLS)] for index in range(rows)]
+    # With the default registry recording the stage latencies, then with metrics disabled
+    for name, metrics in (('run_tracking_analysis', bot.metrics), ('run_tracking_analysis_metrics_disabled', MetricsRegistry(enabled=False))):
+        bot.metrics = metrics
+        tracking = repeat(lambda: [bot.run_tracking_analysis(symbol) for symbol in symbols], budget)
+        results[name] = {**tracking, 'seconds': tracking['seconds'] / rows, 'ops_per_sec': tracking['ops_per_sec'] * rows}
+    return results
+
+
+def net_worth_series_per_price(rows, budget=2.0, symbols=500):
+    """
+    Time net_worth_series() over 5-minute bars of 500 symbols, with a history entry per day.
+
+    The bars are capped at 10,000 (about 40 MB of prices); the timing is per price.
+    """
+    rng = np.random.default_rng(0)
+    names = [f'SYM{index}' for index in range(symbols)]
+    timestamps = np.datetime64('2024-01-01') + np.arange(min(rows, 10_000)) * np.timedelta64(5, 'm')
+    prices = rng.uniform(10, 500, size=(len(timestamps), symbols))
+    history = [{
+        'timestamp': str(timestamp), 'account_balance': 1000.0 + day,
+        'owned_stocks': {symbol: {'quantity': day % 7 + 1, 'purchase_price': 1.0} for symbol in rng.choice(names, 50, replace=False)}
+    } for day, timestamp in enumerate(timestamps[::288])]
+    timing = repeat(lambda: net_worth_series(history, timestamps, names, prices), budget)
+    return {**timing, 'seconds': timing['seconds'] / prices.size, 'ops_per_sec': timing['ops_per_sec'] * prices.size}
+
+
+def run_suite(scales, budget=2.0):
+    """Run the benchmarks at each scale; returns the results document."""
+    return {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': {name: run_scale(rows, budget) for name, rows in scales.items()},
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, min_difference=MIN_DIFFERENCE):
+    """
+    Compare results against a baseline.
+
+    A benchmark regressed if it is more than `threshold` (relative) and `min_difference`
+    seconds (absolute, to ignore timer noise on very fast operations) slower than the baseline.
+
+    :return: A list of regressions, each a dict with the scale, benchmark, both timings and the slowdown ratio.
+    """
+    regressions = []
+    for scale, benchmarks in results['results'].items():
+        for name, timing in benchmarks.items():
+            reference = baseline.get('results', {}).get(scale, {}).get(name)
+            if not reference or not reference.get('seconds'):
+                continue
+            ratio = timing['seconds'] / reference['seconds']
+            if ratio > 1 + threshold and timing['seconds'] - reference['seconds'] > min_difference:
+                regressions.append({'scale': scale, 'benchmark': name, 'seconds': timing['seconds'],
+                                    'baseline_seconds': reference['seconds'], 'ratio': ratio})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', nargs='+', default=list(SCALES), choices=list(SCALES))
+    parser.add_argument('--budget', type=float, default=2.0, help='Seconds to spend repeating each fast benchmark')
+    parser.add_argument('--output', default=os.path.join('benchmarks', 'results', 'latest.json'))
+    parser.add_argument('--baseline', help='Baseline results to compare against')
+    parser.add_argument('--save-baseline', help='Also write the results to this baseline file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Allowed slowdown before flagging, e.g. 0.2 for 20%%')
+    args = parser.parse_args(argv)
+
+    results = run_suite({name: SCALES[name] for name in args.scales}, args.budget)
+    for path in filter(None, (args.output, args.save_baseline)):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump(results, file, indent=4)
+
+    for scale, benchmarks in results['results'].items():
+        for name, timing in benchmarks.items():
+            print(f"{scale:>5} {name:<26} {timing['seconds'] * 1000:12.3f} ms  {timing['ops_per_sec']:14,.1f} ops/s")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['scale']} {regression['benchmark']}: "
+                  f"{regression['baseline_seconds'] * 1000:.3f} ms -> {regression['seconds'] * 1000:.3f} ms ({regression['ratio']:.2f}x)")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .bot.abstract_bot import TrackingTradingBot
+    from .decision_maker.base_decision_maker import BaseDecisionMaker
+    from .trading_database import TradingDatabase
+except ImportError:
+    from bot.abstract_bot import TrackingTradingBot
+    from decision_maker.base_decision_maker import BaseDecisionMaker
+    from trading_database import TradingDatabase
+
+
+def _decide(strategy, symbol, data):
+    """Ask a decision maker, a tracking bot or a plain function for a decision on one bar."""
+    if isinstance(strategy, BaseDecisionMaker):
+        stock_price_history = data['stock_price_history']
+        if strategy.indicator_factories:
+            stock_price_history = {**stock_price_history, 'indicators': strategy.update_indicators(symbol, data['bar'])}
+        metrics = strategy.analyze_financial_data(symbol, data['income_statement'], data['balance_sheet'], stock_price_history)
+        news_analysis = strategy.analyze_news(symbol, data['recent_news'])
+        return strategy.generate_recommendations(symbol, metrics, news_analysis)
+    if isinstance(strategy, TrackingTradingBot):
+        return strategy.make_tracking_decision(strategy.analyze_stock_performance(data))
+    return strategy(symbol, data)
+
+
+def parse_decision(decision, default_quantity):
+    """
+    Turn a decision into an order.
+
+    :param decision: 'buy', 'buy more', 'sell' or 'hold', or a dict with an 'action' (or
+        'recommendation') and optionally a 'quantity'.
+    :return: (transaction_type, quantity), or None to do nothing.
+    """
+    quantity = default_quantity
+    if isinstance(decision, dict):
+        quantity = decision.get('quantity', default_quantity)
+        decision = decision.get('action', decision.get('recommendation'))
+    action = str(decision or 'hold').strip().lower()
+    if action in ('buy', 'buy more'):
+        return 'buy', quantity
+    if action == 'sell':
+        return 'sell', quantity
+    return None
+
+
+class Backtest:
+    """
+    Replays historical bars through a strategy against an in-memory TradingDatabase.
+
+    The strategy is a BaseDecisionMaker, a TrackingTradingBot or a function taking
+    (symbol, data). For every bar and symbol it gets the data a live run would see: the
+    price history up to that bar (at most `lookback` bars) and any fundamentals given. Its
+    decision is executed at the bar's closing price, timestamped with the bar's time. A
+    BaseDecisionMaker with indicator_factories gets its streaming indicator values as
+    stock_price_history['indicators']. Nothing is written to disk.
+    """
+
+    def __init__(self, strategy, prices, volumes=None, initial_balance=100000.0, trade_quantity=1,
+                 lookback=200, fundamentals=None):
+        """
+        :param strategy: The decision maker, bot or function to test.
+        :param prices: A DataFrame of closing prices with a timestamp index and one column per symbol (NaN where there is no bar).
+        :param volumes: An optional DataFrame of volumes shaped like prices.
+        :param initial_balance: The starting account balance.
+        :param trade_quantity: Quantity traded when a decision does not give one.
+        :param lookback: Maximum number of past bars handed to the strategy.
+        :param fundamentals: Optional {symbol: {'income_statement': ..., 'balance_sheet': ..., 'recent_news': ...}}.
+        """
+        self.strategy = strategy
+        self.prices = prices.sort_index()
+        self.volumes = volumes.reindex_like(self.prices) if volumes is not None else None
+        self.initial_balance = initial_balance
+        self.trade_quantity = trade_quantity
+        self.lookback = lookback
+        self.fundamentals = fundamentals or {}
+
+    def run(self):
+        """
+        Run the backtest.
+
+        :return: A dictionary with the 'equity_curve' (a Series of net worth per bar), the
+            'trades' log, the number of 'rejected_orders' and summary statistics.
+        """
+        timestamps = self.prices.index
+        symbols = list(self.prices.columns)
+        closes = self.prices.to_numpy(dtype=np.float64)
+        volumes = self.volumes.to_numpy(dtype=np.float64) if self.volumes is not None else None
+        current_time = [timestamps[0].to_pydatetime()]
+        database = TradingDatabase(in_memory=True, clock=lambda: current_time[0])
+        if isinstance(self.strategy, TrackingTradingBot):
+            self.strategy.database = database
+        database.add_account_balance(self.initial_balance)
+        database.record_owned_stocks_history()
+
+        rejected = 0
+        for row, timestamp in enumerate(timestamps):
+            current_time[0] = timestamp.to_pydatetime()
+            start = max(row + 1 - self.lookback, 0)
+            for column, symbol in enumerate(symbols):
+                price = closes[row, column]
+                if np.isnan(price):
+                    continue
+                history = closes[start:row + 1, column]
+                history = history[~np.isnan(history)]
+                order = parse_decision(_decide(self.strategy, symbol, self._bar_data(symbol, timestamp, price, history, volumes, row, column)),
+                                       self.trade_quantity)
+                if order is None:
+                    continue
+                transaction_type, quantity = order
+                if transaction_type == 'sell':
+                    quantity = min(quantity, database.owned_stocks.get(symbol, {}).get('quantity', 0))
+                try:
+                    if quantity > 0:
+                        database.add_transaction(symbol, quantity, float(price), transaction_type)
+                except ValueError:
+                    rejected += 1  # E.g. not enough money left
+
+        equity = pd.Series(database.calculate_net_worth_series(timestamps.to_numpy(), symbols, closes), index=timestamps)
+        result = {
+            'equity_curve': equity,
+            'trades': database.list_transactions(),
+            'rejected_orders': rejected,
+        }
+        result.update(summarize(equity, self.initial_balance, len(result['trades'])))
+        database.close()
+        return result
+
+    def _bar_data(self, symbol, timestamp, price, history, volumes, row, column):
+        fundamentals = self.fundamentals.get(symbol, {})
+        bar = {'timestamp': timestamp.isoformat(), 'close': float(price)}
+        if volumes is not None:
+            bar['volume'] = float(volumes[row, column])
+        return {
+            'symbol': symbol,
+            'bar': bar,
+            'current_price': float(price),
+            'stock_price_history': {'current_price': float(price), 'prices': history},
+            'income_statement': fundamentals.get('income_statement', {}),
+            'balance_sheet': fundamentals.get('balance_sheet', {}),
+            'recent_news': fundamentals.get('recent_news', []),
+        }
+
+
+def summarize(equity, initial_balance, trade_count):
+    """Summary statistics of an equity curve."""
+    values = equity.to_numpy(dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {'final_net_worth': initial_balance, 'total_return': 0.0, 'max_drawdown': 0.0, 'trade_count': trade_count}
+    peaks = np.maximum.accumulate(values)
+    return {
+        'final_net_worth': float(values[-1]),
+        'total_return': float(values[-1] / initial_balance - 1),
+        'max_drawdown': float(np.max((peaks - values) / peaks)),
+        'trade_count': trade_count,
+    }
+
+
+def _run_sweep_point(strategy_factory, params, prices, backtest_options):
+    result = Backtest(strategy_factory(**params), prices, **backtest_options).run()
+    return {key: value for key, value in result.items() if key not in ('equity_curve', 'trades')}
+
+
+def run_parameter_sweep(strategy_factory, parameter_grid, prices, processes=None, **backtest_options):
+    """
+    Backtest a strategy for every combination of parameters, across a process pool.
+
+    :param strategy_factory: A picklable callable (e.g. a module-level class) creating the strategy from keyword parameters.
+    :param parameter_grid: Parameter names mapped to the values to try.
+    :param prices: The closing prices, as for Backtest.
+    :param processes: Number of worker processes (the CPU count by default); 1 runs in this process.
+    :param backtest_options: Further Backtest arguments, such as initial_balance.
+    :return: A list of {'params': ..., **summary} dictionaries, best total return first.
+    """
+    names = list(parameter_grid)
+    combinations = [dict(zip(names, values)) for values in itertools.product(*(parameter_grid[name] for name in names))]
+    if processes == 1:
+        summaries = [_run_sweep_point(strategy_factory, params, prices, backtest_options) for params in combinations]
+    else:
+        with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+            futures = [pool.submit(_run_sweep_point, strategy_factory, params, prices, backtest_options) for params in combinations]
+            summaries = [future.result() for future in futures]
+    results = [{'params': params, **summary} for params, summary in zip(combinations, summaries)]
+    return sorted(results, key=lambda result: result['total_return'], reverse=True)
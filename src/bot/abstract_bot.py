@@ -1,7 +1,34 @@
+import queue
+import threading
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    from ..decision_maker.news_processor import NewsProcessor
+    from ..metrics import REGISTRY
+except ImportError:
+    from decision_maker.news_processor import NewsProcessor
+    from metrics import REGISTRY
+
+_news_processor_lock = threading.Lock()
+STAGES = ('fetch', 'analyze', 'decide', 'execute')
+
+
+def _timed_call(function, *args):
+    """Call a function and also return how long it took (runs in pool workers)."""
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
 
 class TrackingTradingBot(ABC):
 
+    # Stage latencies are recorded here; assign another MetricsRegistry to a bot to keep them apart
+    metrics = REGISTRY
+    # A BaseDecisionMaker whose analyze_article() scores the fetched news, once per unique article
+    decision_maker = None
+
     def __init__(self, api_keys: dict, database):
         """
         Initialize the tracking trading bot with API keys and a trading database.
@@ -12,6 +39,40 @@ class TrackingTradingBot(ABC):
         self.api_keys = api_keys
         self.database = database
 
+    def __getstate__(self):
+        # Bots are pickled to run analysis in worker processes, which never touch the database
+        state = self.__dict__.copy()
+        state['database'] = None
+        state.pop('_stage_series_cache', None)  # Holds locks
+        state.pop('_news_processor', None)  # Likewise; news is scored in the fetch stage
+        return state
+
+    @property
+    def news_processor(self):
+        """The NewsProcessor built from decision_maker.analyze_article on first use, or None without a decision maker."""
+        processor = self.__dict__.get('_news_processor')
+        if processor is None and self.decision_maker is not None:
+            with _news_processor_lock:  # Fetch threads must share one seen-index
+                processor = self.__dict__.get('_news_processor')
+                if processor is None:
+                    processor = self._news_processor = NewsProcessor(self.decision_maker.analyze_article)
+        return processor
+
+    def fetch_with_news(self, symbol: str):
+        """
+        Fetch the data of a symbol and score its news.
+
+        With a decision maker, the articles in the fetched data's 'news' go through the news
+        processor, so an article fetched for several symbols is analyzed once, and the
+        symbol's sentiment aggregate is added to the data as 'news_sentiment'.
+        """
+        data = self.fetch_current_data(symbol)
+        if self.decision_maker is None or not isinstance(data, dict):
+            return data
+        processor = self.news_processor
+        processor.process({symbol: data.get('news') or []})
+        return {**data, 'news_sentiment': processor.sentiment(symbol)}
+
     @abstractmethod
     def fetch_current_data(self, symbol: str):
         """
@@ -27,7 +88,8 @@ class TrackingTradingBot(ABC):
         """
         Analyze the performance of the stock based on the latest data.
         
-        :param data: A dictionary containing the latest financial data and news.
+        :param data: A dictionary containing the latest financial data and news, and the
+            'news_sentiment' aggregate when the bot has a decision maker.
         :return: Analysis results indicating stock performance.
         """
         pass
@@ -59,8 +121,111 @@ class TrackingTradingBot(ABC):
         :param symbol: The stock symbol to track and analyze.
         :return: The result of the trade execution.
         """
-        data = self.fetch_current_data(symbol)
+        started = time.perf_counter()
+        data = self.fetch_with_news(symbol)
+        fetched = time.perf_counter()
         analysis_results = self.analyze_stock_performance(data)
+        analyzed = time.perf_counter()
         decision = self.make_tracking_decision(analysis_results)
+        decided = time.perf_counter()
         result = self.execute_trade(decision)
+        executed = time.perf_counter()
+
+        if self.metrics.enabled:
+            self._stage_series().observe(fetched - started, analyzed - fetched, decided - analyzed, executed - decided)
         return result
+
+    def _stage_seconds(self):
+        return self.metrics.histogram('tradingbot_bot_stage_seconds', 'Time spent in each TrackingTradingBot stage')
+
+    def _stage_series(self):
+        """The fetch, analyze, decide and execute latency series as a group, looked up once per metrics registry."""
+        cached = self.__dict__.get('_stage_series_cache')
+        if cached is None or cached[0] is not self.metrics:
+            cached = self._stage_series_cache = (self.metrics, self._stage_seconds().group('stage', STAGES))
+        return cached[1]
+
+    def run_portfolio_analysis(self, symbols, fetch_workers=16, analysis_workers=None, queue_size=64, use_processes=True):
+        """
+        Run the tracking analysis for many symbols as a pipeline.
+
+        Fetching runs on a thread pool, analysis on a process pool (the bot is pickled
+        without its database), and decisions and trades run one at a time on the calling
+        thread, so the database only ever sees serialized trades. Bounded queues between
+        the stages keep a fast stage from running far ahead of a slow one.
+
+        :param symbols: The stock symbols to track and analyze.
+        :param fetch_workers: Number of threads fetching data concurrently.
+        :param analysis_workers: Number of analysis processes (the CPU count by default).
+        :param queue_size: Maximum number of items waiting between two stages.
+        :param use_processes: Analyze on a thread pool instead, e.g. if the analysis cannot be pickled.
+        :return: A dictionary with the trade 'results' and the 'errors' keyed by symbol, and per-stage 'timings'.
+        """
+        symbols = list(symbols)
+        timings = {stage: {'calls': 0, 'busy_seconds': 0.0} for stage in STAGES}
+        timings_lock = threading.Lock()
+        stage_series = dict(zip(STAGES, self._stage_series().children)) if self.metrics.enabled else {}
+        stage_errors = self.metrics.counter('tradingbot_bot_stage_errors_total', 'Symbols dropped from a pipeline run, by failing stage')
+
+        def record(stage, elapsed):
+            if stage in stage_series:
+                stage_series[stage].observe(elapsed)
+            with timings_lock:
+                timings[stage]['calls'] += 1
+                timings[stage]['busy_seconds'] += elapsed
+
+        fetched = queue.Queue(maxsize=queue_size)  # (symbol, data, error)
+        analyzing = queue.Queue(maxsize=queue_size)  # (symbol, Future of (analysis, seconds), stage it may fail in)
+
+        def fetch(symbol):
+            try:
+                data, elapsed = _timed_call(self.fetch_with_news, symbol)
+                record('fetch', elapsed)
+                fetched.put((symbol, data, None))
+            except Exception as error:
+                fetched.put((symbol, None, error))
+
+        def dispatch_analysis(analysis_pool):
+            for _ in symbols:
+                symbol, data, error = fetched.get()
+                stage = 'fetch' if error is not None else 'analyze'
+                if error is None:
+                    try:
+                        future = analysis_pool.submit(_timed_call, self.analyze_stock_performance, data)
+                    except Exception as submit_error:
+                        # E.g. BrokenProcessPool; the symbol fails instead of the dispatcher, which the loop below waits on
+                        error = submit_error
+                if error is not None:
+                    future = Future()
+                    future.set_exception(error)
+                analyzing.put((symbol, future, stage))
+
+        results, errors = {}, {}
+        started = time.perf_counter()
+        analysis_pool_type = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool, \
+                analysis_pool_type(max_workers=analysis_workers) as analysis_pool:
+            for symbol in symbols:
+                fetch_pool.submit(fetch, symbol)
+            dispatcher = threading.Thread(target=dispatch_analysis, args=(analysis_pool,), daemon=True)
+            dispatcher.start()
+
+            for _ in symbols:
+                symbol, future, stage = analyzing.get()
+                try:
+                    analysis_results, elapsed = future.result()
+                    record('analyze', elapsed)
+                    stage = 'decide'
+                    decision, elapsed = _timed_call(self.make_tracking_decision, analysis_results)
+                    record('decide', elapsed)
+                    stage = 'execute'
+                    results[symbol], elapsed = _timed_call(self.execute_trade, decision)
+                    record('execute', elapsed)
+                except Exception as error:
+                    stage_errors.inc(stage=stage)
+                    errors[symbol] = error
+            dispatcher.join()
+
+        for stage_timings in timings.values():
+            stage_timings['mean_seconds'] = stage_timings['busy_seconds'] / stage_timings['calls'] if stage_timings['calls'] else 0.0
+        return {'results': results, 'errors': errors, 'timings': {**timings, 'total_seconds': time.perf_counter() - started}}
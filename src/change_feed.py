@@ -0,0 +1,113 @@
+import threading
+from collections import namedtuple
+
+# seq numbers events 1, 2, ... in publish order; type is 'trade', 'balance', 'history' or 'clear'
+ChangeEvent = namedtuple('ChangeEvent', ['seq', 'type', 'data'])
+
+DEFAULT_BUFFER_SIZE = 10000
+
+
+class EventsLost(Exception):
+    """Raised when a subscriber asks for events that already dropped out of the feed's buffer."""
+
+    def __init__(self, after_seq, first_seq):
+        super().__init__(f"Events after {after_seq} are gone; the oldest buffered event is {first_seq}. Reload and resubscribe.")
+        self.after_seq = after_seq
+        self.first_seq = first_seq
+
+
+class ChangeFeed:
+    """
+    Publish/subscribe feed of database changes.
+
+    Events are kept in a fixed-size ring buffer shared by all subscribers, so publishing
+    is O(1) however many subscribers there are and memory stays bounded. Each subscriber
+    only keeps the sequence number it has read up to, which also lets a consumer resume
+    from a known position. A subscriber that falls more than buffer_size events behind gets
+    EventsLost and has to reload the state it tracks.
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE):
+        if buffer_size < 1:
+            raise ValueError("Buffer size must be at least 1.")
+        self.buffer_size = buffer_size
+        self.buffer = [None] * buffer_size
+        self.last_seq = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def publish(self, type, **data):
+        """Append an event and wake the waiting subscribers; returns the event."""
+        with self.condition:
+            self.last_seq += 1
+            event = ChangeEvent(self.last_seq, type, data)
+            self.buffer[self.last_seq % self.buffer_size] = event
+            self.condition.notify_all()
+        return event
+
+    @property
+    def first_seq(self):
+        """The oldest sequence number still buffered."""
+        return max(self.last_seq - self.buffer_size + 1, 1)
+
+    def events_after(self, seq, limit=None):
+        """
+        Return the buffered events with a sequence number above seq, oldest first.
+
+        :raises EventsLost: If events after seq were already overwritten.
+        """
+        with self.condition:
+            if seq < self.first_seq - 1:
+                raise EventsLost(seq, self.first_seq)
+            last = self.last_seq if limit is None else min(self.last_seq, seq + limit)
+            return [self.buffer[position % self.buffer_size] for position in range(seq + 1, last + 1)]
+
+    def subscribe(self, after_seq=None):
+        """
+        Start reading events.
+
+        :param after_seq: Resume after this sequence number; by default only events published from now on are read.
+        """
+        with self.condition:
+            return Subscription(self, self.last_seq if after_seq is None else after_seq)
+
+    def close(self):
+        """Wake all subscribers and end their iteration."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class Subscription:
+    """A reader's position in a ChangeFeed."""
+
+    def __init__(self, feed, after_seq):
+        self.feed = feed
+        self.seq = after_seq  # Last sequence number read
+        self.closed = False
+
+    def poll(self, limit=None):
+        """Return the events published since the last read, without waiting."""
+        events = self.feed.events_after(self.seq, limit)
+        if events:
+            self.seq = events[-1].seq
+        return events
+
+    def get(self, timeout=None, limit=None):
+        """Wait up to timeout seconds for new events and return them ([] on timeout or when closed)."""
+        feed = self.feed
+        with feed.condition:
+            feed.condition.wait_for(lambda: self.closed or feed.closed or feed.last_seq > self.seq, timeout)
+        return [] if self.closed else self.poll(limit)
+
+    def __iter__(self):
+        """Yield events as they are published, until the subscription or the feed is closed."""
+        while not self.closed and not self.feed.closed:
+            yield from self.get()
+        if not self.closed:
+            yield from self.poll()  # Whatever was published before the feed closed
+
+    def close(self):
+        self.closed = True
+        with self.feed.condition:
+            self.feed.condition.notify_all()
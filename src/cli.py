@@ -0,0 +1,187 @@
+"""
+Headless command line for the trading database.
+
+Starts without gradio or pandas: only trading_database is imported, and only once a
+command needs it. Run from the repository root:
+
+    python src/cli.py balance add 10000
+    python src/cli.py trade buy AAPL 10 150.25
+    python src/cli.py list transactions --symbol AAPL --limit 20
+    python src/cli.py export history --output history.csv
+    python src/cli.py serve --port 9200
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+EXPORT_FIELDS = {
+    'transactions': ['id', 'symbol', 'quantity', 'price', 'transaction_type', 'timestamp'],
+    'owned': ['symbol', 'quantity', 'purchase_price'],
+    'history': ['timestamp', 'account_balance', 'owned_stocks'],
+}
+
+
+def _number(text):
+    """Parse a quantity or amount; whole numbers stay ints."""
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def open_database(args):
+    """Create the TradingDatabase for a command, importing it on first use."""
+    try:
+        from .trading_database import TradingDatabase
+    except ImportError:
+        from trading_database import TradingDatabase
+    files = {}
+    if args.data_dir:
+        # Absolute paths take precedence over the database's default data directory
+        data_dir = os.path.abspath(args.data_dir)
+        os.makedirs(data_dir, exist_ok=True)
+        files = {name: os.path.join(data_dir, filename) for name, filename in (
+            ('transactions_file', 'transactions.json'), ('owned_stocks_file', 'owned_stocks.json'),
+            ('owned_stocks_history_file', 'owned_stocks_history.json'), ('account_balance_file', 'account_balance.json'),
+            ('journal_file', 'journal.jsonl'))}
+        files['snapshot_file'] = os.path.join(data_dir, 'snapshot.bin' if args.snapshot_format == 'binary' else 'snapshot.json')
+    return TradingDatabase(use_journal=args.journal, snapshot_format=args.snapshot_format, verbose=False, **files)
+
+
+def _rows(database, what, args):
+    """The rows of a table as dictionaries with the EXPORT_FIELDS keys."""
+    if what == 'transactions':
+        return (dict(row) for row in database.query_transactions(symbol=args.symbol, start=args.start, end=args.end, limit=args.limit))
+    if what == 'owned':
+        owned = database.list_owned_stocks()
+        return ({'symbol': symbol, **stock} for symbol, stock in sorted(owned.items())
+                if not args.symbol or symbol == args.symbol)
+    entries = database.query_owned_stocks_history(start=args.start, end=args.end, limit=args.limit)
+    return (entry for entry in entries if not args.symbol or args.symbol in entry['owned_stocks'])
+
+
+def _print_table(rows, fields, output):
+    rows = [[json.dumps(row[field]) if isinstance(row[field], dict) else str(row[field]) for field in fields] for row in rows]
+    widths = [max([len(field)] + [len(row[index]) for row in rows]) for index, field in enumerate(fields)]
+    output.write('  '.join(field.ljust(width) for field, width in zip(fields, widths)).rstrip() + '\n')
+    for row in rows:
+        output.write('  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip() + '\n')
+
+
+def _write_rows(rows, fields, output, output_format):
+    if output_format == 'json':
+        for row in rows:
+            output.write(json.dumps({field: row[field] for field in fields}) + '\n')
+    elif output_format == 'csv':
+        writer = csv.DictWriter(output, fieldnames=fields, extrasaction='ignore', lineterminator='\n')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({field: json.dumps(row[field]) if isinstance(row[field], dict) else row[field] for field in fields})
+    else:
+        _print_table(rows, fields, output)
+
+
+def command_trade(database, args):
+    transaction_id = database.add_transaction(args.symbol, args.quantity, args.price, args.side)
+    print(f"Transaction {transaction_id}: {args.side} {args.quantity} {args.symbol} at {args.price}. "
+          f"Balance: {database.get_account_balance():.2f}")
+
+
+def command_balance(database, args):
+    if args.action == 'add':
+        database.add_account_balance(args.amount)
+    elif args.action == 'remove':
+        database.remove_account_balance(args.amount)
+    elif args.action == 'reset':
+        database.reset_account_balance()
+    print(f"{database.get_account_balance():.2f}")
+
+
+def command_list(database, args):
+    _write_rows(_rows(database, args.what, args), EXPORT_FIELDS[args.what], sys.stdout, 'json' if args.json else 'table')
+
+
+def command_export(database, args):
+    rows = _rows(database, args.what, args)
+    if args.output in (None, '-'):
+        _write_rows(rows, EXPORT_FIELDS[args.what], sys.stdout, args.format)
+        return
+    with open(args.output, 'w', newline='') as output:
+        _write_rows(rows, EXPORT_FIELDS[args.what], output, args.format)
+    print(f"Exported {args.what} to {args.output}", file=sys.stderr)
+
+
+def command_serve(database, args):
+    try:
+        from .rpc_server import RpcServer
+    except ImportError:
+        from rpc_server import RpcServer
+    with RpcServer(database, args.host, args.port) as server:
+        print(f"Serving the trading database on {args.host}:{server.server_address[1]} (Ctrl+C to stop)", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description='Headless access to the trading database.')
+    parser.add_argument('--data-dir', help='Directory of the data files (the repository data/ directory by default).')
+    parser.add_argument('--journal', action='store_true', help='Use journal mode (append-only writes).')
+    parser.add_argument('--snapshot-format', choices=['json', 'binary'], default='json', help='Snapshot format in journal mode.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    trade = commands.add_parser('trade', help='Buy or sell a stock at a price.')
+    trade.add_argument('side', choices=['buy', 'sell'])
+    trade.add_argument('symbol')
+    trade.add_argument('quantity', type=_number)
+    trade.add_argument('price', type=float)
+    trade.set_defaults(handler=command_trade)
+
+    balance = commands.add_parser('balance', help='Show, add to, remove from or reset the account balance.')
+    balance.add_argument('action', nargs='?', choices=['show', 'add', 'remove', 'reset'], default='show')
+    balance.add_argument('amount', nargs='?', type=_number)
+    balance.set_defaults(handler=command_balance)
+
+    for name, help_text in (('list', 'Print transactions, owned stocks or history.'),
+                            ('export', 'Write transactions, owned stocks or history to a file.')):
+        subcommand = commands.add_parser(name, help=help_text)
+        subcommand.add_argument('what', choices=list(EXPORT_FIELDS))
+        subcommand.add_argument('--symbol', help='Only this symbol.')
+        subcommand.add_argument('--start', help='Only rows at or after this date or timestamp.')
+        subcommand.add_argument('--end', help='Only rows at or before this timestamp.')
+        subcommand.add_argument('--limit', type=int, help='At most this many rows.')
+        if name == 'list':
+            subcommand.add_argument('--json', action='store_true', help='Print JSON lines instead of a table.')
+            subcommand.set_defaults(handler=command_list)
+        else:
+            subcommand.add_argument('--output', '-o', help='File to write (standard output by default).')
+            subcommand.add_argument('--format', choices=['csv', 'json'], default='csv')
+            subcommand.set_defaults(handler=command_export)
+
+    serve = commands.add_parser('serve', help='Serve the database to local bots over JSON lines RPC.')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=9200, help='Port to listen on (0 picks a free one).')
+    serve.set_defaults(handler=command_serve)
+    return parser
+
+
+def main(argv=None):
+    """Run a command; returns the exit status."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'balance' and args.action in ('add', 'remove') and args.amount is None:
+        parser.error(f"balance {args.action} needs an amount")
+    database = open_database(args)
+    try:
+        args.handler(database, args)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        database.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
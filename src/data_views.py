@@ -0,0 +1,255 @@
+import math
+import threading
+import pandas as pd
+
+try:
+    from .change_feed import EventsLost
+    from .storage.columnar import timestamp_to_ns, timestamps_to_ns
+except ImportError:
+    from change_feed import EventsLost
+    from storage.columnar import timestamp_to_ns, timestamps_to_ns
+
+TRANSACTION_COLUMNS = ['id', 'symbol', 'quantity', 'price', 'transaction_type', 'timestamp']
+HISTORY_COLUMNS = ['timestamp', 'account_balance', 'positions', 'owned_stocks']
+
+
+def _parse_time(value, end_of_day=False):
+    """Parse an optional date or timestamp filter; empty values mean no bound."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    # Compared like the parsed times: naive as is, with a UTC offset converted to naive UTC
+    timestamp = pd.Timestamp(timestamp_to_ns(pd.Timestamp(value).to_pydatetime()))
+    if end_of_day and isinstance(value, str) and len(value.strip()) <= 10:
+        # A bare date as the upper bound includes that whole day
+        timestamp += pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+    return timestamp
+
+
+def parse_times(timestamps):
+    """
+    Parse ISO timestamps into a datetime column.
+
+    The timestamps may mix naive ones and ones with a UTC offset, which are converted to naive
+    UTC like the columnar store does.
+    """
+    return pd.Series(timestamps_to_ns(list(timestamps)).view('datetime64[ns]'), index=timestamps.index)
+
+
+class _IncrementalView:
+    """
+    Base of the views that append new rows to a cached DataFrame.
+
+    New rows are kept as separate chunks and only concatenated when the frame is read, so a
+    refresh costs as much as the new rows rather than copying the whole frame.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self._reset()
+        self.generation = None
+        self._lock = threading.Lock()  # Gradio may serve several page requests at once
+
+    def _reset(self):
+        self._chunks = [self._empty_frame()]
+        self.row_count = 0
+
+    def _append(self, new_frame):
+        self._chunks = self._chunks + [new_frame] if self.row_count else [new_frame]
+        self.row_count += len(new_frame)
+
+    @property
+    def frame(self):
+        """All rows as one DataFrame; the chunks appended since the last read are concatenated here."""
+        if len(self._chunks) > 1:
+            self._chunks = [pd.concat(self._chunks, ignore_index=True)]
+        return self._chunks[0]
+
+
+def time_range_mask(frame, start=None, end=None):
+    """Boolean mask of the rows whose parsed time lies within the optional bounds."""
+    mask = pd.Series(True, index=frame.index)
+    start, end = _parse_time(start), _parse_time(end, end_of_day=True)
+    if start is not None:
+        mask &= frame['_time'] >= start
+    if end is not None:
+        mask &= frame['_time'] <= end
+    return mask
+
+
+def paginate(frame, sort_by=None, descending=False, page=1, page_size=50):
+    """
+    Sort a DataFrame and return one page of it.
+
+    :return: The page (without internal columns) and the total number of pages.
+    """
+    if sort_by and sort_by in frame.columns:
+        frame = frame.sort_values(sort_by, ascending=not descending, kind='stable')
+    elif descending:
+        frame = frame.iloc[::-1]
+    page_size = max(int(page_size or 1), 1)
+    total_pages = max(math.ceil(len(frame) / page_size), 1)
+    page = min(max(int(page or 1), 1), total_pages)
+    result = frame.iloc[(page - 1) * page_size:page * page_size]
+    internal_columns = [column for column in frame.columns if column.startswith('_')]
+    return result.drop(columns=internal_columns).reset_index(drop=True), total_pages
+
+
+class TransactionsView(_IncrementalView):
+    """
+    A cached DataFrame of the transactions, updated incrementally.
+
+    Only transactions added since the last refresh are fetched (by ID) and converted, and
+    filtering, sorting and paging run on the cached frame, so a page request does not
+    rebuild the table from the full transaction list.
+    """
+
+    def __init__(self, database):
+        self.last_id = 0
+        super().__init__(database)
+
+    @staticmethod
+    def _empty_frame():
+        frame = pd.DataFrame({column: pd.Series(dtype='object') for column in TRANSACTION_COLUMNS})
+        frame['_time'] = pd.Series(dtype='datetime64[ns]')
+        frame['_symbol'] = pd.Series(dtype='object')
+        return frame
+
+    def refresh(self):
+        """Append transactions added since the last refresh, or start over after a clear."""
+        if self.generation != self.database.transactions_generation:
+            self.generation = self.database.transactions_generation
+            self._reset()
+            self.last_id = 0
+        new_transactions = self.database.query_transactions(after_id=self.last_id)
+        if not new_transactions:
+            return
+        new_frame = pd.DataFrame(new_transactions, columns=TRANSACTION_COLUMNS)
+        new_frame['_time'] = parse_times(new_frame['timestamp'])
+        new_frame['_symbol'] = new_frame['symbol'].str.upper()
+        self._append(new_frame)
+        self.last_id = new_transactions[-1]['id']
+
+    def page(self, symbol=None, start=None, end=None, sort_by='id', descending=False, page=1, page_size=50):
+        """
+        Return one page of transactions.
+
+        :param symbol: Only show this symbol (case-insensitive).
+        :param start: Only show transactions at or after this date or timestamp.
+        :param end: Only show transactions at or before this date or timestamp (a bare date includes that whole day).
+        :return: The page DataFrame, the number of matching rows and the total number of pages.
+        """
+        with self._lock:
+            self.refresh()
+            frame = self.frame
+        mask = time_range_mask(frame, start, end)
+        if symbol and symbol.strip():
+            mask &= frame['_symbol'] == symbol.strip().upper()
+        if not mask.all():
+            frame = frame[mask]
+        rows, total_pages = paginate(frame, sort_by, descending, page, page_size)
+        return rows, len(frame), total_pages
+
+
+class OwnedStocksHistoryView(_IncrementalView):
+    """A cached DataFrame of the owned stocks history, updated incrementally like TransactionsView."""
+
+    @staticmethod
+    def _empty_frame():
+        frame = pd.DataFrame({column: pd.Series(dtype='object') for column in HISTORY_COLUMNS})
+        frame['_time'] = pd.Series(dtype='datetime64[ns]')
+        return frame
+
+    def refresh(self):
+        """Append history entries added since the last refresh, or start over after a clear."""
+        if self.generation != self.database.history_generation:
+            self.generation = self.database.history_generation
+            self._reset()
+        new_entries = self.database.query_owned_stocks_history(offset=self.row_count)
+        if not new_entries:
+            return
+        new_frame = pd.DataFrame({
+            'timestamp': [entry['timestamp'] for entry in new_entries],
+            'account_balance': [entry['account_balance'] for entry in new_entries],
+            'positions': [len(entry['owned_stocks']) for entry in new_entries],
+            'owned_stocks': [entry['owned_stocks'] for entry in new_entries]
+        })
+        new_frame['_time'] = parse_times(new_frame['timestamp'])
+        self._append(new_frame)
+
+    def page(self, symbol=None, start=None, end=None, sort_by=None, descending=False, page=1, page_size=50):
+        """Return one page of history entries, optionally only those holding the given symbol."""
+        with self._lock:
+            self.refresh()
+            frame = self.frame
+        mask = time_range_mask(frame, start, end)
+        if symbol and symbol.strip():
+            wanted = symbol.strip().upper()
+            mask &= frame['owned_stocks'].map(lambda owned_stocks: any(held.upper() == wanted for held in owned_stocks))
+        if not mask.all():
+            frame = frame[mask]
+        rows, total_pages = paginate(frame, sort_by, descending, page, page_size)
+        return rows, len(frame), total_pages
+
+
+class RecentTransactions:
+    """
+    The latest transactions and the account balance, kept current from the database's change feed.
+
+    Seeded once from the database, then each trade event appends its row and each balance
+    event updates the balance, so a live view never re-reads the transaction table. Falling
+    behind the feed's buffer (EventsLost) or a clear of the transactions reseeds it.
+    """
+
+    def __init__(self, database, max_rows=20):
+        self.database = database
+        self.max_rows = max_rows
+        self.subscription = None
+        self.rows = []
+        self.account_balance = 0.0
+        self.reload()
+
+    def reload(self):
+        """Subscribe anew and seed the rows and balance from the database."""
+        if self.subscription is not None:
+            self.subscription.close()
+        # Subscribe first so nothing published while seeding is missed; trades already seeded are skipped
+        self.subscription = self.database.subscribe()
+        after_id = max(self.database.transaction_id_counter - 1 - self.max_rows, 0)
+        self.rows = [[transaction[column] for column in TRANSACTION_COLUMNS]
+                     for transaction in self.database.query_transactions(after_id=after_id)][-self.max_rows:]
+        self.account_balance = self.database.get_account_balance()
+
+    def apply(self, event):
+        """Update the rows and balance with one change event."""
+        if event.type == 'trade':
+            transaction = event.data['transaction']
+            if not self.rows or transaction['id'] > self.rows[-1][0]:
+                self.rows.append([transaction[column] for column in TRANSACTION_COLUMNS])
+                del self.rows[:-self.max_rows]
+            self.account_balance = event.data['account_balance']
+        elif event.type == 'balance':
+            self.account_balance = event.data['account_balance']
+        elif event.type == 'clear' and event.data['target'] == 'transactions':
+            self.rows = []
+
+    def update(self, timeout=None):
+        """
+        Wait up to timeout seconds for changes and apply them.
+
+        :return: True if anything changed (including a reload), False on timeout.
+        """
+        try:
+            events = self.subscription.get(timeout)
+        except EventsLost:
+            self.reload()
+            return True
+        for event in events:
+            self.apply(event)
+        return bool(events)
+
+    def frame(self):
+        """The rows as a DataFrame, newest first."""
+        return pd.DataFrame(self.rows[::-1], columns=TRANSACTION_COLUMNS)
+
+    def close(self):
+        self.subscription.close()
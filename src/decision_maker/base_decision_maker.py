@@ -1,7 +1,30 @@
 from abc import ABC, abstractmethod
+from .indicators import IndicatorEngine
+from .news_processor import article_symbols
 
 class BaseDecisionMaker(ABC):
-    
+
+    # Streaming indicators kept per symbol, e.g. {'sma': lambda: SMA(20), 'rsi': lambda: RSI(14)}
+    indicator_factories = {}
+
+    @property
+    def indicators(self):
+        """The IndicatorEngine over indicator_factories, created on first use."""
+        engine = self.__dict__.get('_indicator_engine')
+        if engine is None:
+            engine = self._indicator_engine = IndicatorEngine(self.indicator_factories)
+        return engine
+
+    def update_indicators(self, symbol: str, bar):
+        """
+        Add a new bar for a symbol to its indicators and return their values.
+
+        The backtest calls this for every bar and passes the values to analyze_financial_data
+        as stock_price_history['indicators']. On a live feed, call indicators.initialize()
+        with the symbol's price history first.
+        """
+        return self.indicators.update(symbol, bar)
+
     @abstractmethod
     def analyze_financial_data(self, symbol: str, income_statement: dict, balance_sheet: dict, stock_price_history: dict):
         """
@@ -16,6 +39,18 @@ class BaseDecisionMaker(ABC):
         """
         pass
 
+    def analyze_article(self, article):
+        """
+        Score a single article's sentiment from -1 (negative) to 1 (positive).
+
+        A NewsProcessor calls this once per unique article for all symbols. By default the
+        article is passed to analyze_news() on its own, for the first symbol it is tagged with
+        (None if it has no tags); override this if analyze_news() does not return a number or
+        a dict with 'sentiment' or 'score'.
+        """
+        symbols = sorted(article_symbols(article))
+        return self.analyze_news(symbols[0] if symbols else None, [article])
+
     @abstractmethod
     def generate_recommendations(self, symbol: str, metrics: dict, news_analysis: dict):
         """
@@ -0,0 +1,321 @@
+import math
+import threading
+from abc import ABC, abstractmethod
+from collections import deque, namedtuple
+
+import numpy as np
+
+Bands = namedtuple('Bands', ['lower', 'middle', 'upper'])
+
+
+def bar_price(bar):
+    """The closing price of a bar, given as a number or a dict with 'close' or 'price'."""
+    if isinstance(bar, dict):
+        return float(bar['close'] if 'close' in bar else bar['price'])
+    return float(bar)
+
+
+def bar_volume(bar):
+    """The traded volume of a bar (1 for bars without a volume)."""
+    return float(bar.get('volume', 1.0)) if isinstance(bar, dict) else 1.0
+
+
+class Indicator(ABC):
+    """
+    Base class for streaming indicators.
+
+    An indicator keeps constant-size state and is updated with one bar at a time. Its value
+    is None until it has seen enough bars. initialize() warms it up from history in one call.
+    """
+
+    def __init__(self, period):
+        if period < 1:
+            raise ValueError("Period must be at least 1.")
+        self.period = period
+        self.reset()
+
+    @abstractmethod
+    def reset(self):
+        """Forget all bars seen so far."""
+        pass
+
+    @abstractmethod
+    def update(self, bar):
+        """Add the next bar and return the new value."""
+        pass
+
+    @property
+    @abstractmethod
+    def value(self):
+        """The current value, or None until enough bars were seen."""
+        pass
+
+    @property
+    def ready(self):
+        return self.value is not None
+
+    def initialize(self, history):
+        """Reset and warm up from a sequence of bars (oldest first); returns the value."""
+        self.reset()
+        for bar in history:
+            self.update(bar)
+        return self.value
+
+
+class _Window:
+    """The last `period` values with their running sum and sum of squares."""
+
+    def __init__(self, period):
+        self.period = period
+        self.values = deque(maxlen=period)
+        self.total = self.total_squares = 0.0
+        self.updates = 0
+
+    def push(self, value):
+        if len(self.values) == self.period:
+            oldest = self.values[0]
+            self.total -= oldest
+            self.total_squares -= oldest * oldest
+        self.values.append(value)
+        self.total += value
+        self.total_squares += value * value
+        self.updates += 1
+        if self.updates % (self.period * 64) == 0:
+            # Re-sum now and then so rounding errors from the running sums cannot build up
+            self.total = math.fsum(self.values)
+            self.total_squares = math.fsum(value * value for value in self.values)
+
+    def fill(self, values):
+        self.values = deque(values[-self.period:], maxlen=self.period)
+        self.total = math.fsum(self.values)
+        self.total_squares = math.fsum(value * value for value in self.values)
+
+    @property
+    def full(self):
+        return len(self.values) == self.period
+
+    def mean(self):
+        return self.total / len(self.values)
+
+    def variance(self, ddof=0):
+        count = len(self.values)
+        mean = self.total / count
+        return max(self.total_squares - count * mean * mean, 0.0) / (count - ddof)
+
+
+class SMA(Indicator):
+    """Simple moving average of the closing prices."""
+
+    def reset(self):
+        self.window = _Window(self.period)
+
+    def update(self, bar):
+        self.window.push(bar_price(bar))
+        return self.value
+
+    def initialize(self, history):
+        self.reset()
+        self.window.fill([bar_price(bar) for bar in history])
+        return self.value
+
+    @property
+    def value(self):
+        return self.window.mean() if self.window.full else None
+
+
+class EMA(Indicator):
+    """Exponential moving average of the closing prices, seeded with the SMA of the first `period` prices."""
+
+    def reset(self):
+        self.alpha = 2.0 / (self.period + 1)
+        self.seed = []
+        self.average = None
+
+    def update(self, bar):
+        price = bar_price(bar)
+        if self.average is None:
+            self.seed.append(price)
+            if len(self.seed) == self.period:
+                self.average = math.fsum(self.seed) / self.period
+                self.seed = []
+        else:
+            self.average += self.alpha * (price - self.average)
+        return self.average
+
+    @property
+    def value(self):
+        return self.average
+
+
+class RSI(Indicator):
+    """Relative strength index with Wilder's smoothing (0 to 100)."""
+
+    def reset(self):
+        self.previous = None
+        self.changes = 0
+        self.average_gain = self.average_loss = 0.0
+
+    def update(self, bar):
+        price = bar_price(bar)
+        if self.previous is not None:
+            change = price - self.previous
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            self.changes += 1
+            if self.changes <= self.period:
+                # The first averages are plain means of the first `period` changes
+                self.average_gain += (gain - self.average_gain) / self.changes
+                self.average_loss += (loss - self.average_loss) / self.changes
+            else:
+                self.average_gain += (gain - self.average_gain) / self.period
+                self.average_loss += (loss - self.average_loss) / self.period
+        self.previous = price
+        return self.value
+
+    @property
+    def value(self):
+        if self.changes < self.period:
+            return None
+        if self.average_loss == 0:
+            return 100.0 if self.average_gain > 0 else 50.0
+        return 100.0 - 100.0 / (1.0 + self.average_gain / self.average_loss)
+
+
+class Volatility(Indicator):
+    """Rolling sample standard deviation of log returns over `period` returns, optionally annualized."""
+
+    def __init__(self, period, periods_per_year=1):
+        self.scale = math.sqrt(periods_per_year)
+        super().__init__(period)
+
+    def reset(self):
+        self.window = _Window(self.period)
+        self.previous = None
+
+    def update(self, bar):
+        price = bar_price(bar)
+        if self.previous is not None:
+            self.window.push(math.log(price / self.previous))
+        self.previous = price
+        return self.value
+
+    def initialize(self, history):
+        self.reset()
+        prices = np.array([bar_price(bar) for bar in history], dtype=np.float64)
+        if len(prices):
+            self.window.fill(list(np.diff(np.log(prices))))
+            self.previous = float(prices[-1])
+        return self.value
+
+    @property
+    def value(self):
+        if not self.window.full or self.period < 2:
+            return None
+        return math.sqrt(self.window.variance(ddof=1)) * self.scale
+
+
+class VWAP(Indicator):
+    """Volume-weighted average price, over the last `period` bars or, with period=None, since the last reset."""
+
+    def __init__(self, period=None):
+        self.period = period
+        if period is not None and period < 1:
+            raise ValueError("Period must be at least 1.")
+        self.reset()
+
+    def reset(self):
+        self.window = deque(maxlen=self.period)
+        self.turnover = self.volume = 0.0
+
+    def update(self, bar):
+        price, volume = bar_price(bar), bar_volume(bar)
+        if self.period is not None and len(self.window) == self.period:
+            old_price, old_volume = self.window[0]
+            self.turnover -= old_price * old_volume
+            self.volume -= old_volume
+        if self.period is not None:
+            self.window.append((price, volume))
+        self.turnover += price * volume
+        self.volume += volume
+        return self.value
+
+    @property
+    def value(self):
+        return self.turnover / self.volume if self.volume > 0 else None
+
+
+class BollingerBands(Indicator):
+    """SMA of the closing prices with bands `width` population standard deviations above and below."""
+
+    def __init__(self, period=20, width=2.0):
+        self.width = width
+        super().__init__(period)
+
+    def reset(self):
+        self.window = _Window(self.period)
+
+    def update(self, bar):
+        self.window.push(bar_price(bar))
+        return self.value
+
+    def initialize(self, history):
+        self.reset()
+        self.window.fill([bar_price(bar) for bar in history])
+        return self.value
+
+    @property
+    def value(self):
+        if not self.window.full:
+            return None
+        middle = self.window.mean()
+        offset = self.width * math.sqrt(self.window.variance())
+        return Bands(middle - offset, middle, middle + offset)
+
+
+class IndicatorEngine:
+    """
+    Keeps a set of streaming indicators per symbol.
+
+    BaseDecisionMaker creates one from its indicator_factories. A decision maker on a live
+    feed calls initialize() once per symbol with its stock_price_history, then update()
+    with every new bar, e.g.:
+
+        engine = IndicatorEngine({'sma': lambda: SMA(20), 'rsi': lambda: RSI(14)})
+        engine.initialize('AAPL', history)
+        values = engine.update('AAPL', {'close': 187.2, 'volume': 1200})
+    """
+
+    def __init__(self, factories):
+        """
+        :param factories: Indicator names mapped to functions creating a fresh indicator.
+        """
+        self.factories = dict(factories)
+        self.indicators = {}
+        self.lock = threading.Lock()
+
+    def _indicators(self, symbol):
+        indicators = self.indicators.get(symbol)
+        if indicators is None:
+            indicators = self.indicators[symbol] = {name: factory() for name, factory in self.factories.items()}
+        return indicators
+
+    def initialize(self, symbol, history):
+        """Warm up all indicators of a symbol from its history (oldest bar first) and return their values."""
+        history = list(history)
+        with self.lock:
+            indicators = self._indicators(symbol)
+            return {name: indicator.initialize(history) for name, indicator in indicators.items()}
+
+    def update(self, symbol, bar):
+        """Add a new bar for a symbol and return the updated indicator values."""
+        with self.lock:
+            indicators = self._indicators(symbol)
+            return {name: indicator.update(bar) for name, indicator in indicators.items()}
+
+    def values(self, symbol):
+        """Return the current indicator values for a symbol."""
+        with self.lock:
+            return {name: indicator.value for name, indicator in self._indicators(symbol).items()}
+
+    def remove(self, symbol):
+        with self.lock:
+            self.indicators.pop(symbol, None)
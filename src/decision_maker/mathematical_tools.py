@@ -1,3 +1,28 @@
+import numpy as np
+import pandas as pd
+
+# Batch ratio name -> (numerator, denominator) columns; P/E keeps the earnings scaling of calculate_valuation_ratios
+RATIOS = {
+    'P/E Ratio': ('current_price', 'net_income_millions'),
+    'P/B Ratio': ('market_cap', 'shareholder_equity'),
+    'P/S Ratio': ('market_cap', 'revenue'),
+    'EPS': ('net_income', 'shares_outstanding'),
+    'ROE': ('net_income', 'shareholder_equity'),
+    'ROA': ('net_income', 'total_assets'),
+    'Net Margin': ('net_income', 'revenue'),
+    'Debt to Equity': ('total_liabilities', 'shareholder_equity'),
+    'Current Ratio': ('current_assets', 'current_liabilities'),
+}
+
+
+def safe_divide(numerator, denominator):
+    """Divide element-wise, giving NaN where the denominator is zero or either side is missing."""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    valid = (denominator != 0) & ~np.isnan(denominator)
+    return np.divide(numerator, denominator, out=np.full(np.broadcast(numerator, denominator).shape, np.nan), where=valid)
+
+
 class MathematicalTools:
     
     @staticmethod
@@ -19,3 +44,65 @@ class MathematicalTools:
         shareholder_equity = balance_sheet.get('shareholder_equity', 1)  # Avoid division by zero
         roe = net_income / shareholder_equity
         return {'ROE': roe}
+
+
+    @staticmethod
+    def _columns(data, names):
+        """Read columns from a DataFrame or a dict of arrays as float arrays; missing columns are all NaN."""
+        length = len(data) if isinstance(data, pd.DataFrame) else len(next(iter(data.values()), ()))
+        return {name: np.asarray(data[name], dtype=np.float64) if name in data else np.full(length, np.nan) for name in names}
+
+    @staticmethod
+    def _result(data, ratios):
+        """Return the ratios in the same form as the input: a DataFrame with the same index, or a dict of arrays."""
+        if isinstance(data, pd.DataFrame):
+            return pd.DataFrame(ratios, index=data.index)
+        return ratios
+
+    @staticmethod
+    def calculate_valuation_ratios_batch(data):
+        """
+        Calculate the P/E Ratio for many symbols at once, like calculate_valuation_ratios.
+
+        :param data: A DataFrame with one row per symbol, or a dict of arrays, with 'net_income' and 'current_price' columns.
+        :return: The ratios in the same form as the input; NaN where the earnings are zero or missing.
+        """
+        columns = MathematicalTools._columns(data, ['net_income', 'current_price'])
+        pe_ratio = safe_divide(columns['current_price'], columns['net_income'] / 1e6)
+        return MathematicalTools._result(data, {'P/E Ratio': pe_ratio})
+
+    @staticmethod
+    def calculate_profitability_ratios_batch(data):
+        """
+        Calculate ROE for many symbols at once, like calculate_profitability_ratios.
+
+        :param data: A DataFrame with one row per symbol, or a dict of arrays, with 'net_income' and 'shareholder_equity' columns.
+        :return: The ratios in the same form as the input; NaN where the equity is zero or missing.
+        """
+        columns = MathematicalTools._columns(data, ['net_income', 'shareholder_equity'])
+        roe = safe_divide(columns['net_income'], columns['shareholder_equity'])
+        return MathematicalTools._result(data, {'ROE': roe})
+
+    @staticmethod
+    def calculate_ratios_batch(data, ratios=None):
+        """
+        Calculate a set of valuation, profitability and balance sheet ratios for many symbols in one pass.
+
+        Missing input columns and zero or missing denominators give NaN for the affected ratios.
+
+        :param data: A DataFrame with one row per symbol, or a dict of arrays. Used columns: current_price,
+            net_income, revenue, shareholder_equity, total_assets, total_liabilities, current_assets,
+            current_liabilities and shares_outstanding.
+        :param ratios: Names from RATIOS to calculate (all of them by default).
+        :return: The ratios in the same form as the input.
+        """
+        ratios = list(ratios or RATIOS)
+        columns = MathematicalTools._columns(data, [
+            'current_price', 'net_income', 'revenue', 'shareholder_equity', 'total_assets',
+            'total_liabilities', 'current_assets', 'current_liabilities', 'shares_outstanding'
+        ])
+        columns['net_income_millions'] = columns['net_income'] / 1e6
+        columns['market_cap'] = columns['current_price'] * columns['shares_outstanding']
+        return MathematicalTools._result(data, {
+            name: safe_divide(columns[RATIOS[name][0]], columns[RATIOS[name][1]]) for name in ratios
+        })
@@ -0,0 +1,304 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+try:
+    from ..metrics import REGISTRY
+except ImportError:
+    from metrics import REGISTRY
+
+# Sentiment scores within this distance of 0 count as neutral
+NEUTRAL_BAND = 0.05
+
+
+def _normalize_text(text):
+    return ' '.join(re.sub(r'[^\w\s]', ' ', str(text).lower()).split())
+
+
+def _normalize_url(url):
+    """Drop the scheme, 'www.', the fragment, trailing slashes and utm_* tracking parameters."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parts.query) if not key.lower().startswith('utm_')))
+    return f"{host}{parts.path.rstrip('/')}" + (f"?{query}" if query else '')
+
+
+def article_fingerprint(article):
+    """
+    A stable ID for a news article, equal for copies of the same story fetched for different symbols.
+
+    Uses the normalized URL when the article has one, otherwise its normalized headline and source.
+
+    :param article: An article dictionary (url/link, title/headline, source) or the article text.
+    """
+    if isinstance(article, dict):
+        url = article.get('url') or article.get('link')
+        title = article.get('title') or article.get('headline')
+        if url:
+            key = 'url:' + _normalize_url(url)
+        elif title:
+            key = f"title:{_normalize_text(title)}|{_normalize_text(article.get('source') or '')}"
+        else:
+            key = 'json:' + json.dumps(article, sort_keys=True, default=str)
+    else:
+        key = 'text:' + _normalize_text(article)
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def article_symbols(article):
+    """The symbols an article is tagged with ('symbols', 'tickers' or Alpha Vantage style 'ticker_sentiment')."""
+    if not isinstance(article, dict):
+        return set()
+    symbols = set()
+    for key in ('symbols', 'tickers'):
+        symbols.update(str(symbol).upper() for symbol in article.get(key) or ())
+    for item in article.get('ticker_sentiment') or ():
+        if isinstance(item, dict) and item.get('ticker'):
+            symbols.add(str(item['ticker']).upper())
+    return symbols
+
+
+def _score(result):
+    """Turn an analyzer's result (a number, or a dict with 'sentiment' or 'score') into a float."""
+    if isinstance(result, dict):
+        result = result.get('sentiment', result.get('score', 0.0))
+    return float(result or 0.0)
+
+
+class SentimentAggregate:
+    """Running news sentiment of one symbol."""
+
+    __slots__ = ('articles', 'total', 'recent', 'positive', 'negative', 'neutral')
+
+    def __init__(self):
+        self.articles = 0
+        self.total = 0.0
+        self.recent = None  # Exponentially weighted, so the latest articles count the most
+        self.positive = self.negative = self.neutral = 0
+
+    def add(self, sentiment, alpha):
+        self.articles += 1
+        self.total += sentiment
+        self.recent = sentiment if self.recent is None else self.recent + alpha * (sentiment - self.recent)
+        if sentiment > NEUTRAL_BAND:
+            self.positive += 1
+        elif sentiment < -NEUTRAL_BAND:
+            self.negative += 1
+        else:
+            self.neutral += 1
+
+    def state(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_state(cls, state):
+        aggregate = cls()
+        for name, value in zip(cls.__slots__, state):
+            setattr(aggregate, name, value)
+        return aggregate
+
+    def to_dict(self):
+        return {
+            'articles': self.articles,
+            'mean_sentiment': self.total / self.articles if self.articles else 0.0,
+            'recent_sentiment': self.recent if self.recent is not None else 0.0,
+            'positive': self.positive,
+            'negative': self.negative,
+            'neutral': self.neutral,
+        }
+
+
+class NewsProcessor:
+    """
+    Incremental news analysis shared by all symbols.
+
+    Articles are fingerprinted (article_fingerprint()) and looked up in a seen-index, so each
+    unique article is analyzed once, however many symbols it was fetched for and however
+    many runs it stays in the recent news. Its score is fanned out to every symbol it was
+    fetched for or is tagged with, and each symbol's SentimentAggregate is updated in place.
+    Analysis cost therefore grows with the number of new articles, not with symbols times
+    news history.
+
+    An article being analyzed by one call is marked in flight, so concurrent calls (e.g. the
+    fetch threads of a bot pipeline) wait for its score instead of analyzing it again. The
+    seen-index keeps the max_articles most recently added articles; an older article that
+    shows up again is analyzed and counted again.
+
+    With an index file the seen-index survives restarts: every processed article is appended
+    to it as a JSON line with its score and symbols, and the index and the aggregates are
+    replayed from it on startup. Once the file holds more than twice as many records as the
+    seen-index, it is rewritten as the aggregates plus one record per seen article.
+    """
+
+    metrics = REGISTRY
+
+    def __init__(self, analyze, index_file=None, recent_alpha=0.2, max_articles=100_000):
+        """
+        :param analyze: Scores one article from -1 (negative) to 1 (positive); may return a
+            number or a dict with 'sentiment' or 'score'.
+        :param index_file: JSON lines file holding the seen-index, or None to keep it in memory.
+        :param recent_alpha: Weight of each new article in the 'recent_sentiment' moving average.
+        :param max_articles: Most articles kept in the seen-index.
+        """
+        self.analyze = analyze
+        self.index_file = index_file
+        self.recent_alpha = recent_alpha
+        self.max_articles = max_articles
+        self.seen = {}  # fingerprint -> [sentiment, set of symbols it was counted for], oldest first
+        self.aggregates = {}  # symbol -> SentimentAggregate
+        self.in_flight = {}  # fingerprint -> Event set once the article has been analyzed
+        self.lock = threading.Lock()
+        self._index_records = 0
+        self._articles_total = self.metrics.counter('tradingbot_news_articles_total', 'News articles processed, by outcome')
+        if index_file:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_file, 'r') as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line torn by a crash
+            self._index_records += 1
+            if 'aggregates' in record:  # Written by _compact_index(), followed by the seen articles
+                self.aggregates = {symbol: SentimentAggregate.from_state(state) for symbol, state in record['aggregates'].items()}
+                continue
+            entry = self.seen.get(record['fingerprint'])
+            if entry is None:
+                entry = self.seen[record['fingerprint']] = [record['sentiment'], set()]
+            if 'counted' in record:
+                entry[1].update(record['counted'])  # Already in the aggregates
+            else:
+                self._fan_out(entry, record['symbols'])
+        self._evict()
+
+    def _evict(self):
+        """Drop the oldest articles from the seen-index beyond max_articles."""
+        while len(self.seen) > self.max_articles:
+            del self.seen[next(iter(self.seen))]
+
+    def _compact_index(self):
+        """Rewrite the index file as the aggregates and one record per seen article."""
+        lines = [json.dumps({'aggregates': {symbol: aggregate.state() for symbol, aggregate in self.aggregates.items()}},
+                            separators=(',', ':')) + '\n']
+        lines.extend(json.dumps({'fingerprint': fingerprint, 'sentiment': sentiment, 'counted': sorted(symbols)},
+                                separators=(',', ':')) + '\n' for fingerprint, (sentiment, symbols) in self.seen.items())
+        descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.index_file)), suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w') as file:
+                file.write(''.join(lines))
+            os.replace(temp_path, self.index_file)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._index_records = len(lines)
+
+    def _fan_out(self, entry, symbols):
+        """Count an article's score for the symbols it was not counted for yet; returns those symbols."""
+        added = [symbol for symbol in symbols if symbol not in entry[1]]
+        for symbol in added:
+            entry[1].add(symbol)
+            aggregate = self.aggregates.get(symbol)
+            if aggregate is None:
+                aggregate = self.aggregates[symbol] = SentimentAggregate()
+            aggregate.add(entry[0], self.recent_alpha)
+        return added
+
+    def process(self, news_by_symbol):
+        """
+        Analyze the articles not seen before and update the per-symbol aggregates.
+
+        :param news_by_symbol: {symbol: list of articles}, e.g. from fetch_news_and_events() per symbol.
+        :return: {symbol: list of {'fingerprint', 'sentiment', 'article'}} for the articles newly
+            counted for each symbol; symbols without new articles are left out.
+        """
+        # Group the copies of each article, keeping the first one and every symbol it belongs to
+        articles = {}
+        for symbol, news in news_by_symbol.items():
+            for article in news or ():
+                fingerprint = article_fingerprint(article)
+                grouped = articles.get(fingerprint)
+                if grouped is None:
+                    grouped = articles[fingerprint] = (article, {symbol.upper()} | article_symbols(article))
+                else:
+                    grouped[1].add(symbol.upper())
+        # Claim the unseen articles no other call is analyzing; the rest are scored by someone else
+        with self.lock:
+            new, waiting = [], []
+            for fingerprint in articles:
+                if fingerprint in self.seen:
+                    continue
+                if fingerprint in self.in_flight:
+                    waiting.append(self.in_flight[fingerprint])
+                else:
+                    self.in_flight[fingerprint] = threading.Event()
+                    new.append(fingerprint)
+        self._articles_total.inc(len(new), outcome='new')
+        self._articles_total.inc(len(articles) - len(new), outcome='seen')
+
+        # Analyze outside the lock; analysis may call out to a model or an API
+        scores = {}
+        try:
+            for fingerprint in new:
+                scores[fingerprint] = _score(self.analyze(articles[fingerprint][0]))
+        finally:
+            with self.lock:
+                for fingerprint in new:
+                    if fingerprint in scores:
+                        self.seen[fingerprint] = [scores[fingerprint], set()]
+                    self.in_flight.pop(fingerprint).set()
+                self._evict()
+        for event in waiting:
+            event.wait()
+
+        results, records = {}, []
+        with self.lock:
+            for fingerprint, (article, symbols) in articles.items():
+                entry = self.seen.get(fingerprint)
+                if entry is None:
+                    continue  # Its analysis failed in another call, or it was evicted already
+                added = self._fan_out(entry, sorted(symbols))
+                if not added:
+                    continue
+                records.append({'fingerprint': fingerprint, 'sentiment': entry[0], 'symbols': added})
+                for symbol in added:
+                    results.setdefault(symbol, []).append({'fingerprint': fingerprint, 'sentiment': entry[0], 'article': article})
+            if records and self.index_file:
+                with open(self.index_file, 'a') as file:
+                    file.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+                self._index_records += len(records)
+                if self._index_records > 2 * len(self.seen):
+                    self._compact_index()
+        return results
+
+    def sentiment(self, symbol):
+        """Return a symbol's news sentiment aggregate, or None if no article mentioned it."""
+        with self.lock:
+            aggregate = self.aggregates.get(symbol.upper())
+            return aggregate.to_dict() if aggregate is not None else None
+
+    def summary(self):
+        """Return the sentiment aggregates of all symbols."""
+        with self.lock:
+            return {symbol: aggregate.to_dict() for symbol, aggregate in sorted(self.aggregates.items())}
+
+    def reset(self):
+        """Forget every article and aggregate, and delete the index file."""
+        with self.lock:
+            self.seen = {}
+            self.aggregates = {}
+            self._index_records = 0
+            if self.index_file and os.path.exists(self.index_file):
+                os.remove(self.index_file)
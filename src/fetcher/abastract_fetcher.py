@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
 
+ENDPOINTS = ('income_statement', 'balance_sheet', 'stock_price_history', 'news_and_events', 'analyst_reports')
+
 class FinancialDataFetcher(ABC):
 
     @abstractmethod
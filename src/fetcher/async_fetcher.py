@@ -0,0 +1,222 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .abastract_fetcher import ENDPOINTS
+
+try:
+    from ..metrics import REGISTRY
+except ImportError:
+    from metrics import REGISTRY
+
+
+class AsyncFinancialDataFetcher(ABC):
+    """Async counterpart of FinancialDataFetcher, with concurrent fetching for many symbols."""
+
+    max_concurrency = 16
+    metrics = REGISTRY  # Where fetch() records call latencies and outcomes
+
+    @abstractmethod
+    async def fetch_income_statement(self, symbol: str):
+        """Fetch and return the income statement for the given stock symbol."""
+        pass
+
+    @abstractmethod
+    async def fetch_balance_sheet(self, symbol: str):
+        """Fetch and return the balance sheet for the given stock symbol."""
+        pass
+
+    @abstractmethod
+    async def fetch_stock_price_history(self, symbol: str):
+        """Fetch and return historical stock prices and trading volume."""
+        pass
+
+    @abstractmethod
+    async def fetch_news_and_events(self, symbol: str):
+        """Fetch and return recent news and events affecting the company."""
+        pass
+
+    @abstractmethod
+    async def fetch_analyst_reports(self, symbol: str):
+        """Fetch and return analyst recommendations and brokerage reports."""
+        pass
+
+    @abstractmethod
+    def set_api_keys(self, api_keys: dict):
+        """Set API keys for data sources."""
+        pass
+
+    async def fetch(self, symbol: str, endpoint: str):
+        """Fetch one endpoint (e.g. 'balance_sheet') for the given stock symbol."""
+        if endpoint not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint: {endpoint}")
+        labels = {'fetcher': type(self).__name__, 'endpoint': endpoint}
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            result = await getattr(self, f'fetch_{endpoint}')(symbol)
+            outcome = 'ok'
+            return result
+        finally:
+            self.metrics.histogram('tradingbot_fetch_seconds', 'Time spent in data fetcher calls').observe(time.perf_counter() - started, **labels)
+            self.metrics.counter('tradingbot_fetch_calls_total', 'Data fetcher calls, by outcome').inc(outcome=outcome, **labels)
+
+    async def fetch_many(self, symbols, endpoints=ENDPOINTS, max_concurrency=None, return_exceptions=False):
+        """
+        Fetch several endpoints for several symbols concurrently.
+
+        The fetchers in this module get their concurrency from a thread pool running blocking
+        requests.Session calls, not from non-blocking I/O, so at most max_concurrency requests
+        (the pool size) can be in flight.
+
+        :param symbols: The stock symbols to fetch.
+        :param endpoints: The endpoints to fetch for every symbol (all of them by default).
+        :param max_concurrency: Maximum number of requests in flight, at most the fetcher's
+            max_concurrency (the default).
+        :param return_exceptions: Put a failed request's exception in the results instead of raising it.
+        :return: A dictionary of results keyed by symbol, then by endpoint.
+        :raises ValueError: If max_concurrency is above the fetcher's max_concurrency.
+        """
+        if max_concurrency and max_concurrency > self.max_concurrency:
+            raise ValueError(f"max_concurrency {max_concurrency} is above this fetcher's limit of {self.max_concurrency}; "
+                             f"create the fetcher with a larger max_concurrency instead")
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def fetch_one(symbol, endpoint):
+            async with semaphore:
+                return await self.fetch(symbol, endpoint)
+
+        requests_to_send = [(symbol, endpoint) for symbol in symbols for endpoint in endpoints]
+        results = await asyncio.gather(
+            *(fetch_one(symbol, endpoint) for symbol, endpoint in requests_to_send),
+            return_exceptions=return_exceptions
+        )
+        fetched = {symbol: {} for symbol in symbols}
+        for (symbol, endpoint), result in zip(requests_to_send, results):
+            fetched[symbol][endpoint] = result
+        return fetched
+
+    async def close(self):
+        """Release any resources held by the fetcher."""
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class _ThreadedFetcher(AsyncFinancialDataFetcher):
+    """Runs blocking calls on a thread pool sized to max_concurrency."""
+
+    def __init__(self, max_concurrency=None):
+        if max_concurrency:
+            self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix=type(self).__name__)
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def close(self):
+        """Wait for the calls still running on the pool (without blocking the event loop), then stop it."""
+        await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown, True)
+
+
+class HTTPFinancialDataFetcher(_ThreadedFetcher):
+    """
+    Base class for fetchers backed by a JSON-over-HTTP API.
+
+    Requests go through one pooled requests.Session, so connections are kept alive and
+    reused across symbols instead of being opened per request. The session is blocking:
+    requests overlap because they run on a thread pool sized to max_concurrency, not
+    because of non-blocking I/O. Subclasses only describe the request for each endpoint in
+    build_request.
+    """
+
+    def __init__(self, base_url: str, max_concurrency=None, timeout=10.0):
+        """
+        :param base_url: The API root that build_request paths are relative to.
+        :param max_concurrency: Maximum number of requests in flight, and connections kept in the pool.
+        :param timeout: Timeout in seconds for each request.
+        """
+        super().__init__(max_concurrency)
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.api_keys = {}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @abstractmethod
+    def build_request(self, endpoint: str, symbol: str):
+        """
+        Describe the request for one endpoint.
+
+        :return: The path relative to base_url and a dictionary of query parameters.
+        """
+        pass
+
+    def set_api_keys(self, api_keys: dict):
+        self.api_keys = dict(api_keys)
+
+    def _get(self, path, params):
+        response = self.session.get(f'{self.base_url}/{path.lstrip("/")}', params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def request(self, endpoint: str, symbol: str):
+        """Send the request for one endpoint and return the decoded JSON response."""
+        path, params = self.build_request(endpoint, symbol)
+        return await self._run(self._get, path, params)
+
+    async def fetch_income_statement(self, symbol: str):
+        return await self.request('income_statement', symbol)
+
+    async def fetch_balance_sheet(self, symbol: str):
+        return await self.request('balance_sheet', symbol)
+
+    async def fetch_stock_price_history(self, symbol: str):
+        return await self.request('stock_price_history', symbol)
+
+    async def fetch_news_and_events(self, symbol: str):
+        return await self.request('news_and_events', symbol)
+
+    async def fetch_analyst_reports(self, symbol: str):
+        return await self.request('analyst_reports', symbol)
+
+    async def close(self):
+        # The session is only closed once no request is still using it
+        await super().close()
+        self.session.close()
+
+
+class AsyncFetcherAdapter(_ThreadedFetcher):
+    """Exposes an existing synchronous FinancialDataFetcher as an AsyncFinancialDataFetcher."""
+
+    def __init__(self, fetcher, max_concurrency=None):
+        super().__init__(max_concurrency)
+        self.fetcher = fetcher
+
+    def set_api_keys(self, api_keys: dict):
+        self.fetcher.set_api_keys(api_keys)
+
+    async def fetch_income_statement(self, symbol: str):
+        return await self._run(self.fetcher.fetch_income_statement, symbol)
+
+    async def fetch_balance_sheet(self, symbol: str):
+        return await self._run(self.fetcher.fetch_balance_sheet, symbol)
+
+    async def fetch_stock_price_history(self, symbol: str):
+        return await self._run(self.fetcher.fetch_stock_price_history, symbol)
+
+    async def fetch_news_and_events(self, symbol: str):
+        return await self._run(self.fetcher.fetch_news_and_events, symbol)
+
+    async def fetch_analyst_reports(self, symbol: str):
+        return await self._run(self.fetcher.fetch_analyst_reports, symbol)
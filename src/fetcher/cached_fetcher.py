@@ -0,0 +1,204 @@
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from .abastract_fetcher import ENDPOINTS, FinancialDataFetcher
+
+# Seconds each endpoint's results stay fresh; fundamentals change quarterly at most
+DEFAULT_TTLS = {
+    'income_statement': 7 * 24 * 3600,
+    'balance_sheet': 7 * 24 * 3600,
+    'analyst_reports': 24 * 3600,
+    'news_and_events': 15 * 60,
+    'stock_price_history': 60,
+}
+
+
+class CachedFinancialDataFetcher(FinancialDataFetcher):
+    """
+    Caching wrapper around any FinancialDataFetcher.
+
+    Results are kept in a size-bounded in-memory LRU and, when a cache directory is given,
+    in JSON files on disk so they survive restarts. Each endpoint has its own TTL.
+    Concurrent requests for the same symbol and endpoint are collapsed into a single call
+    to the wrapped fetcher. Callers receive copies of the cached results.
+    """
+
+    def __init__(self, fetcher: FinancialDataFetcher, ttls=None, max_entries=1024, cache_dir=None, clock=time.time):
+        """
+        :param fetcher: The fetcher whose results are cached.
+        :param ttls: Seconds each endpoint's results stay fresh, overriding DEFAULT_TTLS. A TTL of 0 disables caching for that endpoint.
+        :param max_entries: Maximum number of results kept in memory.
+        :param cache_dir: Directory for the on-disk tier, or None to only cache in memory.
+        :param clock: Returns the current time in seconds (for tests).
+        """
+        self.fetcher = fetcher
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.clock = clock
+        self.entries = OrderedDict()  # (endpoint, symbol) -> (fetched_at, value), least recently used first
+        self.in_flight = {}  # (endpoint, symbol) -> Future of the running fetch
+        self.lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.coalesced = self.evictions = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def set_api_keys(self, api_keys: dict):
+        self.fetcher.set_api_keys(api_keys)
+
+    def fetch_income_statement(self, symbol: str):
+        return self.fetch('income_statement', symbol)
+
+    def fetch_balance_sheet(self, symbol: str):
+        return self.fetch('balance_sheet', symbol)
+
+    def fetch_stock_price_history(self, symbol: str):
+        return self.fetch('stock_price_history', symbol)
+
+    def fetch_news_and_events(self, symbol: str):
+        return self.fetch('news_and_events', symbol)
+
+    def fetch_analyst_reports(self, symbol: str):
+        return self.fetch('analyst_reports', symbol)
+
+    def fetch(self, endpoint: str, symbol: str):
+        """
+        Return a fresh cached result for the endpoint, fetching it if needed.
+
+        Every caller gets its own copy of the result, so changing it does not change the cache.
+        """
+        if endpoint not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint: {endpoint}")
+        key = (endpoint, symbol)
+        ttl = self.ttls.get(endpoint, 0)
+        # The lock only guards the in-memory LRU and the counters; disk reads and writes happen outside it
+        with self.lock:
+            entry = self._get_memory(key, ttl)
+            if entry is not None:
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            future = self.in_flight.get(key)
+            if future is not None:
+                # Another thread is already loading this, so wait for its result
+                self.coalesced += 1
+                waiting = True
+            else:
+                future = self.in_flight[key] = Future()
+                waiting = False
+        if waiting:
+            return copy.deepcopy(future.result())
+
+        # Only this thread loads the key until it leaves in_flight, so the disk tier needs no lock of its own
+        try:
+            entry = self._read_disk(key) if ttl else None
+            if entry is not None and self.clock() - entry[0] < ttl:
+                counter = 'disk_hits'
+            else:
+                counter = 'misses'
+                entry = (self.clock(), getattr(self.fetcher, f'fetch_{endpoint}')(symbol))
+                if ttl:
+                    self._write_disk(key, *entry)
+        except BaseException as error:
+            with self.lock:
+                self.misses += 1
+                del self.in_flight[key]
+            future.set_exception(error)
+            raise
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            if ttl:
+                self._remember(key, entry)
+            del self.in_flight[key]
+        future.set_result(entry[1])
+        return copy.deepcopy(entry[1])
+
+    def _get_memory(self, key, ttl):
+        """Look up a fresh (fetched_at, value) entry in memory, dropping it if it expired."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if self.clock() - entry[0] < ttl:
+            self.entries.move_to_end(key)
+            return entry
+        del self.entries[key]
+        return None
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_path(self, key):
+        digest = hashlib.sha256(json.dumps(key).encode()).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f'{key[0]}-{digest}.json')
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'r') as file:
+                record = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if record.get('symbol') != key[1]:
+            return None
+        return record['fetched_at'], record['value']
+
+    def _write_disk(self, key, fetched_at, value):
+        if not self.cache_dir:
+            return
+        try:
+            contents = json.dumps({'symbol': key[1], 'fetched_at': fetched_at, 'value': value})
+        except (TypeError, ValueError):
+            return  # Not JSON serializable, so it is only cached in memory
+        # Write to a temporary file first, so a crash never leaves a torn cache file
+        descriptor, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as file:
+            file.write(contents)
+        os.replace(temp_path, self._disk_path(key))
+
+    def invalidate(self, symbol=None, endpoint=None):
+        """Drop cached results, optionally only for one symbol and/or endpoint."""
+        with self.lock:
+            for key in [key for key in self.entries if symbol in (None, key[1]) and endpoint in (None, key[0])]:
+                del self.entries[key]
+        if not self.cache_dir:
+            return
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json') or (endpoint and not name.startswith(f'{endpoint}-')):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            if symbol is not None:
+                try:
+                    with open(path, 'r') as file:
+                        if json.load(file).get('symbol') != symbol:
+                            continue
+                except (OSError, ValueError):
+                    pass
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Removed by a concurrent invalidate()
+
+    def stats(self):
+        """Return the cache hit/miss counters and the hit rate."""
+        with self.lock:
+            requests = self.hits + self.disk_hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'hit_rate': (requests - self.misses) / requests if requests else 0.0
+            }
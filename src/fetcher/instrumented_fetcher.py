@@ -0,0 +1,67 @@
+import logging
+import time
+
+from .abastract_fetcher import ENDPOINTS, FinancialDataFetcher
+
+try:
+    from ..metrics import REGISTRY, log_event
+except ImportError:
+    from metrics import REGISTRY, log_event
+
+
+class InstrumentedFinancialDataFetcher(FinancialDataFetcher):
+    """
+    Wrapper around any FinancialDataFetcher that records every call in a MetricsRegistry.
+
+    Each call's latency goes to the tradingbot_fetch_seconds histogram and its outcome to
+    the tradingbot_fetch_calls_total counter, labelled with the fetcher name and the
+    endpoint. Wrap the outermost fetcher (e.g. a CachedFinancialDataFetcher) to measure the
+    latency the bot sees, or the innermost one to measure the provider.
+    """
+
+    def __init__(self, fetcher: FinancialDataFetcher, name=None, metrics=None):
+        """
+        :param fetcher: The fetcher whose calls are measured.
+        :param name: The fetcher label in the metrics (the wrapped class name by default).
+        :param metrics: The MetricsRegistry to record into (metrics.REGISTRY by default).
+        """
+        self.fetcher = fetcher
+        self.name = name or type(fetcher).__name__
+        self.metrics = metrics or REGISTRY
+        self.seconds = self.metrics.histogram('tradingbot_fetch_seconds', 'Time spent in data fetcher calls')
+        self.calls = self.metrics.counter('tradingbot_fetch_calls_total', 'Data fetcher calls, by outcome')
+
+    def set_api_keys(self, api_keys: dict):
+        self.fetcher.set_api_keys(api_keys)
+
+    def fetch(self, endpoint: str, symbol: str):
+        """Call the wrapped fetcher for one endpoint and record how it went."""
+        if endpoint not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint: {endpoint}")
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            result = getattr(self.fetcher, f'fetch_{endpoint}')(symbol)
+            outcome = 'ok'
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            self.seconds.observe(elapsed, fetcher=self.name, endpoint=endpoint)
+            self.calls.inc(fetcher=self.name, endpoint=endpoint, outcome=outcome)
+            log_event('fetch', logging.DEBUG, fetcher=self.name, endpoint=endpoint, symbol=symbol,
+                      outcome=outcome, seconds=elapsed)
+
+    def fetch_income_statement(self, symbol: str):
+        return self.fetch('income_statement', symbol)
+
+    def fetch_balance_sheet(self, symbol: str):
+        return self.fetch('balance_sheet', symbol)
+
+    def fetch_stock_price_history(self, symbol: str):
+        return self.fetch('stock_price_history', symbol)
+
+    def fetch_news_and_events(self, symbol: str):
+        return self.fetch('news_and_events', symbol)
+
+    def fetch_analyst_reports(self, symbol: str):
+        return self.fetch('analyst_reports', symbol)
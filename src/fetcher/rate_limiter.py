@@ -0,0 +1,386 @@
+import copy
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+from .abastract_fetcher import ENDPOINTS, FinancialDataFetcher
+
+# Lower runs first: prices drive trading decisions, reports can wait
+DEFAULT_PRIORITIES = {
+    'stock_price_history': 0,
+    'news_and_events': 1,
+    'income_statement': 2,
+    'balance_sheet': 2,
+    'analyst_reports': 3,
+}
+
+
+class ThrottledError(Exception):
+    """Raised by a request when the provider rejects it for exceeding a rate limit."""
+
+    def __init__(self, message='Rate limit exceeded', retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def throttle_delay(error):
+    """
+    Tell whether an exception means the request was throttled.
+
+    :return: None if it was not throttled, otherwise the provider's requested delay in seconds (0 if unknown).
+    """
+    if isinstance(error, ThrottledError):
+        return error.retry_after or 0
+    response = getattr(error, 'response', None)  # requests.HTTPError
+    if getattr(response, 'status_code', None) == 429:
+        try:
+            return float(response.headers.get('Retry-After', 0))
+        except ValueError:
+            return 0
+    return None
+
+
+class SystemClock:
+    """Wall-clock time for the scheduler."""
+
+    def time(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class SimulatedClock:
+    """A clock that only moves when slept on, so schedules can be tested without waiting."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0)
+
+
+class TokenBucket:
+    """
+    Allows `requests` requests per `period` seconds, refilled continuously.
+
+    Up to `burst` requests (all of them by default) may be sent back to back. Providers
+    that count requests in a sliding window need burst=1 to never exceed their limit.
+    """
+
+    def __init__(self, requests, period, clock, burst=None):
+        self.capacity = float(burst or requests)
+        self.rate = requests / period
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock.time()
+
+    def _refill(self):
+        now = self.clock.time()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """Seconds until a request is allowed (0 if one is allowed now)."""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        self._refill()
+        self.tokens -= 1
+
+    def drain(self):
+        """Assume no requests are left, e.g. after the provider throttled us."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class _Request:
+    def __init__(self, call, priority, sequence):
+        self.call = call
+        self.priority = priority
+        self.sequence = sequence
+        self.attempts = 0
+        self.future = Future()
+
+
+class RequestScheduler:
+    """
+    Schedules calls to a rate-limited data provider across several API keys.
+
+    Each key has its own token buckets (e.g. per minute and per day) and the provider may
+    have buckets shared by all keys. Queued requests run highest priority first, on the
+    next key with spare quota (round-robin). A throttled request is retried with
+    exponential backoff while its key is benched for the same time.
+
+    Several threads may call run() at once. Each key runs one request at a time, so with
+    one thread per key the keys are used in parallel.
+    """
+
+    def __init__(self, api_keys, key_limits=(), provider_limits=(), max_retries=5,
+                 backoff_base=1.0, backoff_max=300.0, safety_margin=0.001, clock=None):
+        """
+        :param api_keys: The API keys to rotate through.
+        :param key_limits: (requests, period in seconds[, burst]) limits applying to each key.
+        :param provider_limits: (requests, period in seconds[, burst]) limits shared by all keys.
+        :param max_retries: How often a throttled request is retried before failing.
+        :param backoff_base: The first retry delay in seconds; it doubles with every retry.
+        :param backoff_max: The longest retry delay in seconds.
+        :param safety_margin: Extra seconds to wait past a limit, to absorb rounding and clock differences with the provider.
+        :param clock: SystemClock by default, or a SimulatedClock for tests.
+        """
+        self.clock = clock or SystemClock()
+        self.key_limits = list(key_limits)
+        self.provider_buckets = [TokenBucket(*limit[:2], self.clock, *limit[2:]) for limit in provider_limits]
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.safety_margin = safety_margin
+        self.keys = []
+        self.key_buckets = {}
+        self.benched_until = {}
+        self.set_api_keys(api_keys)
+        self.ready = []  # heap of (priority, sequence, request)
+        self.waiting = []  # heap of (not_before, sequence, request), for retries
+        self.sequence = itertools.count()
+        self.next_key = 0
+        self.lock = threading.RLock()
+        self.busy_keys = set()  # Keys with a request running; each key runs one request at a time
+        self.key_released = threading.Condition(self.lock)
+        self.completed = self.failed = self.throttled = 0
+        self.requests_per_key = {}
+
+    def set_api_keys(self, api_keys):
+        """Replace the keys to rotate through; keys already known keep their quota state."""
+        if not api_keys:
+            raise ValueError("At least one API key is required.")
+        self.keys = list(api_keys)
+        for key in self.keys:
+            if key not in self.key_buckets:
+                self.key_buckets[key] = [TokenBucket(*limit[:2], self.clock, *limit[2:]) for limit in self.key_limits]
+                self.benched_until[key] = 0.0
+
+    def submit(self, call, priority=0):
+        """
+        Queue a request.
+
+        :param call: A function taking the API key to use and returning the result.
+        :param priority: Lower values run first; requests of equal priority run in submission order.
+        :return: A Future for the result.
+        """
+        with self.lock:
+            request = _Request(call, priority, next(self.sequence))
+            heapq.heappush(self.ready, (priority, request.sequence, request))
+            return request.future
+
+    def pending(self):
+        return len(self.ready) + len(self.waiting)
+
+    def _key_wait(self, key, now):
+        return max([self.benched_until[key] - now] + [bucket.wait_time() for bucket in self.key_buckets[key]])
+
+    def _choose_key(self):
+        """
+        Return the next key that may send a request now, or the seconds until an idle key may.
+
+        The seconds are None when every key is running a request.
+        """
+        now = self.clock.time()
+        provider_wait = max([0.0] + [bucket.wait_time() for bucket in self.provider_buckets])
+        waits = []
+        for offset in range(len(self.keys)):
+            key = self.keys[(self.next_key + offset) % len(self.keys)]
+            if key in self.busy_keys:
+                continue
+            wait = max(provider_wait, self._key_wait(key, now))
+            if wait <= 0:
+                self.next_key = (self.next_key + offset + 1) % len(self.keys)
+                return key, 0.0
+            waits.append(wait)
+        return None, min(waits, default=None)
+
+    def _backoff(self, attempts, retry_after):
+        return min(self.backoff_max, max(retry_after or 0, self.backoff_base * 2 ** (attempts - 1)))
+
+    def step(self):
+        """
+        Run the next request, or wait until one may run.
+
+        The lock is only held to pick the request and its key, never while sleeping or
+        calling the provider, so other threads can submit and run requests meanwhile.
+
+        :return: False if nothing is queued.
+        """
+        with self.lock:
+            now = self.clock.time()
+            while self.waiting and self.waiting[0][0] <= now:
+                _, _, request = heapq.heappop(self.waiting)
+                heapq.heappush(self.ready, (request.priority, request.sequence, request))
+            if not self.ready:
+                if not self.waiting:
+                    return False
+                key, wait = None, self.waiting[0][0] - now
+            else:
+                key, wait = self._choose_key()
+                if key is None and self.waiting:
+                    wait = min(self.waiting[0][0] - now, float('inf') if wait is None else wait)
+            if key is None and (wait is None or self.busy_keys):
+                # A busy key may free up first; waiting on the condition releases the lock
+                self.key_released.wait(wait)
+                return True
+            if key is not None:
+                _, _, request = heapq.heappop(self.ready)
+                for bucket in self.provider_buckets + self.key_buckets[key]:
+                    bucket.acquire()
+                self.requests_per_key[key] = self.requests_per_key.get(key, 0) + 1
+                self.busy_keys.add(key)
+        if key is None:
+            self.clock.sleep(wait + self.safety_margin)
+            return True
+
+        request.attempts += 1
+        try:
+            result = request.call(key)
+        except Exception as error:
+            delay = throttle_delay(error)
+            with self.lock:
+                self._release(key)
+                if delay is None:
+                    self.failed += 1
+                    request.future.set_exception(error)
+                    return True
+                self.throttled += 1
+                backoff = self._backoff(request.attempts, delay)
+                self.benched_until[key] = self.clock.time() + backoff
+                for bucket in self.key_buckets[key]:
+                    bucket.drain()
+                if request.attempts > self.max_retries:
+                    self.failed += 1
+                    request.future.set_exception(error)
+                else:
+                    heapq.heappush(self.waiting, (self.clock.time() + backoff, request.sequence, request))
+            return True
+        except BaseException:
+            with self.lock:
+                self._release(key)
+            raise
+        with self.lock:
+            self._release(key)
+            self.completed += 1
+        request.future.set_result(result)
+        return True
+
+    def _release(self, key):
+        self.busy_keys.discard(key)
+        self.key_released.notify_all()
+
+    def run(self, until=None):
+        """
+        Run queued requests until the queue is empty, or until the given Future is done.
+
+        Requests taken by other threads may still be running when this returns.
+        """
+        while until is None or not until.done():
+            if not self.step():
+                break
+
+    def stats(self):
+        with self.lock:
+            return {
+                'completed': self.completed,
+                'failed': self.failed,
+                'throttled': self.throttled,
+                'pending': self.pending(),
+                'requests_per_key': dict(self.requests_per_key)
+            }
+
+
+class ScheduledFinancialDataFetcher(FinancialDataFetcher):
+    """
+    Wraps a FinancialDataFetcher so its calls go through a RequestScheduler.
+
+    Each API key gets its own shallow copy of the wrapped fetcher, given that key once as
+    {provider: key}, and every call goes to the copy for the key the scheduler picked. Calls
+    on different keys can therefore run at the same time without changing each other's
+    key; the wrapped fetcher's set_api_keys() must replace its keys rather than update a
+    shared dictionary in place. Requests from fetch_many are queued together so they run
+    in priority order.
+    """
+
+    def __init__(self, fetcher: FinancialDataFetcher, provider: str, scheduler: RequestScheduler, priorities=None):
+        self.fetcher = fetcher
+        self.provider = provider
+        self.scheduler = scheduler
+        self.priorities = {**DEFAULT_PRIORITIES, **(priorities or {})}
+        self.key_fetchers = {}  # API key -> copy of the fetcher using that key
+        self.lock = threading.Lock()
+
+    def set_api_keys(self, api_keys: dict):
+        """Set the keys to rotate through for this fetcher's provider (a key or a list of keys)."""
+        keys = api_keys[self.provider]
+        self.scheduler.set_api_keys([keys] if isinstance(keys, str) else keys)
+
+    def submit(self, endpoint: str, symbol: str):
+        """Queue one endpoint request and return a Future for its result."""
+        if endpoint not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint: {endpoint}")
+
+        def call(api_key):
+            return getattr(self.fetcher_for(api_key), f'fetch_{endpoint}')(symbol)
+
+        return self.scheduler.submit(call, self.priorities.get(endpoint, 0))
+
+    def fetcher_for(self, api_key):
+        """Return the copy of the wrapped fetcher that uses the given API key."""
+        with self.lock:
+            fetcher = self.key_fetchers.get(api_key)
+            if fetcher is None:
+                fetcher = self.key_fetchers[api_key] = copy.copy(self.fetcher)
+                fetcher.set_api_keys({self.provider: api_key})
+            return fetcher
+
+    def fetch(self, endpoint: str, symbol: str):
+        future = self.submit(endpoint, symbol)
+        self.scheduler.run(until=future)
+        return future.result()
+
+    def fetch_many(self, symbols, endpoints=ENDPOINTS, workers=1):
+        """
+        Fetch several endpoints for several symbols, in priority order.
+
+        :param workers: Threads running the requests. Each key runs one request at a time, so
+            up to one worker per API key adds throughput.
+        :return: A dictionary of results keyed by symbol, then by endpoint. Failed requests hold their exception.
+        """
+        futures = {symbol: {endpoint: self.submit(endpoint, symbol) for endpoint in endpoints} for symbol in symbols}
+        threads = [threading.Thread(target=self.scheduler.run, name=f'RequestScheduler-{index}', daemon=True)
+                   for index in range(1, workers)]
+        for thread in threads:
+            thread.start()
+        self.scheduler.run()
+        for thread in threads:
+            thread.join()
+        return {
+            symbol: {endpoint: future.exception() or future.result() for endpoint, future in by_endpoint.items()}
+            for symbol, by_endpoint in futures.items()
+        }
+
+    def fetch_income_statement(self, symbol: str):
+        return self.fetch('income_statement', symbol)
+
+    def fetch_balance_sheet(self, symbol: str):
+        return self.fetch('balance_sheet', symbol)
+
+    def fetch_stock_price_history(self, symbol: str):
+        return self.fetch('stock_price_history', symbol)
+
+    def fetch_news_and_events(self, symbol: str):
+        return self.fetch('news_and_events', symbol)
+
+    def fetch_analyst_reports(self, symbol: str):
+        return self.fetch('analyst_reports', symbol)
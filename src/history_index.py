@@ -0,0 +1,161 @@
+import bisect
+
+try:
+    from .storage.columnar import ns_to_timestamp, timestamp_to_ns
+except ImportError:
+    from storage.columnar import ns_to_timestamp, timestamp_to_ns
+
+SECOND = 10 ** 9
+# Bucket widths of the downsampled series, in nanoseconds
+RESOLUTIONS = {'minute': 60 * SECOND, 'hour': 3600 * SECOND, 'day': 86400 * SECOND}
+AGGREGATE_COLUMNS = ['timestamp', 'entries', 'account_balance', 'min_balance', 'max_balance',
+                     'positions', 'min_positions', 'max_positions']
+
+
+def _to_ns(timestamp):
+    return timestamp if isinstance(timestamp, int) else timestamp_to_ns(timestamp)
+
+
+class Bucket:
+    """The history entries of one time bucket, reduced to their count, last value and range."""
+
+    __slots__ = ('start', 'entries', 'last_time', 'account_balance', 'min_balance', 'max_balance',
+                 'positions', 'min_positions', 'max_positions')
+
+    def __init__(self, start, time, account_balance, positions):
+        self.start = start
+        self.entries = 1
+        self.last_time = time
+        self.account_balance = self.min_balance = self.max_balance = account_balance
+        self.positions = self.min_positions = self.max_positions = positions
+
+    def add(self, time, account_balance, positions):
+        self.entries += 1
+        if time >= self.last_time:
+            self.last_time = time
+            self.account_balance = account_balance
+            self.positions = positions
+        if account_balance < self.min_balance:
+            self.min_balance = account_balance
+        elif account_balance > self.max_balance:
+            self.max_balance = account_balance
+        if positions < self.min_positions:
+            self.min_positions = positions
+        elif positions > self.max_positions:
+            self.max_positions = positions
+
+    def to_dict(self):
+        return {
+            'timestamp': ns_to_timestamp(self.start),
+            'entries': self.entries,
+            'account_balance': self.account_balance,
+            'min_balance': self.min_balance,
+            'max_balance': self.max_balance,
+            'positions': self.positions,
+            'min_positions': self.min_positions,
+            'max_positions': self.max_positions,
+        }
+
+
+class HistoryIndex:
+    """
+    Sorted time index over the owned stocks history, with downsampled aggregates.
+
+    Keeps every entry's time (nanoseconds since the epoch), account balance and number of
+    positions in parallel lists sorted by time, so range queries bisect integers instead of
+    parsing timestamps. For each resolution the entries are also folded into fixed-width
+    buckets (last, min and max balance and position count) as they are added, so a chart
+    reads one row per bucket however many entries the history holds.
+    """
+
+    def __init__(self, resolutions=None):
+        self.resolutions = dict(RESOLUTIONS if resolutions is None else resolutions)
+        self.clear()
+
+    def clear(self):
+        self.times = []
+        self.balances = []
+        self.positions = []
+        self.buckets = {name: {} for name in self.resolutions}  # resolution -> {bucket start: Bucket}
+        self.bucket_starts = {name: [] for name in self.resolutions}  # Sorted bucket starts per resolution
+
+    def __len__(self):
+        return len(self.times)
+
+    def add(self, timestamp, account_balance, positions):
+        """
+        Index a history entry.
+
+        :param timestamp: ISO timestamp, datetime or nanoseconds since the epoch.
+        :param positions: The number of symbols held after the entry.
+        """
+        time = _to_ns(timestamp)
+        times = self.times
+        if not times or time >= times[-1]:
+            times.append(time)
+            self.balances.append(account_balance)
+            self.positions.append(positions)
+        else:  # Entries normally arrive in time order; keep the lists sorted when one does not
+            index = bisect.bisect_right(times, time)
+            times.insert(index, time)
+            self.balances.insert(index, account_balance)
+            self.positions.insert(index, positions)
+        for name, width in self.resolutions.items():
+            start = time - time % width
+            bucket = self.buckets[name].get(start)
+            if bucket is not None:
+                bucket.add(time, account_balance, positions)
+                continue
+            self.buckets[name][start] = Bucket(start, time, account_balance, positions)
+            starts = self.bucket_starts[name]
+            if not starts or start > starts[-1]:
+                starts.append(start)
+            else:
+                bisect.insort(starts, start)
+
+    def rebuild(self, points):
+        """Start over from (timestamp, account balance, positions) tuples."""
+        self.clear()
+        for timestamp, account_balance, positions in points:
+            self.add(timestamp, account_balance, positions)
+
+    def range(self, start=None, end=None):
+        """Return the (first, stop) indexes of the entries from start to end, both inclusive."""
+        first = 0 if start is None else bisect.bisect_left(self.times, _to_ns(start))
+        stop = len(self.times) if end is None else bisect.bisect_right(self.times, _to_ns(end))
+        return first, max(first, stop)
+
+    def query(self, start=None, end=None, limit=None, offset=0):
+        """
+        List the entries within a time range, oldest first.
+
+        :return: Dictionaries with the entry's timestamp, account_balance and positions (the number of symbols held).
+        """
+        first, stop = self.range(start, end)
+        first += offset
+        if limit is not None:
+            stop = min(stop, first + limit)
+        return [{'timestamp': ns_to_timestamp(self.times[index]), 'account_balance': self.balances[index],
+                 'positions': self.positions[index]} for index in range(first, stop)]
+
+    def series(self, resolution='hour', start=None, end=None):
+        """
+        Return the downsampled history: one row per bucket holding entries, oldest first.
+
+        :param resolution: One of the index's resolutions ('minute', 'hour' or 'day' by default).
+        :param start: Only include buckets ending after this time.
+        :param end: Only include buckets starting at or before this time.
+        :return: Dictionaries with the keys in AGGREGATE_COLUMNS; 'timestamp' is the start of the
+            bucket and 'account_balance' and 'positions' are the values of its last entry.
+        """
+        if resolution not in self.resolutions:
+            raise ValueError(f"Unknown resolution: {resolution}. Use one of {', '.join(self.resolutions)}.")
+        width = self.resolutions[resolution]
+        starts = self.bucket_starts[resolution]
+        first = 0
+        if start is not None:
+            time = _to_ns(start)
+            first = bisect.bisect_left(starts, time - time % width)
+        stop = len(starts) if end is None else bisect.bisect_right(starts, _to_ns(end))
+        buckets = self.buckets[resolution]
+        return [buckets[bucket_start].to_dict() for bucket_start in starts[first:stop]]
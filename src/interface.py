@@ -1,9 +1,34 @@
+import atexit
+import logging
+import os
+
 import gradio as gr
 import pandas as pd
 from trading_database import TradingDatabase
+from data_views import TRANSACTION_COLUMNS, OwnedStocksHistoryView, RecentTransactions, TransactionsView, paginate
+from history_index import AGGREGATE_COLUMNS, RESOLUTIONS
+from order_book import ORDER_COLUMNS, ORDER_TYPES, OrderBook
+from metrics import REGISTRY, configure_logging, log_event, start_metrics_server
+
+PNL_COLUMNS = ["symbol", "quantity", "average_cost", "cost_basis", "market_price", "market_value",
+               "unrealized_pnl", "realized_pnl", "lots"]
+LIVE_TRANSACTIONS = 20
+# Seconds between updates when nothing changes; each update lets Gradio end the stream of a closed page
+STREAM_HEARTBEAT = 15
+METRICS_COLUMNS = ["metric", "labels", "value", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"]
+
+# Initialize the trading database; Gradio runs event handlers concurrently, so disk writes
+# go through the database's background writer thread
+db = TradingDatabase(background_writer=True)
+# The writer is a daemon thread, so writes it still holds would be lost when the process exits
+atexit.register(db.close)
 
-# Initialize the trading database
-db = TradingDatabase()
+# Cached DataFrames for the View Data tab, updated incrementally as new rows arrive
+transactions_view = TransactionsView(db)
+history_view = OwnedStocksHistoryView(db)
+
+# Resting limit, stop and take-profit orders, filled against the prices applied in the Orders tab
+order_book = OrderBook(db)
 
 def buy_stock(symbol, quantity, price):
     try:
@@ -19,20 +44,105 @@ def sell_stock(symbol, quantity, price):
     except ValueError as e:
         return str(e)
 
-def view_data(database):
-    """Fetch data from the selected database and return it as a pandas DataFrame."""
+def view_data(database, symbol="", start="", end="", sort_by="", descending=False, page=1, page_size=50):
+    """
+    Fetch one filtered, sorted page of the selected database.
+
+    :return: The page as a pandas DataFrame, a status line and the page number actually shown.
+    """
+    sort_by = sort_by or None
     if database == "Transactions":
-        data = db.list_transactions()
-        df = pd.DataFrame(data)
+        df, rows, total_pages = transactions_view.page(symbol, start, end, sort_by, descending, page, page_size)
     elif database == "Owned Stocks":
         data = db.list_owned_stocks()
         df = pd.DataFrame.from_dict(data, orient='index').reset_index().rename(columns={'index': 'Symbol'})
+        if symbol and symbol.strip() and len(df):
+            df = df[df['Symbol'].str.upper() == symbol.strip().upper()]
+        rows = len(df)
+        df, total_pages = paginate(df, sort_by, descending, page, page_size)
     elif database == "Owned Stocks History":
-        data = db.list_owned_stocks_history()
-        df = pd.DataFrame(data)
+        df, rows, total_pages = history_view.page(symbol, start, end, sort_by, descending, page, page_size)
     else:
-        df = pd.DataFrame()  # Empty DataFrame for unsupported databases
-    return df
+        return pd.DataFrame(), "No data.", 1  # Empty DataFrame for unsupported databases
+    page = min(max(int(page or 1), 1), total_pages)
+    return df, f"Page {page} of {total_pages} ({rows} rows)", page
+
+def parse_prices(text):
+    """Parse market prices given as "AAPL=190.5, MSFT=410" into a dictionary."""
+    prices = {}
+    for item in (text or "").replace(";", ",").split(","):
+        if not item.strip():
+            continue
+        symbol, separator, price = item.partition("=")
+        if not separator:
+            raise ValueError(f"Expected SYMBOL=PRICE, got: {item.strip()}")
+        prices[symbol.strip().upper()] = float(price)
+    return prices
+
+def view_pnl(prices_text=""):
+    """Return the open positions with their P&L as a DataFrame, and the portfolio totals."""
+    try:
+        prices = parse_prices(prices_text)
+    except ValueError as e:
+        return pd.DataFrame(columns=PNL_COLUMNS), str(e)
+    summary = db.get_portfolio_pnl(prices)
+    df = pd.DataFrame(list(summary['positions'].values()), columns=PNL_COLUMNS)
+    totals = (f"Realized P&L: ${summary['realized_pnl']:,.2f} | Unrealized P&L: ${summary['unrealized_pnl']:,.2f} | "
+              f"Total P&L: ${summary['total_pnl']:,.2f} | Market Value: ${summary['market_value']:,.2f}")
+    return df.round(4), totals
+
+def view_history_chart(resolution="hour", start="", end=""):
+    """Return the downsampled balance and position count series for the History Chart tab, and a summary."""
+    start, end = (start or "").strip() or None, (end or "").strip() or None
+    if end and len(end) <= 10:
+        end += "T23:59:59.999999"  # A bare date includes that whole day
+    try:
+        rows = db.query_history_aggregates(resolution, start, end)
+    except ValueError as e:
+        empty = pd.DataFrame(columns=["time", "value", "series"])
+        return empty, empty, str(e)
+    df = pd.DataFrame(rows, columns=AGGREGATE_COLUMNS)
+    df["time"] = pd.to_datetime(df["timestamp"], format="ISO8601")
+    # Long format, one line per series
+    balance = df.melt(id_vars="time", value_vars=["account_balance", "min_balance", "max_balance"],
+                      var_name="series", value_name="value")
+    positions = df.melt(id_vars="time", value_vars=["positions", "max_positions"], var_name="series", value_name="value")
+    return balance, positions, f"{len(df)} {resolution} buckets from {int(df['entries'].sum())} history entries"
+
+def place_order(symbol, side, order_type, quantity, price):
+    try:
+        order_id = order_book.place_order(symbol, side, order_type, quantity, price)
+        return f"Placed {order_type} order {order_id}: {side} {quantity} of {symbol} at ${price}."
+    except ValueError as e:
+        return str(e)
+
+def cancel_order(order_id):
+    if order_id and order_book.cancel_order(int(order_id)):
+        return f"Cancelled order {int(order_id)}."
+    return f"No open order with ID {order_id}."
+
+def apply_price(symbol, price):
+    """Match the open orders against a price tick and report the fills."""
+    if not symbol or not price:
+        return "Enter a symbol and a price."
+    fills = order_book.on_tick(symbol, price)
+    if not fills:
+        return f"No orders triggered at ${price}."
+    return "Filled orders " + ", ".join(f"{order['id']} (transaction {order['transaction_id']})" for order in fills) + "."
+
+def view_orders(status="open"):
+    """Return the orders with the given status ("all" for every order) and the reservations held by open orders."""
+    orders = order_book.list_orders(status=None if status == "all" else status)
+    reserved = (f"Open orders: {order_book.open_count} | Reserved balance: ${order_book.reserved_balance:,.2f} | "
+                f"Available balance: ${order_book.available_balance():,.2f}")
+    return pd.DataFrame(orders, columns=ORDER_COLUMNS), reserved
+
+def view_metrics(name_filter=""):
+    """Return the recorded metrics as a DataFrame, optionally only those whose name contains name_filter."""
+    df = pd.DataFrame(REGISTRY.summary(), columns=METRICS_COLUMNS)
+    if name_filter and name_filter.strip():
+        df = df[df['metric'].str.contains(name_filter.strip(), regex=False)]
+    return df.round({'mean_ms': 3, 'p50_ms': 3, 'p95_ms': 3, 'p99_ms': 3})
 
 def add_balance(amount):
     try:
@@ -72,13 +182,42 @@ def update_balance_label():
     """Update the balance label with the current account balance."""
     return f"Current Balance: ${db.get_account_balance()}"
 
-def create_interface():
+def stream_updates():
+    """Stream the balance label and the latest transactions, updated from the database's change feed."""
+    recent = RecentTransactions(db, LIVE_TRANSACTIONS)
+    try:
+        while True:
+            yield f"Current Balance: ${recent.account_balance}", recent.frame()
+            recent.update(timeout=STREAM_HEARTBEAT)
+            if db.changes.closed:
+                return
+    finally:
+        recent.close()
+
+def create_interface(metrics_port=None):
+    """
+    Build and launch the interface.
+
+    :param metrics_port: Port serving the metrics in the Prometheus text format, from the
+        METRICS_PORT environment variable by default (9100); 0 disables the endpoint.
+    """
+    configure_logging(os.environ.get('LOG_LEVEL', 'INFO'))
+    if metrics_port is None:
+        metrics_port = int(os.environ.get('METRICS_PORT', 9100))
+    if metrics_port:
+        try:
+            start_metrics_server(metrics_port)
+        except OSError as e:
+            log_event('metrics_server_failed', logging.WARNING, port=metrics_port, error=str(e))
+
     with gr.Blocks() as demo:
         gr.Markdown("# Trading Bot Interface")
 
         # Display current balance
         with gr.Row():
             balance_label = gr.Label(value=update_balance_label(), elem_id="balance_label")
+        with gr.Accordion("Latest Transactions", open=False):
+            live_transactions = gr.Dataframe(headers=TRANSACTION_COLUMNS, interactive=False)
 
         with gr.Tab("Trade"):
             with gr.Row():
@@ -100,14 +239,116 @@ def create_interface():
                               inputs=[symbol_input, quantity_input, price_input], 
                               outputs=[sell_output, balance_label])
 
+        with gr.Tab("Orders"):
+            with gr.Row():
+                order_symbol_input = gr.Textbox(label="Symbol")
+                order_side_input = gr.Radio(choices=["buy", "sell"], value="buy", label="Side")
+                order_type_input = gr.Dropdown(choices=list(ORDER_TYPES), value="limit", label="Order Type")
+                order_quantity_input = gr.Number(label="Quantity", step=1, minimum=1)
+                order_price_input = gr.Number(label="Limit / Stop / Target Price", step=0.01, minimum=0.01)
+            with gr.Row():
+                place_order_button = gr.Button("Place Order")
+                cancel_order_input = gr.Number(label="Order ID", precision=0)
+                cancel_order_button = gr.Button("Cancel Order")
+            with gr.Row():
+                tick_symbol_input = gr.Textbox(label="Symbol")
+                tick_price_input = gr.Number(label="Market Price", step=0.01, minimum=0.01)
+                apply_price_button = gr.Button("Apply Price")
+            order_output = gr.Textbox(label="Order Status")
+            with gr.Row():
+                orders_status_filter = gr.Dropdown(choices=["open", "filled", "cancelled", "rejected", "all"],
+                                                   value="open", label="Show")
+                orders_refresh_button = gr.Button("Refresh")
+            orders_reserved = gr.Markdown()
+            orders_output = gr.Dataframe(headers=ORDER_COLUMNS, value=[], type="pandas")
+
+            orders_outputs = [orders_output, orders_reserved]
+            place_order_button.click(place_order, inputs=[order_symbol_input, order_side_input, order_type_input,
+                                                          order_quantity_input, order_price_input], outputs=order_output
+                                     ).then(view_orders, inputs=orders_status_filter, outputs=orders_outputs)
+            cancel_order_button.click(cancel_order, inputs=cancel_order_input, outputs=order_output
+                                      ).then(view_orders, inputs=orders_status_filter, outputs=orders_outputs)
+            apply_price_button.click(apply_price, inputs=[tick_symbol_input, tick_price_input], outputs=order_output
+                                     ).then(view_orders, inputs=orders_status_filter, outputs=orders_outputs)
+            orders_refresh_button.click(view_orders, inputs=orders_status_filter, outputs=orders_outputs)
+            orders_status_filter.change(view_orders, inputs=orders_status_filter, outputs=orders_outputs)
+
         with gr.Tab("View Data"):
             database_selector = gr.Dropdown(
                 choices=["Transactions", "Owned Stocks", "Owned Stocks History"],
                 label="Select Database"
             )
+            with gr.Row():
+                symbol_filter = gr.Textbox(label="Symbol")
+                start_filter = gr.Textbox(label="From (YYYY-MM-DD)")
+                end_filter = gr.Textbox(label="To (YYYY-MM-DD)")
+            with gr.Row():
+                sort_selector = gr.Dropdown(
+                    choices=["", "id", "symbol", "quantity", "price", "transaction_type", "timestamp",
+                             "account_balance", "positions", "purchase_price"],
+                    value="", label="Sort By"
+                )
+                descending_input = gr.Checkbox(label="Descending")
+                page_size_input = gr.Number(label="Page Size", value=50, step=1, minimum=1, precision=0)
+                page_input = gr.Number(label="Page", value=1, step=1, minimum=1, precision=0)
+            with gr.Row():
+                previous_button = gr.Button("Previous Page")
+                refresh_button = gr.Button("Refresh")
+                next_button = gr.Button("Next Page")
+            page_status = gr.Markdown()
             data_output = gr.Dataframe(headers=["ID", "Symbol", "Quantity", "Price", "Timestamp"], value=[], type="pandas")
-            
-            database_selector.change(view_data, inputs=database_selector, outputs=data_output)
+
+            view_inputs = [database_selector, symbol_filter, start_filter, end_filter,
+                           sort_selector, descending_input, page_input, page_size_input]
+            view_outputs = [data_output, page_status, page_input]
+            for control in (database_selector, symbol_filter, start_filter, end_filter,
+                            sort_selector, descending_input, page_size_input):
+                # Filters and sorting start again from the first page
+                control.change(lambda *args: view_data(*args[:6], 1, args[7]),
+                               inputs=view_inputs, outputs=view_outputs)
+            refresh_button.click(view_data, inputs=view_inputs, outputs=view_outputs)
+            previous_button.click(lambda *args: view_data(*args[:6], int(args[6] or 1) - 1, args[7]),
+                                  inputs=view_inputs, outputs=view_outputs)
+            next_button.click(lambda *args: view_data(*args[:6], int(args[6] or 1) + 1, args[7]),
+                              inputs=view_inputs, outputs=view_outputs)
+
+        with gr.Tab("P&L"):
+            with gr.Row():
+                prices_input = gr.Textbox(label="Market Prices (e.g. AAPL=190.5, MSFT=410)")
+                pnl_refresh_button = gr.Button("Refresh")
+            gr.Markdown(f"Lots are closed {db.lot_method.upper()}. Positions without a market price are valued at their last traded price.")
+            pnl_totals = gr.Markdown()
+            pnl_output = gr.Dataframe(headers=PNL_COLUMNS, value=[], type="pandas")
+
+            pnl_refresh_button.click(view_pnl, inputs=prices_input, outputs=[pnl_output, pnl_totals])
+            prices_input.submit(view_pnl, inputs=prices_input, outputs=[pnl_output, pnl_totals])
+
+        with gr.Tab("History Chart"):
+            with gr.Row():
+                chart_resolution = gr.Dropdown(choices=list(RESOLUTIONS), value="hour", label="Resolution")
+                chart_start = gr.Textbox(label="From (YYYY-MM-DD or timestamp)")
+                chart_end = gr.Textbox(label="To (YYYY-MM-DD or timestamp)")
+                chart_refresh_button = gr.Button("Refresh")
+            chart_summary = gr.Markdown()
+            balance_plot = gr.LinePlot(x="time", y="value", color="series", title="Account Balance")
+            positions_plot = gr.LinePlot(x="time", y="value", color="series", title="Positions Held")
+
+            chart_inputs = [chart_resolution, chart_start, chart_end]
+            chart_outputs = [balance_plot, positions_plot, chart_summary]
+            chart_refresh_button.click(view_history_chart, inputs=chart_inputs, outputs=chart_outputs)
+            chart_resolution.change(view_history_chart, inputs=chart_inputs, outputs=chart_outputs)
+
+        with gr.Tab("Metrics"):
+            with gr.Row():
+                metrics_filter = gr.Textbox(label="Metric Name Contains")
+                metrics_refresh_button = gr.Button("Refresh")
+            gr.Markdown("Latencies are estimated from histogram buckets. " + (
+                f"Prometheus can scrape the same metrics from port {metrics_port} at /metrics." if metrics_port
+                else "The Prometheus endpoint is disabled."))
+            metrics_output = gr.Dataframe(headers=METRICS_COLUMNS, value=view_metrics(), type="pandas")
+
+            metrics_refresh_button.click(view_metrics, inputs=metrics_filter, outputs=metrics_output)
+            metrics_filter.change(view_metrics, inputs=metrics_filter, outputs=metrics_output)
 
         with gr.Tab("Account Balance"):
             balance_input = gr.Number(label="Amount to Add", step=0.01, minimum=0)
@@ -135,8 +376,8 @@ def create_interface():
                                 inputs=data_selector, 
                                 outputs=[delete_output, balance_label])
         
-        # Update balance label on interface load
-        demo.load(lambda: update_balance_label())
+        # Stream balance and trade updates from the change feed for as long as the page is open
+        demo.load(stream_updates, outputs=[balance_label, live_transactions], concurrency_limit=None)
 
     demo.launch()
 
@@ -0,0 +1,176 @@
+from collections import deque
+
+LOT_METHODS = ('fifo', 'lifo', 'average')
+
+
+class Position:
+    """The open lots of one symbol with their running totals."""
+
+    __slots__ = ('symbol', 'lots', 'quantity', 'cost_basis', 'realized_pnl', 'last_price')
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.lots = deque()  # [quantity, price, transaction_id] lists, oldest first
+        self.quantity = 0
+        self.cost_basis = 0.0  # What the open lots cost
+        self.realized_pnl = 0.0
+        self.last_price = None  # Price of the latest trade, for unrealized P&L without a quote
+
+    @property
+    def average_cost(self):
+        return self.cost_basis / self.quantity if self.quantity else 0.0
+
+    def to_dict(self, price=None):
+        """
+        :param price: The current market price (the last traded price by default).
+        :return: The position's quantity, cost and realized and unrealized P&L.
+        """
+        price = self.last_price if price is None else price
+        market_value = self.quantity * price if price is not None else None
+        return {
+            'symbol': self.symbol,
+            'quantity': self.quantity,
+            'average_cost': self.average_cost,
+            'cost_basis': self.cost_basis,
+            'market_price': price,
+            'market_value': market_value,
+            'realized_pnl': self.realized_pnl,
+            'unrealized_pnl': market_value - self.cost_basis if market_value is not None else 0.0,
+            'lots': len(self.lots),
+        }
+
+
+class PositionLedger:
+    """
+    Per-symbol tax lots, updated with every trade.
+
+    Buys open lots and sells close them, oldest first ('fifo'), newest first ('lifo') or
+    against the running average cost ('average'). Realized P&L is accumulated as lots are
+    closed, and cost basis is kept per symbol, so a position's P&L is O(1) and the portfolio
+    summary is O(open positions), with no replay of past transactions.
+    """
+
+    def __init__(self, method='fifo'):
+        if method not in LOT_METHODS:
+            raise ValueError(f"Unknown lot method: {method}. Use one of {', '.join(LOT_METHODS)}.")
+        self.method = method
+        self.positions = {}  # symbol -> Position, including closed positions with realized P&L
+        self.open_symbols = set()
+        self.realized_pnl = 0.0
+
+    def _position(self, symbol):
+        position = self.positions.get(symbol)
+        if position is None:
+            position = self.positions[symbol] = Position(symbol)
+        return position
+
+    def apply(self, transaction):
+        """Update the lots with a transaction (a dict with symbol, quantity, price and transaction_type)."""
+        position = self._position(transaction['symbol'])
+        quantity, price = transaction['quantity'], transaction['price']
+        position.last_price = price
+        if transaction['transaction_type'] == 'buy':
+            self._open(position, quantity, price, transaction.get('id'))
+        else:
+            realized = self._close(position, quantity, price)
+            position.realized_pnl += realized
+            self.realized_pnl += realized
+        if position.quantity > 0:
+            self.open_symbols.add(position.symbol)
+        else:
+            self.open_symbols.discard(position.symbol)
+
+    def _open(self, position, quantity, price, transaction_id):
+        if self.method == 'average' and position.lots:
+            lot = position.lots[0]
+            lot[0] += quantity
+            lot[1] = (position.cost_basis + quantity * price) / lot[0]
+        else:
+            position.lots.append([quantity, price, transaction_id])
+        position.quantity += quantity
+        position.cost_basis += quantity * price
+
+    def _close(self, position, quantity, price):
+        """Take quantity out of the lots and return the realized P&L."""
+        lots = position.lots
+        realized = 0.0
+        remaining = quantity
+        while remaining > 0 and lots:
+            lot = lots[-1] if self.method == 'lifo' else lots[0]
+            taken = min(lot[0], remaining)
+            realized += taken * (price - lot[1])
+            position.cost_basis -= taken * lot[1]
+            lot[0] -= taken
+            remaining -= taken
+            if lot[0] <= 0:
+                if self.method == 'lifo':
+                    lots.pop()
+                else:
+                    lots.popleft()
+        # Selling more than the lots hold (e.g. after transactions were cleared) realizes nothing on the rest
+        position.quantity = max(position.quantity - quantity, 0)
+        if not lots:
+            position.quantity = 0
+            position.cost_basis = 0.0  # Drop rounding leftovers
+        return realized
+
+    def rebuild(self, transactions, owned_stocks=None):
+        """
+        Start over from a sequence of transactions, in ID order.
+
+        :param owned_stocks: The current positions; a symbol whose replayed quantity differs
+            (e.g. because transactions were cleared but the stocks kept) is reset to a single lot
+            at its purchase price, so the ledger always agrees with the owned stocks.
+        """
+        self.positions = {}
+        self.open_symbols = set()
+        self.realized_pnl = 0.0
+        for transaction in transactions:
+            self.apply(transaction)
+        if owned_stocks is None:
+            return
+        for symbol in set(self.open_symbols) | set(owned_stocks):
+            stock = owned_stocks.get(symbol)
+            position = self._position(symbol)
+            if stock is not None and stock['quantity'] == position.quantity:
+                continue
+            position.lots.clear()
+            position.quantity, position.cost_basis = 0, 0.0
+            self.open_symbols.discard(symbol)
+            if stock is not None:
+                self._open(position, stock['quantity'], stock['purchase_price'], None)
+                self.open_symbols.add(symbol)
+                if position.last_price is None:
+                    position.last_price = stock['purchase_price']
+
+    def position(self, symbol, price=None):
+        """Return one symbol's position and P&L, or None if it was never traded."""
+        position = self.positions.get(symbol)
+        return position.to_dict(price) if position is not None else None
+
+    def lots(self, symbol):
+        """Return the open lots of a symbol, in the order they were opened."""
+        position = self.positions.get(symbol)
+        if position is None:
+            return []
+        return [{'quantity': quantity, 'price': price, 'transaction_id': transaction_id}
+                for quantity, price, transaction_id in position.lots]
+
+    def summary(self, current_prices=None):
+        """
+        Summarize the open positions and the P&L of the whole portfolio.
+
+        :param current_prices: Market prices by symbol; positions without one are valued at their last traded price.
+        :return: A dictionary with the open 'positions' by symbol and portfolio totals.
+        """
+        current_prices = current_prices or {}
+        positions = {symbol: self.positions[symbol].to_dict(current_prices.get(symbol)) for symbol in sorted(self.open_symbols)}
+        unrealized = sum(position['unrealized_pnl'] for position in positions.values())
+        return {
+            'positions': positions,
+            'cost_basis': sum(position['cost_basis'] for position in positions.values()),
+            'market_value': sum(position['market_value'] or 0.0 for position in positions.values()),
+            'realized_pnl': self.realized_pnl,
+            'unrealized_pnl': unrealized,
+            'total_pnl': self.realized_pnl + unrealized,
+        }
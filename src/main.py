@@ -1,8 +1,14 @@
-from interface import create_interface
+import sys
+
 
 def main():
-    """Main function to launch the Gradio interface."""
+    """Launch the Gradio interface, or run a headless command when arguments are given (see cli.py)."""
+    if len(sys.argv) > 1:
+        # Commands skip the interface module, which imports gradio and pandas and opens the database on import
+        from cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+    from interface import create_interface
     create_interface()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,447 @@
+"""
+In-process metrics and structured logging.
+
+Counters and latency histograms live in a MetricsRegistry (REGISTRY by default, which the
+database, fetchers and bots record into). A registry renders itself in the Prometheus text
+format, which start_metrics_server() serves over HTTP, and as summary rows for the
+interface's Metrics tab. Events are logged through the 'tradingbot' logger; with
+configure_logging() they are written as one JSON object per line.
+"""
+import datetime
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Seconds, from 50 microseconds (an in-memory trade) to 10 seconds (rewriting a large file)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Observations a histogram series buffers before counting them into its buckets
+FOLD_SIZE = 1024
+
+logger = logging.getLogger('tradingbot')
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    """One labelled series of a Counter."""
+
+    __slots__ = ('lock', 'value')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+def _take(pending, multiple=1):
+    """
+    Remove the values buffered in a list and return them as a NumPy array.
+
+    Appending and extending are single calls under the GIL, so other threads may keep adding
+    values while they are taken: only the ones already there (a whole number of `multiple`) are removed.
+    """
+    size = len(pending) // multiple * multiple
+    values = np.array(pending[:size], dtype=np.float64)
+    del pending[:size]
+    return values
+
+
+class _HistogramChild:
+    """
+    One labelled series of a Histogram.
+
+    Observations are appended to a buffer (without taking the lock) and counted into the
+    buckets in batches, or when the series is read, so observing on a hot path is cheap.
+    """
+
+    __slots__ = ('lock', 'buckets', 'bounds', 'pending', 'groups', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets):
+        self.lock = threading.Lock()
+        self.buckets = buckets
+        self.bounds = np.array(buckets)
+        self.pending = []
+        self.groups = []  # The _SeriesGroups this series is in, which buffer observations of their own
+        self.counts = np.zeros(len(buckets) + 1, dtype=np.int64)  # Per bucket, the last one for values above every bound
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.pending.append(value)
+        if len(self.pending) >= FOLD_SIZE:
+            self._fold()
+
+    def _fold(self):
+        """Count the pending observations, including those buffered by its groups, into the buckets."""
+        for group in self.groups:
+            group._fold()
+        with self.lock:
+            self._count(_take(self.pending))
+
+    def _count(self, values):
+        """Count a NumPy array of observations into the buckets (with the lock held)."""
+        if len(values):
+            self._add(np.bincount(np.searchsorted(self.bounds, values, side='left'), minlength=len(self.counts)),
+                      len(values), float(values.sum()))
+
+    def _add(self, counts, count, total):
+        """Add observations already counted per bucket (with the lock held)."""
+        self.counts += counts
+        self.count += count
+        self.sum += total
+
+    def snapshot(self):
+        """The bucket counts, count and sum, including every observation so far."""
+        self._fold()
+        with self.lock:
+            return self.counts.tolist(), self.count, self.sum
+
+    def time(self):
+        """Context manager observing the seconds spent in its with block."""
+        return _Timer(self)
+
+    def quantile(self, q):
+        """Estimate a quantile (0 to 1) by interpolating within its bucket; None without observations."""
+        counts, count, _ = self.snapshot()
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and seen + bucket_count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]  # Above the largest bound, which is all we know
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class _SeriesGroup:
+    """
+    Several series of a histogram observed together, such as the stages of one bot run.
+
+    One observe() call buffers a value for every series as a row, which costs about as
+    much as a single series' observe().
+    """
+
+    __slots__ = ('lock', 'children', 'pending', 'fold_size')
+
+    def __init__(self, children):
+        self.lock = threading.Lock()
+        self.children = children
+        self.pending = []  # The rows, one value per series, one after the other
+        self.fold_size = FOLD_SIZE * len(children)
+        for child in children:
+            child.groups.append(self)
+
+    def observe(self, *values):
+        """Observe one value per series, in the order of the series."""
+        self.pending.extend(values)
+        if len(self.pending) >= self.fold_size:
+            self._fold()
+
+    def _fold(self):
+        with self.lock:
+            rows = _take(self.pending, len(self.children)).reshape(-1, len(self.children))
+            if not len(rows):
+                return
+            # Bucket every series at once, numbering the buckets of series i from i * per_series
+            bounds = self.children[0].bounds
+            per_series = len(bounds) + 1
+            indices = np.searchsorted(bounds, rows, side='left') + np.arange(len(self.children)) * per_series
+            counts = np.bincount(indices.ravel(), minlength=per_series * len(self.children)).reshape(len(self.children), per_series)
+            for child, child_counts, total in zip(self.children, counts, rows.sum(axis=0).tolist()):
+                with child.lock:
+                    child._add(child_counts, len(rows), total)
+
+
+class _Timer:
+    """Times a with block into a histogram series (a plain class, as it sits on hot paths)."""
+
+    __slots__ = ('series', 'started')
+
+    def __init__(self, series):
+        self.series = series
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.series.observe(time.perf_counter() - self.started)
+
+
+class _Metric:
+    type = None
+    child_class = None
+
+    def __init__(self, name, documentation=''):
+        self.name = name
+        self.documentation = documentation
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def _new_child(self):
+        return self.child_class()
+
+    def labels(self, **labels):
+        """Return the series for the given label values, so hot paths can skip the label lookup."""
+        key = _label_key(labels)
+        child = self.children.get(key)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(key, self._new_child())
+        return child
+
+    def series(self):
+        """The (label key, series) pairs, in a stable order."""
+        with self.lock:
+            return sorted(self.children.items())
+
+
+class Counter(_Metric):
+    """A value that only goes up, such as a number of calls or bytes written."""
+
+    type = 'counter'
+    child_class = _CounterChild
+
+    def inc(self, amount=1, **labels):
+        self.labels(**labels).inc(amount)
+
+    def value(self, **labels):
+        child = self.children.get(_label_key(labels))
+        return child.value if child is not None else 0
+
+    def render(self):
+        return [f'{self.name}{_format_labels(key)} {_format_value(child.value)}' for key, child in self.series()]
+
+
+class Histogram(_Metric):
+    """A distribution of observed values, such as latencies in seconds, counted in buckets."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation='', buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        self.groups = {}
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    def time(self, **labels):
+        """Context manager observing the seconds spent in its with block."""
+        return self.labels(**labels).time()
+
+    def group(self, label, values, **labels):
+        """
+        Return the series for several values of one label, to observe together with one call.
+
+        :param label: The label that tells the series apart, e.g. 'stage'.
+        :param values: Its value for each series, in the order values are given to observe().
+        """
+        key = (label, tuple(values), _label_key(labels))
+        group = self.groups.get(key)
+        if group is None:
+            children = [self.labels(**labels, **{label: value}) for value in values]
+            with self.lock:
+                group = self.groups.get(key)
+                if group is None:
+                    group = self.groups[key] = _SeriesGroup(children)
+        return group
+
+    def count(self, **labels):
+        child = self.children.get(_label_key(labels))
+        return child.snapshot()[1] if child is not None else 0
+
+    def sum(self, **labels):
+        child = self.children.get(_label_key(labels))
+        return child.snapshot()[2] if child is not None else 0.0
+
+    def quantile(self, q, **labels):
+        child = self.children.get(_label_key(labels))
+        return child.quantile(q) if child is not None else None
+
+    def render(self):
+        lines = []
+        for key, child in self.series():
+            counts, count, total = child.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_format_labels(key, [("le", _format_value(bound))])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    A named set of counters and histograms.
+
+    Latencies on hot paths (TradingDatabase operations and TrackingTradingBot stages) are
+    not recorded while `enabled` is False.
+    """
+
+    def __init__(self, enabled=True):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.enabled = enabled
+
+    def _get(self, metric_class, name, *args):
+        metric = self.metrics.get(name)
+        if metric is None:
+            with self.lock:
+                metric = self.metrics.get(name)
+                if metric is None:
+                    metric = self.metrics[name] = metric_class(name, *args)
+        if not isinstance(metric, metric_class):
+            raise ValueError(f"Metric {name} is already registered as a {metric.type}.")
+        return metric
+
+    def counter(self, name, documentation=''):
+        """Return the counter with this name, creating it on first use."""
+        return self._get(Counter, name, documentation)
+
+    def histogram(self, name, documentation='', buckets=LATENCY_BUCKETS):
+        """Return the histogram with this name, creating it on first use."""
+        return self._get(Histogram, name, documentation, buckets)
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            metrics = sorted(self.metrics.items())
+        for name, metric in metrics:
+            if metric.documentation:
+                lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """
+        One row per series, for display.
+
+        :return: A list of dictionaries with the 'metric', its 'labels' and either the counter
+            'value' or the histogram 'count' with 'mean_ms', 'p50_ms', 'p95_ms' and 'p99_ms'.
+        """
+        rows = []
+        with self.lock:
+            metrics = sorted(self.metrics.items())
+        for name, metric in metrics:
+            for key, child in metric.series():
+                row = {'metric': name, 'labels': ', '.join(f'{label}={value}' for label, value in key)}
+                if isinstance(metric, Counter):
+                    row['value'] = child.value
+                else:
+                    _, count, total = child.snapshot()
+                    row['count'] = count
+                    row['mean_ms'] = total / count * 1000 if count else None
+                    for q in (0.5, 0.95, 0.99):
+                        estimate = child.quantile(q)
+                        row[f'p{round(q * 100)}_ms'] = estimate * 1000 if estimate is not None else None
+                rows.append(row)
+        return rows
+
+    def log_summary(self, level=logging.INFO):
+        """Log every series as a structured 'metric' event."""
+        for row in self.summary():
+            log_event('metric', level, **row)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def log_event(event, level=logging.DEBUG, **fields):
+    """Log an event with structured fields; cheap when the level is disabled."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={'fields': fields})
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats log records as single-line JSON objects, including the fields given to log_event."""
+
+    def format(self, record):
+        document = {
+            'time': datetime.datetime.fromtimestamp(record.created).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage(),
+            **getattr(record, 'fields', {}),
+        }
+        if record.exc_info:
+            document['exception'] = self.formatException(record.exc_info)
+        return json.dumps(document, default=str)
+
+
+def configure_logging(level=logging.INFO, stream=None):
+    """Write the 'tradingbot' logs to a stream (stderr by default) as JSON lines."""
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(StructuredFormatter())
+    logger.handlers = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    return handler
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log_event('metrics_scraped', logging.DEBUG, client=self.client_address[0], request=format % args)
+
+
+def start_metrics_server(port=9100, host='127.0.0.1', registry=None):
+    """
+    Serve the registry's metrics for Prometheus at http://host:port/metrics from a daemon thread.
+
+    :param port: The port to listen on; 0 picks a free one (see server.server_port).
+    :return: The running server; call shutdown() on it to stop.
+    """
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry or REGISTRY})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='MetricsServer', daemon=True).start()
+    log_event('metrics_server_started', logging.INFO, host=host, port=server.server_port)
+    return server
@@ -0,0 +1,82 @@
+import numpy as np
+
+# Matrix elements (rows x symbols) valued per step, so the gathered holdings matrix and its
+# temporaries stay around 8 MB each however long the price series and however many the symbols
+CHUNK_ELEMENTS = 1 << 20
+
+
+def to_datetime64(values):
+    """Convert timestamps (ISO strings, datetimes or datetime64) to a datetime64[ns] array."""
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[ns]')
+    return np.array([str(value) for value in values.ravel()], dtype='datetime64[ns]')
+
+
+def forward_fill(prices):
+    """Replace each NaN with the last valid value above it in the same column (leading NaNs stay)."""
+    prices = np.asarray(prices, dtype=np.float64)
+    missing = np.isnan(prices)
+    if not missing.any():
+        return prices
+    rows = np.where(missing, 0, np.arange(prices.shape[0])[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return prices[rows, np.arange(prices.shape[1])]
+
+
+def holdings_matrix(history, symbols):
+    """
+    Build the holdings of each history entry as arrays.
+
+    :param history: Owned stocks history entries, ordered by timestamp.
+    :param symbols: The symbols to track; holdings of other symbols are ignored.
+    :return: Entry timestamps (datetime64[ns]), a quantity matrix (entries x symbols) and the account balances.
+    """
+    columns = {symbol: column for column, symbol in enumerate(symbols)}
+    quantities = np.zeros((len(history), len(columns)), dtype=np.float64)
+    balances = np.empty(len(history), dtype=np.float64)
+    for row, entry in enumerate(history):
+        balances[row] = entry['account_balance']
+        for symbol, stock in entry['owned_stocks'].items():
+            column = columns.get(symbol)
+            if column is not None:
+                quantities[row, column] = stock['quantity']
+    timestamps = to_datetime64([entry['timestamp'] for entry in history])
+    return timestamps, quantities, balances
+
+
+def net_worth_series(history, timestamps, symbols, prices):
+    """
+    Calculate net worth at every timestamp of a price matrix.
+
+    Holdings and account balance are forward-filled from the latest history entry at or before
+    each timestamp, and missing prices from the latest known price of that symbol. Timestamps
+    before the first history entry have no known state and are valued as NaN, as are held
+    positions that have no price yet.
+
+    :param history: Owned stocks history entries, ordered by timestamp.
+    :param timestamps: The price timestamps, in ascending order.
+    :param symbols: The symbols of the price matrix columns.
+    :param prices: A (timestamps x symbols) price matrix, with NaN for missing prices.
+    :return: A float64 array of net worth per timestamp.
+    """
+    timestamps = to_datetime64(timestamps)
+    prices = forward_fill(prices)
+    if prices.shape != (len(timestamps), len(symbols)):
+        raise ValueError(f"Price matrix shape {prices.shape} does not match {len(timestamps)} timestamps x {len(symbols)} symbols.")
+
+    net_worth = np.full(len(timestamps), np.nan)
+    if not history:
+        return net_worth
+    entry_timestamps, quantities, balances = holdings_matrix(history, symbols)
+    entries = np.searchsorted(entry_timestamps, timestamps, side='right') - 1
+    known = np.flatnonzero(entries >= 0)
+
+    chunk_rows = max(1, CHUNK_ELEMENTS // max(len(symbols), 1))
+    for start in range(0, len(known), chunk_rows):
+        rows = known[start:start + chunk_rows]
+        held = quantities[entries[rows]]
+        # Unheld symbols contribute nothing, even where their price is still unknown
+        values = np.where(held != 0, held * prices[rows], 0.0)
+        net_worth[rows] = balances[entries[rows]] + values.sum(axis=1)
+    return net_worth
@@ -0,0 +1,261 @@
+import heapq
+import itertools
+import threading
+
+ORDER_TYPES = ('limit', 'stop', 'take_profit')
+ORDER_SIDES = ('buy', 'sell')
+ORDER_COLUMNS = ['id', 'symbol', 'side', 'order_type', 'quantity', 'price', 'status', 'created',
+                 'fill_price', 'transaction_id', 'reason']
+
+
+class Order:
+    """A resting order and what happened to it."""
+
+    __slots__ = ('id', 'symbol', 'side', 'order_type', 'quantity', 'price', 'status', 'created',
+                 'fill_price', 'transaction_id', 'reason', 'reserved')
+
+    def __init__(self, order_id, symbol, side, order_type, quantity, price, created):
+        self.id = order_id
+        self.symbol = symbol
+        self.side = side
+        self.order_type = order_type
+        self.quantity = quantity
+        self.price = price  # Limit price, stop price or take-profit target
+        self.status = 'open'  # 'open', 'filled', 'cancelled' or 'rejected'
+        self.created = created
+        self.fill_price = None
+        self.transaction_id = None
+        self.reason = None  # Why the order was rejected
+        self.reserved = 0.0  # Balance (buys) or quantity (sells) held back for the order
+
+    @property
+    def triggers_on_fall(self):
+        """Whether the order fills when the price falls to its level (otherwise when it rises to it)."""
+        # Limit and take-profit orders buy low and sell high; stop orders buy on a rise and sell on a fall
+        return (self.side == 'buy') == (self.order_type != 'stop')
+
+    def to_dict(self):
+        return {column: getattr(self, column) for column in ORDER_COLUMNS}
+
+
+class OrderBook:
+    """
+    Resting limit, stop and take-profit orders, matched against price ticks and filled through a TradingDatabase.
+
+    Each symbol has two heaps: orders that fill when the price falls to their level (buy
+    limits, sell stops, buy take-profits) in a max-heap, and orders that fill when it rises
+    to their level (sell limits, buy stops, sell take-profits) in a min-heap. A tick only
+    looks at the top of both heaps, and each fill pops one order, so a tick costs O(1) plus
+    O(log n) per fill however many orders rest. Cancelled orders stay in the heaps, are
+    skipped when they reach the top and are dropped once they outnumber the open orders.
+
+    Placing an order reserves what it needs: buys hold back quantity * price of the balance,
+    sells hold back the quantity of the symbol, so open orders can never spend the same money
+    or shares twice. Fills are executed at the tick price with one add_transactions() call
+    per batch of ticks. A buy stop fills at or above its stop price, so when the price gaps
+    up it costs more than it reserved: the difference is paid from the unreserved balance,
+    and the order is rejected if that does not cover it, as other orders' reservations are
+    never spent. Orders live in memory only and are lost on restart.
+    """
+
+    def __init__(self, database, clock=None):
+        self.database = database
+        self.clock = clock or database.clock
+        self.orders = {}  # order id -> Order, including closed orders
+        self.heaps = {}  # symbol -> (falling max-heap, rising min-heap) of (key, sequence, order)
+        self.open_count = 0
+        self.stale_count = 0  # Closed orders still sitting in the heaps
+        self.reserved_balance = 0.0
+        self.reserved_quantities = {}  # symbol -> quantity held back by open sell orders
+        self._ids = itertools.count(1)
+        self._sequence = itertools.count()  # Orders at the same level fill in the order they were placed
+        self._lock = threading.RLock()
+        self._orders_total = database.metrics.counter('tradingbot_orders_total', 'Orders by type and what happened to them')
+
+    def validate_order(self, symbol, side, order_type, quantity, price):
+        """Validate input values."""
+        if not symbol or quantity <= 0 or price <= 0 or side not in ORDER_SIDES or order_type not in ORDER_TYPES:
+            raise ValueError(f"Invalid order parameters. Use a symbol, a positive quantity and price, "
+                             f"a side in {ORDER_SIDES} and a type in {ORDER_TYPES}.")
+
+    def available_balance(self):
+        """The account balance not reserved by open buy orders."""
+        return self.database.get_account_balance() - self.reserved_balance
+
+    def available_quantity(self, symbol):
+        """The owned quantity of a symbol not reserved by open sell orders."""
+        stock = self.database.list_owned_stocks().get(symbol)
+        return (stock['quantity'] if stock else 0) - self.reserved_quantities.get(symbol, 0)
+
+    def place_order(self, symbol, side, order_type, quantity, price):
+        """
+        Place a resting order.
+
+        :param order_type: 'limit', 'stop' or 'take_profit'.
+        :param price: The limit price, stop price or take-profit target.
+        :return: The order ID.
+        :raises ValueError: If the parameters are invalid or the available balance or quantity does not cover the order.
+        """
+        self.validate_order(symbol, side, order_type, quantity, price)
+        with self._lock:
+            if side == 'buy':
+                if quantity * price > self.available_balance():
+                    raise ValueError("Insufficient available balance to place the order.")
+            elif quantity > self.available_quantity(symbol):
+                raise ValueError("Insufficient available stock quantity to place the order.")
+
+            order = Order(next(self._ids), symbol, side, order_type, quantity, price, self.clock().isoformat())
+            self._reserve(order)
+            self.orders[order.id] = order
+            falling, rising = self.heaps.setdefault(symbol, ([], []))
+            if order.triggers_on_fall:
+                heapq.heappush(falling, (-price, next(self._sequence), order))
+            else:
+                heapq.heappush(rising, (price, next(self._sequence), order))
+            self.open_count += 1
+        self._orders_total.inc(order_type=order_type, event='placed')
+        return order.id
+
+    def _reserve(self, order):
+        if order.side == 'buy':
+            order.reserved = order.quantity * order.price
+            self.reserved_balance += order.reserved
+        else:
+            order.reserved = order.quantity
+            self.reserved_quantities[order.symbol] = self.reserved_quantities.get(order.symbol, 0) + order.quantity
+
+    def _release(self, order):
+        if order.side == 'buy':
+            self.reserved_balance -= order.reserved
+            if self.open_count <= 1:
+                self.reserved_balance = 0.0  # Drop rounding leftovers
+        else:
+            remaining = self.reserved_quantities[order.symbol] - order.reserved
+            if remaining > 0:
+                self.reserved_quantities[order.symbol] = remaining
+            else:
+                del self.reserved_quantities[order.symbol]
+        order.reserved = 0.0
+        self.open_count -= 1
+
+    def cancel_order(self, order_id):
+        """Cancel an open order and release its reservation; returns False if it is not open."""
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None or order.status != 'open':
+                return False
+            self._release(order)
+            order.status = 'cancelled'
+            self.stale_count += 1
+            if self.stale_count > max(self.open_count, 1000):
+                self._compact()
+        self._orders_total.inc(order_type=order.order_type, event='cancelled')
+        return True
+
+    def _compact(self):
+        """Drop cancelled orders from the heaps once they outnumber the open ones."""
+        for symbol, heaps in list(self.heaps.items()):
+            heaps = tuple([entry for entry in heap if entry[2].status == 'open'] for heap in heaps)
+            for heap in heaps:
+                heapq.heapify(heap)
+            if heaps[0] or heaps[1]:
+                self.heaps[symbol] = heaps
+            else:
+                del self.heaps[symbol]
+        self.stale_count = 0
+
+    def _match(self, symbol, price):
+        """Pop the open orders of a symbol that a price triggers, best level first."""
+        heaps = self.heaps.get(symbol)
+        if heaps is None:
+            return []
+        falling, rising = heaps
+        triggered = []
+        while falling and -falling[0][0] >= price:
+            order = heapq.heappop(falling)[2]
+            if order.status == 'open':
+                triggered.append(order)
+            else:
+                self.stale_count -= 1
+        while rising and rising[0][0] <= price:
+            order = heapq.heappop(rising)[2]
+            if order.status == 'open':
+                triggered.append(order)
+            else:
+                self.stale_count -= 1
+        if not falling and not rising:
+            del self.heaps[symbol]
+        return triggered
+
+    def on_tick(self, symbol, price):
+        """Match a single price tick and execute the fills; returns the filled orders as dictionaries."""
+        return self.on_ticks([(symbol, price)])
+
+    def on_ticks(self, ticks):
+        """
+        Match a batch of price ticks, in order, and execute all their fills with one add_transactions() call.
+
+        :param ticks: (symbol, price) tuples.
+        :return: The orders that were filled, as dictionaries.
+        """
+        with self._lock:
+            fills = []
+            spare_balance = self.available_balance()  # Pays for buys filled above their reserved price
+            for symbol, price in ticks:
+                for order in self._match(symbol, price):
+                    self._release(order)
+                    if order.side == 'buy':
+                        extra_cost = order.quantity * price - order.quantity * order.price
+                        if extra_cost > spare_balance:
+                            self._reject(order, "Insufficient available balance to fill the order at the gapped price.")
+                            continue
+                        spare_balance -= extra_cost
+                    fills.append((order, price))
+            if not fills:
+                return []
+            return self._execute(fills)
+
+    def _reject(self, order, reason):
+        order.status = 'rejected'
+        order.reason = reason
+        self._orders_total.inc(order_type=order.order_type, event='rejected')
+
+    def _execute(self, fills):
+        batch = [(order.symbol, order.quantity, price, order.side) for order, price in fills]
+        try:
+            transaction_ids = self.database.add_transactions(batch)
+        except ValueError:
+            # Reservations cover every fill unless the balance or stocks changed outside the
+            # order book; fill what can still be filled one by one and reject the rest
+            transaction_ids = []
+            for order, price in fills:
+                try:
+                    transaction_ids.append(self.database.add_transaction(order.symbol, order.quantity, price, order.side))
+                except ValueError as e:
+                    transaction_ids.append(None)
+                    self._reject(order, str(e))
+        filled = []
+        for (order, price), transaction_id in zip(fills, transaction_ids):
+            if transaction_id is None:
+                continue
+            order.status = 'filled'
+            order.fill_price = price
+            order.transaction_id = transaction_id
+            self._orders_total.inc(order_type=order.order_type, event='filled')
+            filled.append(order.to_dict())
+        return filled
+
+    def get_order(self, order_id):
+        """Return an order as a dictionary, or None if there is no such order."""
+        order = self.orders.get(order_id)
+        return order.to_dict() if order is not None else None
+
+    def list_orders(self, symbol=None, status=None):
+        """List orders, oldest first, optionally only those of a symbol or with a status."""
+        with self._lock:
+            return [order.to_dict() for order in self.orders.values()
+                    if (symbol is None or order.symbol == symbol) and (status is None or order.status == status)]
+
+    def open_orders(self, symbol=None):
+        """List the open orders, oldest first."""
+        return self.list_orders(symbol, 'open')
@@ -0,0 +1,191 @@
+"""
+Local JSON-over-socket RPC server for a TradingDatabase.
+
+The protocol is JSON lines over TCP: each request is one line
+{"id": 1, "method": "add_transaction", "params": ["AAPL", 10, 150.0, "buy"]} (params may also be
+an object of keyword arguments) and is answered, in order, by one line {"id": 1, "result": 7} or
+{"id": 1, "error": {"type": "ValueError", "message": "..."}}. A client can keep a connection open
+and stream requests without waiting for each response. There is no authentication, so the
+server only listens on localhost by default.
+
+Like the CLI this module imports neither gradio nor pandas.
+"""
+import json
+import socket
+import socketserver
+import threading
+import time
+from collections.abc import Mapping
+
+DEFAULT_PORT = 9200
+RECEIVE_SIZE = 65536
+# The TradingDatabase methods clients may call
+RPC_METHODS = (
+    'add_transaction', 'add_transactions', 'get_transaction', 'query_transactions',
+    'get_account_balance', 'add_account_balance', 'remove_account_balance',
+    'list_owned_stocks', 'record_owned_stocks_history', 'calculate_net_worth',
+    'get_position', 'get_portfolio_pnl', 'query_history_points', 'query_history_aggregates',
+)
+
+
+def _json_default(value):
+    """Encode the non-JSON types the database returns: transaction rows, sets and NumPy scalars."""
+    if isinstance(value, Mapping):
+        return dict(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_message(message):
+    return json.dumps(message, separators=(',', ':'), default=_json_default).encode() + b'\n'
+
+
+class RpcError(Exception):
+    """An error raised by the server while handling a call."""
+
+    def __init__(self, type, message):
+        super().__init__(f"{type}: {message}")
+        self.type = type
+        self.message = message
+
+
+class _RpcHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        pending = b''
+        while True:
+            data = self.request.recv(RECEIVE_SIZE)
+            if not data:
+                return
+            lines = (pending + data).split(b'\n')
+            pending = lines.pop()  # An incomplete request, finished by the next read
+            # Everything received so far is answered with a single send, so streamed calls share syscalls
+            responses = [self.server.dispatch(line) for line in lines if line.strip()]
+            if responses:
+                self.request.sendall(b''.join(responses))
+
+
+class RpcServer(socketserver.ThreadingTCPServer):
+    """
+    Serves RPC_METHODS of a database to local clients, one thread per connection.
+
+    The database serializes the calls itself, so trades from several connections are applied
+    one at a time. Call latencies are recorded in the database's metrics registry.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, database, host='127.0.0.1', port=DEFAULT_PORT, methods=RPC_METHODS):
+        self.database = database
+        self.methods = frozenset(methods)
+        self._call_seconds = database.metrics.histogram('tradingbot_rpc_seconds', 'Time spent handling RPC calls')
+        super().__init__((host, port), _RpcHandler)
+
+    def dispatch(self, line):
+        """Handle one request line and return the encoded response line."""
+        request_id = None
+        started = time.perf_counter()
+        method = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            method = request.get('method')
+            if method == 'ping':
+                result = 'pong'
+            elif method not in self.methods:
+                raise RpcError('MethodNotFound', f"Unknown method: {method}")
+            else:
+                params = request.get('params') or []
+                call = getattr(self.database, method)
+                result = call(**params) if isinstance(params, dict) else call(*params)
+            response = {'id': request_id, 'result': result}
+        except RpcError as error:
+            response = {'id': request_id, 'error': {'type': error.type, 'message': error.message}}
+        except Exception as error:
+            response = {'id': request_id, 'error': {'type': type(error).__name__, 'message': str(error)}}
+        if method in self.methods:
+            self._call_seconds.observe(time.perf_counter() - started, method=method)
+        return encode_message(response)
+
+
+def start_rpc_server(database, port=DEFAULT_PORT, host='127.0.0.1'):
+    """Serve the database on a daemon thread and return the server; call shutdown() to stop it."""
+    server = RpcServer(database, host, port)
+    thread = threading.Thread(target=server.serve_forever, name='RpcServer', daemon=True)
+    thread.start()
+    return server
+
+
+class RpcClient:
+    """
+    Client for RpcServer.
+
+    call() sends one request and waits for its response; call_many() streams a list of
+    requests over the connection and then collects the responses, so a batch of trades
+    costs one round trip per window instead of one per trade.
+    """
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, timeout=None):
+        self.socket = socket.create_connection((host, port), timeout=timeout)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.socket.makefile('rb')
+        self.next_id = 1
+
+    def _send(self, calls):
+        requests = []
+        for method, params in calls:
+            requests.append(encode_message({'id': self.next_id, 'method': method, 'params': params}))
+            self.next_id += 1
+        self.socket.sendall(b''.join(requests))
+
+    def _receive(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("The RPC server closed the connection.")
+        response = json.loads(line)
+        if 'error' in response:
+            error = response['error']
+            return RpcError(error['type'], error['message'])
+        return response['result']
+
+    def call(self, method, *args, **kwargs):
+        """
+        Call a database method on the server and return its result.
+
+        :raises RpcError: If the call failed on the server (e.g. a ValueError for an invalid trade).
+        """
+        self._send([(method, kwargs or list(args))])
+        result = self._receive()
+        if isinstance(result, RpcError):
+            raise result
+        return result
+
+    def call_many(self, calls, window=256):
+        """
+        Stream several calls, at most `window` requests ahead of the responses.
+
+        :param calls: (method, params) tuples, with params a list of arguments or a dict of keyword arguments.
+        :return: The results in call order; failed calls give their RpcError instead of raising.
+        """
+        calls = list(calls)
+        results = []
+        for start in range(0, len(calls), window):
+            chunk = calls[start:start + window]
+            self._send(chunk)
+            results.extend(self._receive() for _ in chunk)
+        return results
+
+    def close(self):
+        self.reader.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,187 @@
+from abc import ABC, abstractmethod
+import datetime
+
+
+def to_timestamp(value):
+    """Normalize a datetime or ISO string to the ISO string format used for stored timestamps."""
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+class StorageBackend(ABC):
+    """
+    Persistence layer used by TradingDatabase.
+
+    The database keeps the small working state (owned stocks, account balance and the
+    transaction id counter) in memory and hands every change to the backend. Transactions
+    and the owned stocks history live in the backend, so a backend decides how much of
+    them is resident in memory.
+
+    While autoflush is disabled a backend may hold writes back until flush() is called,
+    which lets several changes share a single disk write (group commit).
+    """
+
+    autoflush = True
+    metrics = None  # A metrics.MetricsRegistry, set by TradingDatabase
+
+    def _count_write(self, target, size):
+        """Record a write of `size` bytes to a storage file (or the journal) in the metrics registry."""
+        if self.metrics is not None:
+            self.metrics.counter('tradingbot_storage_bytes_written_total', 'Bytes written to storage files').inc(size, target=target)
+            self.metrics.counter('tradingbot_storage_writes_total', 'Writes to storage files').inc(target=target)
+
+    @abstractmethod
+    def load_transactions(self):
+        """Load transactions and return the next transaction id."""
+        pass
+
+    @abstractmethod
+    def save_transactions(self, transaction_id_counter):
+        """Persist all transactions and the transaction id counter."""
+        pass
+
+    @abstractmethod
+    def load_owned_stocks(self):
+        """Load and return the currently owned stocks."""
+        pass
+
+    @abstractmethod
+    def save_owned_stocks(self, owned_stocks):
+        """Persist the currently owned stocks."""
+        pass
+
+    @abstractmethod
+    def load_owned_stocks_history(self):
+        """Load the historical records of owned stocks and account balance."""
+        pass
+
+    @abstractmethod
+    def save_owned_stocks_history(self):
+        """Persist the historical records of owned stocks and account balance."""
+        pass
+
+    @abstractmethod
+    def load_account_balance(self):
+        """Load and return the account balance."""
+        pass
+
+    @abstractmethod
+    def save_account_balance(self, account_balance):
+        """Persist the account balance."""
+        pass
+
+    @abstractmethod
+    def record_transaction(self, transaction, owned_stocks, account_balance):
+        """
+        Persist a transaction together with the state it produced.
+
+        :param transaction: The transaction dictionary.
+        :param owned_stocks: Owned stocks after the transaction was applied.
+        :param account_balance: Account balance after the transaction was applied.
+        """
+        pass
+
+    @abstractmethod
+    def record_transactions(self, transactions, owned_stocks, account_balance):
+        """
+        Persist a batch of transactions with a single history entry for the resulting state.
+
+        :param transactions: The transaction dictionaries, in the order they were applied.
+        :param owned_stocks: Owned stocks after the whole batch was applied.
+        :param account_balance: Account balance after the whole batch was applied.
+        """
+        pass
+
+    @abstractmethod
+    def record_history(self, timestamp, owned_stocks, account_balance):
+        """Append a history entry with the given state."""
+        pass
+
+    @abstractmethod
+    def get_transaction(self, transaction_id):
+        """Retrieve a transaction by its ID, or None if not found."""
+        pass
+
+    @abstractmethod
+    def list_transactions(self):
+        """List all transactions."""
+        pass
+
+    @abstractmethod
+    def query_transactions(self, symbol=None, start=None, end=None, limit=None, offset=0, after_id=None):
+        """
+        List transactions filtered by symbol and time range, ordered by ID.
+
+        :param symbol: Only return transactions for this symbol.
+        :param start: Only return transactions at or after this ISO timestamp.
+        :param end: Only return transactions at or before this ISO timestamp.
+        :param limit: Maximum number of transactions to return.
+        :param offset: Number of matching transactions to skip.
+        :param after_id: Only return transactions with a higher ID, for incremental readers.
+        """
+        pass
+
+    @abstractmethod
+    def list_owned_stocks_history(self):
+        """List all historical records of owned stocks and account balance."""
+        pass
+
+    @abstractmethod
+    def query_owned_stocks_history(self, start=None, end=None, limit=None, offset=0):
+        """List history entries within a time range, oldest first."""
+        pass
+
+    def history_points(self):
+        """
+        Yield (timestamp, account balance, number of positions) for every history entry, oldest first.
+
+        Backends that can count positions without building full entries override this.
+        """
+        for entry in self.list_owned_stocks_history():
+            yield entry['timestamp'], entry['account_balance'], len(entry['owned_stocks'])
+
+    @abstractmethod
+    def state_at(self, timestamp):
+        """
+        Rebuild the owned stocks and account balance as of a point in time.
+
+        :param timestamp: ISO timestamp or datetime.
+        :return: A history entry dictionary, or None if there is no history before that time.
+        """
+        pass
+
+    @abstractmethod
+    def clear_transactions(self):
+        """Remove all transactions."""
+        pass
+
+    @abstractmethod
+    def clear_owned_stocks_history(self):
+        """Remove all history entries."""
+        pass
+
+    def flush(self):
+        """Write any changes held back while autoflush is disabled."""
+        pass
+
+    def begin_flush(self):
+        """
+        Capture the changes held back while autoflush is disabled and return a function that writes them.
+
+        Backends that can serialize their pending changes up front override this, so that only
+        the returned function does disk I/O.
+        """
+        return self.flush
+
+    def compact_journal(self):
+        """Fold any write-ahead journal into the main storage."""
+        pass
+
+    def begin_compaction(self):
+        """Like begin_flush(), but the returned function also compacts the journal."""
+        return self.compact_journal
+
+    def close(self):
+        """Release any open files or connections."""
+        pass
@@ -0,0 +1,343 @@
+"""
+Binary snapshot of the full database state, loaded with mmap.
+
+Layout: the 8 byte magic, the header length as a little-endian uint64, a JSON header with
+the small state (balance, owned stocks, counters, symbol tables) and the offset of every
+column, then the columns themselves as raw little-endian arrays aligned to 8 bytes:
+
+- transactions: the TransactionStore columns (id, timestamp, UTC offset, symbol code, price,
+  quantity, int quantity flag, side)
+- history: per record the timestamp, account balance, a checkpoint flag and the offset of its
+  positions; per position the symbol code, quantity and purchase price (a NaN quantity marks
+  a closed position in a delta record)
+
+Opening a snapshot maps the file and wraps the columns in NumPy arrays without copying or
+parsing, so startup time does not depend on the number of records; pages are read by the OS
+as records are accessed. Run as a module to convert the JSON files of a data directory:
+
+    python -m src.storage.binary_snapshot data/ data/snapshot.bin
+"""
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Sequence
+
+import numpy as np
+
+from .columnar import NAIVE, TransactionStore, ns_to_timestamp, timestamps_to_ns
+from .delta_history import history_points
+
+MAGIC = b'TBSNAP01'
+FORMAT_VERSION = 2
+HEADER_LENGTH = struct.Struct('<Q')
+ALIGNMENT = 8
+
+TRANSACTION_COLUMNS = (
+    ('ids', '<i8'), ('timestamps', '<i8'), ('utc_offsets', '<i4'), ('symbol_codes', '<i4'),
+    ('prices', '<f8'), ('quantities', '<f8'), ('integer_quantities', 'u1'), ('sides', 'u1'),
+)
+HISTORY_COLUMNS = (
+    ('history_timestamps', '<i8'), ('history_balances', '<f8'), ('history_checkpoints', 'u1'),
+    ('history_offsets', '<i8'), ('position_symbols', '<i4'), ('position_quantities', '<f8'),
+    ('position_prices', '<f8'),
+)
+
+
+def _number(value):
+    return int(value) if value.is_integer() else value
+
+
+def encode_history(records, symbols, symbol_table):
+    """
+    Encode history records into the snapshot's history columns.
+
+    :param symbols: The symbol table, extended with symbols seen for the first time.
+    :param symbol_table: symbol -> index in symbols, updated likewise.
+    :return: A dictionary of NumPy arrays keyed by column name.
+    """
+    codes, quantities, prices, offsets, checkpoints = [], [], [], [0], []
+    for record in records:
+        checkpoint = 'owned_stocks' in record
+        positions = record['owned_stocks'] if checkpoint else record['changes']
+        for symbol, position in positions.items():
+            code = symbol_table.get(symbol)
+            if code is None:
+                code = symbol_table[symbol] = len(symbols)
+                symbols.append(symbol)
+            codes.append(code)
+            quantities.append(float('nan') if position is None else position['quantity'])
+            prices.append(float('nan') if position is None else position['purchase_price'])
+        offsets.append(len(codes))
+        checkpoints.append(checkpoint)
+    return {
+        'history_timestamps': timestamps_to_ns([record['timestamp'] for record in records]) if records else np.empty(0, np.int64),
+        'history_balances': np.array([record['account_balance'] for record in records], dtype=np.float64),
+        'history_checkpoints': np.array(checkpoints, dtype=np.uint8),
+        'history_offsets': np.array(offsets, dtype=np.int64),
+        'position_symbols': np.array(codes, dtype=np.int32),
+        'position_quantities': np.array(quantities, dtype=np.float64),
+        'position_prices': np.array(prices, dtype=np.float64),
+    }
+
+
+class HistoryView(Sequence):
+    """
+    History records decoded on access from snapshot columns, plus records appended since.
+
+    Stands in for the list of delta encoded records JsonStorage keeps; indexing a record
+    in the snapshot decodes only that record.
+    """
+
+    def __init__(self, columns, symbols):
+        self.columns = columns
+        self.symbols = symbols
+        self.base_size = len(columns['history_timestamps'])
+        self.tail = []
+        self.timestamps = HistoryTimestamps(self)
+
+    def append(self, record):
+        self.tail.append(record)
+
+    def __len__(self):
+        return self.base_size + len(self.tail)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('history index out of range')
+        if index >= self.base_size:
+            return self.tail[index - self.base_size]
+        columns = self.columns
+        start, end = columns['history_offsets'][index:index + 2].tolist()
+        positions = {}
+        for code, quantity, price in zip(columns['position_symbols'][start:end].tolist(),
+                                         columns['position_quantities'][start:end].tolist(),
+                                         columns['position_prices'][start:end].tolist()):
+            positions[self.symbols[code]] = None if math.isnan(quantity) else {'quantity': _number(quantity), 'purchase_price': price}
+        record = {'timestamp': ns_to_timestamp(columns['history_timestamps'][index])}
+        record['owned_stocks' if columns['history_checkpoints'][index] else 'changes'] = positions
+        record['account_balance'] = float(columns['history_balances'][index])
+        return record
+
+    def points(self):
+        """
+        Yield (nanoseconds since the epoch, account balance, number of positions) per record.
+
+        Reads the snapshot's columns directly instead of decoding records, then the appended records.
+        """
+        columns = self.columns
+        offsets = columns['history_offsets'].tolist()
+        symbols = columns['position_symbols'].tolist()
+        closed = np.isnan(columns['position_quantities']).tolist()
+        held = set()
+        for index, (time, balance, checkpoint) in enumerate(zip(columns['history_timestamps'].tolist(),
+                                                                columns['history_balances'].tolist(),
+                                                                columns['history_checkpoints'].tolist())):
+            if checkpoint:
+                held = set()
+            for position in range(offsets[index], offsets[index + 1]):
+                if closed[position]:
+                    held.discard(symbols[position])
+                else:
+                    held.add(symbols[position])
+            yield time, balance, len(held)
+        yield from history_points(self.tail, {self.symbols[code] for code in held})
+
+    def checkpoint_indexes(self):
+        """Indexes of the checkpoint records."""
+        base = np.flatnonzero(self.columns['history_checkpoints']).tolist()
+        return base + [self.base_size + index for index, record in enumerate(self.tail) if 'owned_stocks' in record]
+
+    def encode(self, symbols, symbol_table, size=None):
+        """
+        The history columns for this view: the snapshot's columns with the appended records added.
+
+        :param size: Only the first this many records (all of them by default).
+        """
+        records = self.tail if size is None else self.tail[:max(size - self.base_size, 0)]
+        if not records:
+            return self.columns
+        tail = encode_history(records, symbols, symbol_table)
+        columns = {name: np.concatenate([self.columns[name], tail[name]]) for name in tail if name != 'history_offsets'}
+        columns['history_offsets'] = np.concatenate([
+            self.columns['history_offsets'], tail['history_offsets'][1:] + self.columns['history_offsets'][-1]])
+        return columns
+
+
+class HistoryTimestamps(Sequence):
+    """The ISO timestamps of a HistoryView's records, formatted on access so bisect can search them."""
+
+    def __init__(self, view):
+        self.view = view
+        self.tail = []
+
+    def append(self, timestamp):
+        self.tail.append(timestamp)
+
+    def __len__(self):
+        return self.view.base_size + len(self.tail)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index >= self.view.base_size:
+            return self.tail[index - self.view.base_size]
+        return ns_to_timestamp(self.view.columns['history_timestamps'][index])
+
+
+def encode_snapshot(state):
+    """
+    Serialize the database state into the snapshot format.
+
+    :param state: A dictionary with 'journal_seq', 'transaction_id_counter', 'transactions' (a
+        TransactionStore), 'owned_stocks', 'owned_stocks_history' (records or a HistoryView)
+        and 'account_balance'. Optional 'transaction_count' and 'history_count' limit the
+        snapshot to the first transactions and history records, e.g. those there were when
+        the state was captured.
+    :return: The snapshot as bytes.
+    """
+    transactions = state['transactions']
+    size = state.get('transaction_count', len(transactions))
+    columns = {name: getattr(transactions, name).data[:size] for name, _ in TRANSACTION_COLUMNS}
+    history = state['owned_stocks_history']
+    history_size = state.get('history_count', len(history))
+    if isinstance(history, HistoryView):
+        history_symbols = list(history.symbols)
+        history_columns = history.encode(history_symbols, {symbol: code for code, symbol in enumerate(history_symbols)}, history_size)
+    else:
+        history_symbols = []
+        history_columns = encode_history(history[:history_size], history_symbols, {})
+    columns.update(history_columns)
+
+    header = {
+        'version': FORMAT_VERSION,
+        'journal_seq': state.get('journal_seq', 0),
+        'transaction_id_counter': state['transaction_id_counter'],
+        'account_balance': state['account_balance'],
+        'owned_stocks': state['owned_stocks'],
+        'transaction_symbols': list(transactions.symbols),
+        'history_symbols': history_symbols,
+        'columns': {},
+    }
+    blobs = []
+    offset = 0
+    for name, dtype in TRANSACTION_COLUMNS + HISTORY_COLUMNS:
+        data = np.ascontiguousarray(columns[name], dtype=dtype).tobytes()
+        header['columns'][name] = {'dtype': dtype, 'offset': offset, 'length': len(columns[name])}
+        padding = -len(data) % ALIGNMENT
+        blobs.append(data + b'\0' * padding)
+        offset += len(data) + padding
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    header_bytes += b' ' * (-(len(MAGIC) + HEADER_LENGTH.size + len(header_bytes)) % ALIGNMENT)
+    return b''.join([MAGIC, HEADER_LENGTH.pack(len(header_bytes)), header_bytes] + blobs)
+
+
+def write_snapshot(path, state):
+    """Write a snapshot atomically (temporary file, fsync, rename); returns the number of bytes written."""
+    contents = encode_snapshot(state)
+    descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(contents)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return len(contents)
+
+
+def read_snapshot(path):
+    """
+    Open a snapshot without parsing its records.
+
+    :return: The state dictionary described in encode_snapshot(), with the transactions in a
+        TransactionStore and the history in a HistoryView, both backed by the mapped file.
+    :raises FileNotFoundError: If there is no snapshot.
+    :raises ValueError: If the file is not a snapshot in a supported version.
+    """
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)  # Stays valid after the file is closed
+    if mapped[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a binary snapshot.")
+    (header_length,) = HEADER_LENGTH.unpack_from(mapped, len(MAGIC))
+    data_start = len(MAGIC) + HEADER_LENGTH.size + header_length
+    header = json.loads(mapped[len(MAGIC) + HEADER_LENGTH.size:data_start])
+    if header['version'] not in (1, FORMAT_VERSION):
+        raise ValueError(f"Unsupported snapshot version: {header['version']}")
+
+    # Read-only arrays over the mapping; appending to the store copies a column first
+    columns = {
+        name: np.frombuffer(mapped, dtype=column['dtype'], count=column['length'], offset=data_start + column['offset'])
+        for name, column in header['columns'].items()
+    }
+    if header['version'] == 1:
+        # Version 1 had neither UTC offsets nor int flags; it stored naive times and whole quantities came back as ints
+        quantities = columns['quantities']
+        columns['utc_offsets'] = np.full(len(quantities), NAIVE, np.int32)
+        columns['integer_quantities'] = (quantities == np.floor(quantities)).astype(np.uint8)
+    transactions = TransactionStore.from_columns(
+        {name: columns[name] for name, _ in TRANSACTION_COLUMNS}, header['transaction_symbols'])
+    return {
+        'journal_seq': header['journal_seq'],
+        'transaction_id_counter': header['transaction_id_counter'],
+        'transactions': transactions,
+        'owned_stocks': header['owned_stocks'],
+        'owned_stocks_history': HistoryView({name: columns[name] for name, _ in HISTORY_COLUMNS}, header['history_symbols']),
+        'account_balance': header['account_balance'],
+    }
+
+
+def _read_json(path, default):
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return default
+
+
+def convert_json_files(data_dir, snapshot_file, transactions_file='transactions.json',
+                       owned_stocks_file='owned_stocks.json',
+                       owned_stocks_history_file='owned_stocks_history.json',
+                       account_balance_file='account_balance.json'):
+    """
+    Write a binary snapshot holding the state in a data directory's JSON files.
+
+    Use it before switching a database to snapshot_format='binary'; any journal in the
+    directory is still replayed on top of the snapshot.
+
+    :return: The number of bytes written.
+    """
+    data = _read_json(os.path.join(data_dir, transactions_file), {})
+    return write_snapshot(snapshot_file, {
+        'journal_seq': 0,
+        'transaction_id_counter': data.get('transaction_id_counter', 1),
+        'transactions': TransactionStore(data.get('transactions', [])),
+        'owned_stocks': _read_json(os.path.join(data_dir, owned_stocks_file), {}),
+        'owned_stocks_history': _read_json(os.path.join(data_dir, owned_stocks_history_file), []),
+        'account_balance': _read_json(os.path.join(data_dir, account_balance_file), {}).get('account_balance', 0.0),
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert the JSON files of a data directory into a binary snapshot.')
+    parser.add_argument('data_dir', help='Directory holding transactions.json, owned_stocks.json, ...')
+    parser.add_argument('snapshot_file', help='Path of the snapshot to write, e.g. data/snapshot.bin')
+    args = parser.parse_args(argv)
+    size = convert_json_files(args.data_dir, args.snapshot_file)
+    print(f"Wrote {size:,} bytes to {args.snapshot_file}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+import datetime
+import numbers
+import warnings
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+EPOCH = datetime.datetime(1970, 1, 1)
+SIDES = ('buy', 'sell')
+SIDE_CODES = {side: code for code, side in enumerate(SIDES)}
+FIELDS = ('id', 'symbol', 'quantity', 'price', 'transaction_type', 'timestamp')
+NAIVE = np.iinfo(np.int32).min  # The UTC offset stored for timestamps without one
+
+
+def _parse(timestamp):
+    return timestamp if isinstance(timestamp, datetime.datetime) else datetime.datetime.fromisoformat(timestamp)
+
+
+def utc_offset(timestamp):
+    """The UTC offset of an ISO timestamp (or datetime) in seconds, or NAIVE if it has none."""
+    offset = _parse(timestamp).utcoffset()
+    return NAIVE if offset is None else offset // datetime.timedelta(seconds=1)
+
+
+def timestamp_to_ns(timestamp):
+    """
+    Convert an ISO timestamp (or datetime) to nanoseconds since the epoch.
+
+    Timestamps are naive local times like the ones TradingDatabase creates; timestamps with
+    a UTC offset are converted to UTC (see utc_offset() to keep the offset).
+    """
+    timestamp = _parse(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return (timestamp - EPOCH) // datetime.timedelta(microseconds=1) * 1000
+
+
+def timestamps_to_columns(timestamps):
+    """
+    Convert many ISO timestamps at once, with NumPy's parser for the common naive case.
+
+    :return: The nanoseconds since the epoch and the UTC offsets (see utc_offset()) as arrays.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')  # NumPy only warns about UTC offsets
+            return np.array(timestamps, dtype='datetime64[ns]').view(np.int64), np.full(len(timestamps), NAIVE, np.int32)
+    except (ValueError, TypeError, Warning):
+        parsed = [_parse(timestamp) for timestamp in timestamps]
+        return (np.fromiter((timestamp_to_ns(timestamp) for timestamp in parsed), np.int64, len(parsed)),
+                np.fromiter((utc_offset(timestamp) for timestamp in parsed), np.int32, len(parsed)))
+
+
+def timestamps_to_ns(timestamps):
+    """Convert many ISO timestamps to nanoseconds since the epoch at once."""
+    return timestamps_to_columns(timestamps)[0]
+
+
+def ns_to_timestamp(nanoseconds, offset=NAIVE):
+    """
+    Convert nanoseconds since the epoch back to the ISO format of datetime.isoformat().
+
+    :param offset: The UTC offset in seconds to show the time in, or NAIVE for a naive timestamp.
+    """
+    timestamp = EPOCH + datetime.timedelta(microseconds=int(nanoseconds) // 1000)
+    if offset == NAIVE:
+        return timestamp.isoformat()
+    offset = datetime.timedelta(seconds=int(offset))
+    return (timestamp + offset).replace(tzinfo=datetime.timezone(offset)).isoformat()
+
+
+def _is_integer(quantity):
+    return isinstance(quantity, numbers.Integral)
+
+
+class _Column:
+    """A growable NumPy array. Growing replaces the array, so readers holding the old one are unaffected."""
+
+    def __init__(self, dtype, capacity):
+        self.data = np.empty(capacity, dtype=dtype)
+
+    def reserve(self, size):
+        if size > len(self.data):
+            grown = np.empty(max(len(self.data) * 2, size, 16), dtype=self.data.dtype)
+            grown[:len(self.data)] = self.data
+            self.data = grown
+
+    def set(self, index, value):
+        if index == len(self.data):
+            self.reserve(index + 1)
+        self.data[index] = value
+
+
+class TransactionRow(Mapping):
+    """A read-only dict-like view of one transaction in a TransactionStore."""
+
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, field):
+        store, index = self.store, self.index
+        if field == 'id':
+            return int(store.ids.data[index])
+        if field == 'symbol':
+            return store.symbols[store.symbol_codes.data[index]]
+        if field == 'quantity':
+            quantity = float(store.quantities.data[index])
+            return int(quantity) if store.integer_quantities.data[index] else quantity
+        if field == 'price':
+            return float(store.prices.data[index])
+        if field == 'transaction_type':
+            return SIDES[store.sides.data[index]]
+        if field == 'timestamp':
+            return ns_to_timestamp(store.timestamps.data[index], store.utc_offsets.data[index])
+        raise KeyError(field)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class TransactionStore(Sequence):
+    """
+    Transactions stored column-wise in NumPy arrays.
+
+    Each transaction takes 42 bytes: an int64 id, an int64 epoch-ns timestamp (UTC for
+    timestamps with an offset) and the int32 UTC offset in seconds, an int32 interned symbol
+    code, float64 price and quantity, a uint8 flag for int quantities and a uint8 side. That
+    is an order of magnitude less than a dict with string timestamp and symbol. Indexing and
+    iterating return dict-like TransactionRow views that give back the stored values, so the
+    store can stand in for the list of transaction dicts. Transactions must be appended in
+    ID order.
+    """
+
+    def __init__(self, transactions=(), capacity=1024):
+        self.size = 0
+        self.ids = _Column(np.int64, capacity)
+        self.timestamps = _Column(np.int64, capacity)
+        self.utc_offsets = _Column(np.int32, capacity)
+        self.symbol_codes = _Column(np.int32, capacity)
+        self.prices = _Column(np.float64, capacity)
+        self.quantities = _Column(np.float64, capacity)
+        self.integer_quantities = _Column(np.uint8, capacity)
+        self.sides = _Column(np.uint8, capacity)
+        self.symbols = []  # Interned symbols, indexed by code
+        self.symbol_table = {}  # symbol -> code
+        self.extend(transactions)
+
+    @classmethod
+    def from_columns(cls, columns, symbols):
+        """
+        Wrap existing column arrays (e.g. read-only arrays over a memory-mapped file) without copying them.
+
+        :param columns: Arrays keyed by column name ('ids', 'timestamps', ...), all the same length.
+        :param symbols: The interned symbols the symbol codes refer to.
+        """
+        store = cls(capacity=0)
+        for name, data in columns.items():
+            getattr(store, name).data = data  # Growing copies, so the arrays themselves are never written
+        store.size = len(columns['ids'])
+        store.symbols = list(symbols)
+        store.symbol_table = {symbol: code for code, symbol in enumerate(store.symbols)}
+        return store
+
+    def symbol_code(self, symbol):
+        code = self.symbol_table.get(symbol)
+        if code is None:
+            code = self.symbol_table[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return code
+
+    def append(self, transaction):
+        index = self.size
+        if index and transaction['id'] <= self.ids.data[index - 1]:
+            raise ValueError("Transactions must be appended in ID order.")
+        self.ids.set(index, transaction['id'])
+        self.timestamps.set(index, timestamp_to_ns(transaction['timestamp']))
+        self.utc_offsets.set(index, utc_offset(transaction['timestamp']))
+        self.symbol_codes.set(index, self.symbol_code(transaction['symbol']))
+        self.prices.set(index, transaction['price'])
+        self.quantities.set(index, transaction['quantity'])
+        self.integer_quantities.set(index, _is_integer(transaction['quantity']))
+        self.sides.set(index, SIDE_CODES[transaction['transaction_type']])
+        self.size = index + 1  # Last, so concurrent readers never see a partly written row
+
+    def extend(self, transactions):
+        """Append many transactions, converting them column by column."""
+        transactions = list(transactions)
+        if not transactions:
+            return
+        ids = np.fromiter((transaction['id'] for transaction in transactions), np.int64, len(transactions))
+        previous = self.ids.data[self.size - 1] if self.size else None
+        if np.any(ids[1:] <= ids[:-1]) or (previous is not None and ids[0] <= previous):
+            raise ValueError("Transactions must be appended in ID order.")
+        timestamps, offsets = timestamps_to_columns([transaction['timestamp'] for transaction in transactions])
+        columns = (
+            (self.ids, ids),
+            (self.timestamps, timestamps),
+            (self.utc_offsets, offsets),
+            (self.symbol_codes, [self.symbol_code(transaction['symbol']) for transaction in transactions]),
+            (self.prices, [transaction['price'] for transaction in transactions]),
+            (self.quantities, [transaction['quantity'] for transaction in transactions]),
+            (self.integer_quantities, [_is_integer(transaction['quantity']) for transaction in transactions]),
+            (self.sides, [SIDE_CODES[transaction['transaction_type']] for transaction in transactions]),
+        )
+        size = self.size + len(transactions)
+        for column, values in columns:
+            column.reserve(size)
+            column.data[self.size:size] = values
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [TransactionRow(self, position) for position in range(*index.indices(self.size))]
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError('transaction index out of range')
+        return TransactionRow(self, index)
+
+    def __iter__(self):
+        for index in range(self.size):
+            yield TransactionRow(self, index)
+
+    def __eq__(self, other):
+        if not isinstance(other, (TransactionStore, list)):
+            return NotImplemented
+        return len(self) == len(other) and all(row == other_row for row, other_row in zip(self, other))
+
+    def __repr__(self):
+        return f'TransactionStore({len(self)} transactions)'
+
+    def get(self, transaction_id):
+        """Return the transaction with the given ID, or None."""
+        ids = self.ids.data[:self.size]
+        index = int(np.searchsorted(ids, transaction_id))
+        if index < len(ids) and ids[index] == transaction_id:
+            return TransactionRow(self, index)
+        return None
+
+    def query(self, symbol=None, start=None, end=None, after_id=None):
+        """
+        Find the transactions matching all given filters with vectorized comparisons.
+
+        :param start: Only transactions at or after this ISO timestamp or datetime.
+        :param end: Only transactions at or before this ISO timestamp or datetime.
+        :return: The matching row indexes, in ID order.
+        """
+        size = self.size
+        first = 0 if after_id is None else int(np.searchsorted(self.ids.data[:size], after_id, side='right'))
+        mask = np.ones(size - first, dtype=bool)
+        if symbol is not None:
+            code = self.symbol_table.get(symbol)
+            if code is None:
+                return np.empty(0, dtype=np.int64)
+            mask &= self.symbol_codes.data[first:size] == code
+        if start is not None:
+            mask &= self.timestamps.data[first:size] >= timestamp_to_ns(start)
+        if end is not None:
+            mask &= self.timestamps.data[first:size] <= timestamp_to_ns(end)
+        return np.flatnonzero(mask) + first
+
+    def rows(self, indexes):
+        return [TransactionRow(self, int(index)) for index in indexes]
+
+    def to_records(self, size=None):
+        """
+        Plain transaction dicts, e.g. for JSON serialization, converted column by column.
+
+        :param size: Only the first this many transactions (all of them by default).
+        """
+        size = self.size if size is None else size
+        timestamps = self.timestamps.data[:size].view('datetime64[ns]').astype('datetime64[us]')
+        formatted = np.datetime_as_string(timestamps, unit='us').astype(object)
+        # datetime.isoformat() leaves out the fraction when there are no microseconds
+        whole_seconds = np.flatnonzero(timestamps.view(np.int64) % 1_000_000 == 0)
+        formatted[whole_seconds] = np.datetime_as_string(timestamps[whole_seconds], unit='s')
+        offsets = self.utc_offsets.data[:size]
+        for index in np.flatnonzero(offsets != NAIVE).tolist():
+            formatted[index] = ns_to_timestamp(self.timestamps.data[index], offsets[index])
+        quantities = [int(quantity) if integer else quantity for quantity, integer in
+                      zip(self.quantities.data[:size].tolist(), self.integer_quantities.data[:size].tolist())]
+        columns = zip(
+            self.ids.data[:size].tolist(),
+            np.array(self.symbols, dtype=object)[self.symbol_codes.data[:size]].tolist(),
+            quantities,
+            self.prices.data[:size].tolist(),
+            np.array(SIDES, dtype=object)[self.sides.data[:size]].tolist(),
+            formatted.tolist()
+        )
+        return [dict(zip(FIELDS, values)) for values in columns]
+
+    def nbytes(self):
+        """Bytes used by the stored transactions (excluding spare capacity)."""
+        per_row = sum(column.data.itemsize for column in (
+            self.ids, self.timestamps, self.utc_offsets, self.symbol_codes, self.prices, self.quantities,
+            self.integer_quantities, self.sides))
+        return per_row * self.size
@@ -0,0 +1,117 @@
+"""
+Delta encoding for the owned stocks history.
+
+A history record is either a checkpoint, which holds the full owned stocks like the
+original history entries, or a delta, which only holds the positions that changed since
+the previous record ({symbol: position or None when the position was closed}). Every
+record keeps the account balance. Full entries are rebuilt by replaying deltas from the
+nearest checkpoint.
+"""
+
+DEFAULT_CHECKPOINT_INTERVAL = 100
+
+
+def is_checkpoint(record):
+    """Checkpoints (and history entries written before delta encoding) hold the full owned stocks."""
+    return 'owned_stocks' in record
+
+
+def apply_record(owned_stocks, record):
+    """Apply a history record to owned stocks and return the resulting owned stocks."""
+    if is_checkpoint(record):
+        return dict(record['owned_stocks'])
+    for symbol, position in record['changes'].items():
+        if position is None:
+            owned_stocks.pop(symbol, None)
+        else:
+            owned_stocks[symbol] = position
+    return owned_stocks
+
+
+def rebuild_state(records, owned_stocks=None):
+    """Replay records (starting with a checkpoint) and return the state after the last one."""
+    owned_stocks = {} if owned_stocks is None else dict(owned_stocks)
+    record = None
+    for record in records:
+        owned_stocks = apply_record(owned_stocks, record)
+    if record is None:
+        return None
+    return {'timestamp': record['timestamp'], 'owned_stocks': owned_stocks, 'account_balance': record['account_balance']}
+
+
+def expand_history(records, owned_stocks=None):
+    """Yield full history entries for records that start with a checkpoint."""
+    owned_stocks = {} if owned_stocks is None else dict(owned_stocks)
+    for record in records:
+        owned_stocks = apply_record(owned_stocks, record)
+        yield {
+            'timestamp': record['timestamp'],
+            'owned_stocks': dict(owned_stocks),
+            'account_balance': record['account_balance']
+        }
+
+
+def history_points(records, held=None):
+    """
+    Yield (timestamp, account balance, number of positions) for records that start with a checkpoint.
+
+    Only the set of held symbols is tracked, so no full entries are built.
+
+    :param held: The symbols held before the first record, when it is a delta.
+    """
+    held = set() if held is None else set(held)
+    for record in records:
+        if is_checkpoint(record):
+            held = set(record['owned_stocks'])
+        else:
+            for symbol, position in record['changes'].items():
+                if position is None:
+                    held.discard(symbol)
+                else:
+                    held.add(symbol)
+        yield record['timestamp'], record['account_balance'], len(held)
+
+
+class HistoryEncoder:
+    """Turns snapshots of the owned stocks into delta records with periodic checkpoints."""
+
+    def __init__(self, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL):
+        self.checkpoint_interval = checkpoint_interval
+        self.reset()
+
+    def reset(self):
+        """Forget the previous state so the next record is a checkpoint."""
+        self.owned_stocks = {}
+        self.records_since_checkpoint = None
+
+    def observe(self, record):
+        """Update the encoder state with an already stored record."""
+        self.owned_stocks = apply_record(self.owned_stocks, record)
+        if is_checkpoint(record):
+            self.records_since_checkpoint = 0
+        elif self.records_since_checkpoint is not None:
+            self.records_since_checkpoint += 1
+
+    def encode(self, timestamp, owned_stocks, account_balance, symbols=None, update=True):
+        """
+        Build the record for the given state.
+
+        :param symbols: Symbols that may have changed since the previous record. Defaults to
+                        comparing every symbol, which costs O(positions).
+        :param update: Whether to observe() the record right away. Pass False when storing it
+                       may still fail, and observe() it once it is stored.
+        """
+        if self.records_since_checkpoint is None or self.records_since_checkpoint + 1 >= self.checkpoint_interval:
+            record = {'timestamp': timestamp, 'owned_stocks': dict(owned_stocks), 'account_balance': account_balance}
+        else:
+            if symbols is None:
+                symbols = set(owned_stocks) | set(self.owned_stocks)
+            changes = {}
+            for symbol in symbols:
+                position = owned_stocks.get(symbol)
+                if position != self.owned_stocks.get(symbol):
+                    changes[symbol] = position
+            record = {'timestamp': timestamp, 'changes': changes, 'account_balance': account_balance}
+        if update:
+            self.observe(record)
+        return record
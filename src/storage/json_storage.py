@@ -0,0 +1,501 @@
+import bisect
+import json
+import os
+import threading
+from .base_storage import StorageBackend, to_timestamp
+from .binary_snapshot import HistoryView, encode_snapshot, read_snapshot
+from .columnar import TransactionStore
+from .delta_history import DEFAULT_CHECKPOINT_INTERVAL, HistoryEncoder, expand_history, history_points, is_checkpoint, rebuild_state
+
+class JsonStorage(StorageBackend):
+    """
+    Stores the trading data in JSON files, keeping transactions and history in memory.
+
+    In journal mode every change is appended to a write-ahead journal as a single compact
+    record instead of rewriting the JSON files, so the cost of a write does not depend on
+    the size of the history. The journal is folded into a snapshot by compact_journal().
+
+    History entries are stored delta encoded (see delta_history) and kept in timestamp
+    order, so range queries and state_at() use bisect on the timestamps.
+
+    With snapshot_format='binary' the journal is compacted into a memory-mapped binary
+    snapshot (see binary_snapshot) instead of JSON, so a restart neither parses the
+    transactions nor the history, and compaction does not rewrite the JSON files.
+    """
+
+    def __init__(self, transactions_file, owned_stocks_file, owned_stocks_history_file,
+                 account_balance_file, journal_file=None, snapshot_file=None,
+                 use_journal=False, compact_threshold=None,
+                 checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, snapshot_format='json'):
+        if snapshot_format not in ('json', 'binary'):
+            raise ValueError(f"Unknown snapshot format: {snapshot_format}")
+        self.transactions_file = transactions_file
+        self.owned_stocks_file = owned_stocks_file
+        self.owned_stocks_history_file = owned_stocks_history_file
+        self.account_balance_file = account_balance_file
+        self.journal_file = journal_file
+        self.snapshot_file = snapshot_file
+        self.snapshot_format = snapshot_format
+
+        self.transactions = TransactionStore()  # Columnar, read through dict-like row views
+        self.owned_stocks_history = []  # Delta encoded history records
+        self.history_timestamps = []
+        self.history_checkpoints = []  # Indexes of the checkpoint records
+        self.history_encoder = HistoryEncoder(checkpoint_interval)
+
+        # Latest state handed over by the database, needed for snapshots and file rewrites
+        self.transaction_id_counter = 1
+        self.owned_stocks = {}
+        self.account_balance = 0.0
+
+        self.use_journal = use_journal
+        self.compact_threshold = compact_threshold  # Compact after this many journal records
+        self.journal_seq = 0
+        self._journal = None
+        self._journal_records = 0
+        # Journal writes may run outside the database's state lock while a compaction rewrites the journal
+        self._journal_lock = threading.Lock()
+
+        # With autoflush disabled writes are collected until flush() is called
+        self.autoflush = True
+        self._dirty_files = set()
+        self._pending_journal = []
+        if self.use_journal:
+            self.load_journal()
+
+    @staticmethod
+    def _read_json(path, default):
+        try:
+            with open(path, 'r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return default
+
+    @staticmethod
+    def _write_file(path, contents, atomic=False):
+        mode = 'wb' if isinstance(contents, bytes) else 'w'
+        if not atomic:
+            with open(path, mode) as file:
+                file.write(contents)
+            return
+        temp_file = path + '.tmp'
+        with open(temp_file, mode) as file:
+            file.write(contents)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file, path)
+
+    def _read_files(self):
+        data = self._read_json(self.transactions_file, {})
+        self._set_transactions(data.get('transactions', []))
+        self.transaction_id_counter = data.get('transaction_id_counter', 1)
+        self.owned_stocks = self._read_json(self.owned_stocks_file, {})
+        self._set_history(self._read_json(self.owned_stocks_history_file, []))
+        self.account_balance = self._read_json(self.account_balance_file, {}).get('account_balance', 0.0)
+
+    def _capture_state(self):
+        """
+        The current state as references and lengths, cheap enough to take under the database's lock.
+
+        Transactions and history are only appended to (clearing replaces them) and positions
+        are replaced rather than mutated, so the captured lengths pin the state while later
+        changes go on; _file_contents() serializes it afterwards.
+        """
+        return {
+            'journal_seq': self.journal_seq,
+            'transaction_id_counter': self.transaction_id_counter,
+            'transactions': self.transactions,
+            'transaction_count': len(self.transactions),
+            'owned_stocks': dict(self.owned_stocks),
+            'owned_stocks_history': self.owned_stocks_history,
+            'history_count': len(self.owned_stocks_history),
+            'account_balance': self.account_balance
+        }
+
+    def _file_contents(self, path, state):
+        """A data file's contents as of a _capture_state() capture."""
+        if path == self.transactions_file:
+            return {'transaction_id_counter': state['transaction_id_counter'],
+                    'transactions': state['transactions'].to_records(state['transaction_count'])}
+        if path == self.owned_stocks_file:
+            return state['owned_stocks']
+        if path == self.owned_stocks_history_file:
+            return list(state['owned_stocks_history'][:state['history_count']])
+        return {'account_balance': state['account_balance']}
+
+    def _save(self, *paths):
+        """Write the given files, or mark them for the next flush when autoflush is disabled."""
+        self._dirty_files.update(paths)
+        if self.autoflush:
+            self.flush()
+
+    def _all_files(self):
+        return (self.transactions_file, self.owned_stocks_file,
+                self.owned_stocks_history_file, self.account_balance_file)
+
+    def flush(self):
+        """Write all pending journal records and modified files."""
+        self.begin_flush()()
+
+    def begin_flush(self, compact=False):
+        """
+        Capture the pending journal records and modified files and return a function that writes them.
+
+        Only references and lengths are captured (see _capture_state()); the returned function
+        serializes the files and the snapshot, so the caller can hold its state lock while
+        capturing and release it before the returned function does the slow work.
+
+        :param compact: Also fold the journal into a snapshot.
+        """
+        lines = ''.join(self._pending_journal)
+        self._pending_journal = []
+        snapshot_seq = self.journal_seq
+        compact = self.use_journal and (compact or bool(
+            self.compact_threshold and self._journal_records >= self.compact_threshold))
+        if compact:
+            self._journal_records = 0
+            if self.snapshot_format == 'json':
+                self._dirty_files.update(self._all_files())
+        paths = list(self._dirty_files)
+        self._dirty_files.clear()
+        state = self._capture_state() if compact or paths else None
+
+        # json.dumps escapes everything to ASCII, so string lengths are byte counts
+        def write():
+            if lines:
+                with self._journal_lock:
+                    self._journal.write(lines)
+                    self._journal.flush()
+                self._count_write('journal', len(lines))
+            if compact:
+                if self.snapshot_format == 'binary':
+                    snapshot = encode_snapshot(state)
+                else:
+                    snapshot = json.dumps({
+                        'journal_seq': state['journal_seq'],
+                        'transaction_id_counter': state['transaction_id_counter'],
+                        'transactions': state['transactions'].to_records(state['transaction_count']),
+                        'owned_stocks': state['owned_stocks'],
+                        'owned_stocks_history': list(state['owned_stocks_history'][:state['history_count']]),
+                        'account_balance': state['account_balance']
+                    })
+                self._write_file(self.snapshot_file, snapshot, atomic=True)
+                self._count_write('snapshot', len(snapshot))
+            # With a journal the regular JSON files are only refreshed on compaction
+            for path in paths:
+                contents = json.dumps(self._file_contents(path, state), indent=4)
+                self._write_file(path, contents)
+                self._count_write(os.path.basename(path), len(contents))
+            if compact:
+                self._drop_journal_records(snapshot_seq)
+        return write
+
+    def _drop_journal_records(self, last_seq):
+        """
+        Remove the journal records folded into a snapshot, up to last_seq.
+
+        Trades made after the snapshot was captured may already be in the journal, so the
+        records after last_seq are written back instead of truncating the whole file.
+        """
+        with self._journal_lock:
+            self._journal.flush()
+            with open(self.journal_file, 'r') as file:
+                # Loading drops a torn tail, so every line is a complete record
+                kept = [line for line in file if json.loads(line)['seq'] > last_seq]
+            self._journal.seek(0)
+            self._journal.truncate()
+            if kept:
+                self._journal.write(''.join(kept))
+                self._journal.flush()
+
+    def _set_transactions(self, transactions):
+        self.transactions = TransactionStore(transactions)
+
+    def _set_history(self, records):
+        if isinstance(records, HistoryView):
+            self._set_history_view(records)
+            return
+        self.owned_stocks_history = records
+        self.history_timestamps = [record['timestamp'] for record in records]
+        self.history_checkpoints = [index for index, record in enumerate(records) if is_checkpoint(record)]
+        self.history_encoder.reset()
+        if self.history_checkpoints:
+            for record in records[self.history_checkpoints[-1]:]:
+                self.history_encoder.observe(record)
+
+    def _set_history_view(self, view):
+        """Use history records decoded on demand from a snapshot, without reading them all."""
+        self.owned_stocks_history = view
+        self.history_timestamps = view.timestamps
+        self.history_checkpoints = view.checkpoint_indexes()
+        self.history_encoder.reset()
+        if self.history_checkpoints:
+            for record in view[self.history_checkpoints[-1]:]:
+                self.history_encoder.observe(record)
+
+    def load_transactions(self):
+        """Load transactions from the JSON file."""
+        if not self.use_journal:
+            data = self._read_json(self.transactions_file, {})
+            self._set_transactions(data.get('transactions', []))
+            self.transaction_id_counter = data.get('transaction_id_counter', 1)
+        return self.transaction_id_counter
+
+    def save_transactions(self, transaction_id_counter):
+        """Save transactions to the JSON file."""
+        self.transaction_id_counter = transaction_id_counter
+        if self.use_journal:
+            return  # Transactions are already in the journal
+        self._save(self.transactions_file)
+
+    def load_owned_stocks(self):
+        """Load currently owned stocks from the JSON file."""
+        if not self.use_journal:
+            self.owned_stocks = self._read_json(self.owned_stocks_file, {})
+        return dict(self.owned_stocks)
+
+    def save_owned_stocks(self, owned_stocks):
+        """Save currently owned stocks to the JSON file."""
+        self.owned_stocks = owned_stocks
+        if self.use_journal:
+            self.append_journal({'op': 'owned_stocks', 'owned_stocks': owned_stocks})
+            return
+        self._save(self.owned_stocks_file)
+
+    def load_owned_stocks_history(self):
+        """Load historical records of owned stocks and account balance from the JSON file."""
+        if not self.use_journal:
+            self._set_history(self._read_json(self.owned_stocks_history_file, []))
+
+    def save_owned_stocks_history(self):
+        """Save the historical records of owned stocks and account balance to the JSON file."""
+        if self.use_journal:
+            return  # History entries are already in the journal
+        self._save(self.owned_stocks_history_file)
+
+    def load_account_balance(self):
+        """Load the account balance from the JSON file."""
+        if not self.use_journal:
+            self.account_balance = self._read_json(self.account_balance_file, {}).get('account_balance', 0.0)
+        return self.account_balance
+
+    def save_account_balance(self, account_balance):
+        """Save the account balance to the JSON file."""
+        self.account_balance = account_balance
+        if self.use_journal:
+            self.append_journal({'op': 'balance', 'account_balance': account_balance})
+            return
+        self._save(self.account_balance_file)
+
+    def record_transaction(self, transaction, owned_stocks, account_balance):
+        """Store a transaction and the state it produced."""
+        self._append_transaction(transaction, owned_stocks, account_balance)
+        if self.use_journal:
+            self.append_journal({
+                'op': 'trade',
+                'transaction': transaction,
+                'position': owned_stocks.get(transaction['symbol']),
+                'account_balance': account_balance
+            })
+        else:
+            self._save(*self._all_files())
+
+    def record_transactions(self, transactions, owned_stocks, account_balance):
+        """Store a batch of transactions with a single history entry and a single write."""
+        self._append_transactions(transactions, owned_stocks, account_balance)
+        if self.use_journal:
+            symbols = {transaction['symbol'] for transaction in transactions}
+            self.append_journal({
+                'op': 'trades',
+                'transactions': transactions,
+                'positions': {symbol: owned_stocks.get(symbol) for symbol in symbols},
+                'account_balance': account_balance
+            })
+        else:
+            self._save(*self._all_files())
+
+    def _append_transaction(self, transaction, owned_stocks, account_balance):
+        self._append_transactions([transaction], owned_stocks, account_balance)
+
+    def _append_transactions(self, transactions, owned_stocks, account_balance):
+        self.transactions.extend(transactions)
+        self.transaction_id_counter = transactions[-1]['id'] + 1
+        self.owned_stocks = owned_stocks
+        self.account_balance = account_balance
+        symbols = {transaction['symbol'] for transaction in transactions}
+        self._append_history_entry(transactions[-1]['timestamp'], owned_stocks, account_balance, symbols)
+
+    def record_history(self, timestamp, owned_stocks, account_balance):
+        """Append a history entry with the given state."""
+        self._append_history_entry(timestamp, owned_stocks, account_balance)
+        if self.use_journal:
+            self.append_journal({'op': 'history', 'timestamp': timestamp})
+        else:
+            self.save_owned_stocks_history()
+
+    def _append_history_entry(self, timestamp, owned_stocks, account_balance, symbols=None):
+        record = self.history_encoder.encode(timestamp, owned_stocks, account_balance, symbols)
+        if is_checkpoint(record):
+            self.history_checkpoints.append(len(self.owned_stocks_history))
+        self.owned_stocks_history.append(record)
+        self.history_timestamps.append(timestamp)
+
+    def get_transaction(self, transaction_id):
+        """Retrieve a transaction by its ID."""
+        return self.transactions.get(transaction_id)
+
+    def list_transactions(self):
+        """List all transactions."""
+        return self.transactions
+
+    def query_transactions(self, symbol=None, start=None, end=None, limit=None, offset=0, after_id=None):
+        """List transactions filtered by symbol and time range."""
+        indexes = self.transactions.query(symbol=symbol, start=to_timestamp(start), end=to_timestamp(end), after_id=after_id)
+        return self.transactions.rows(indexes[offset:None if limit is None else offset + limit])
+
+    def history_points(self):
+        """Iterate (timestamp, account balance, number of positions) per history entry, without expanding the delta records."""
+        if isinstance(self.owned_stocks_history, HistoryView):
+            return self.owned_stocks_history.points()
+        return history_points(self.owned_stocks_history)
+
+    def list_owned_stocks_history(self):
+        """List all historical records of owned stocks and account balance."""
+        return list(expand_history(self.owned_stocks_history))
+
+    def query_owned_stocks_history(self, start=None, end=None, limit=None, offset=0):
+        """List history entries within a time range."""
+        first = 0 if start is None else bisect.bisect_left(self.history_timestamps, to_timestamp(start))
+        last = len(self.history_timestamps) if end is None else bisect.bisect_right(self.history_timestamps, to_timestamp(end))
+        first = min(first + offset, last)
+        if limit is not None:
+            last = min(last, first + limit)
+        if first == last:
+            return []
+        previous = self._rebuild(first - 1)
+        owned_stocks = None if previous is None else previous['owned_stocks']
+        return list(expand_history(self.owned_stocks_history[first:last], owned_stocks))
+
+    def _rebuild(self, index):
+        """Rebuild the full state at a record index from the nearest checkpoint before it."""
+        if index < 0:
+            return None
+        checkpoint = self.history_checkpoints[bisect.bisect_right(self.history_checkpoints, index) - 1]
+        return rebuild_state(self.owned_stocks_history[checkpoint:index + 1])
+
+    def state_at(self, timestamp):
+        """Return the owned stocks and account balance as of the given time."""
+        return self._rebuild(bisect.bisect_right(self.history_timestamps, to_timestamp(timestamp)) - 1)
+
+    def clear_transactions(self):
+        """Clear all transactions."""
+        self._set_transactions([])
+        self.transaction_id_counter = 1
+        if self.use_journal:
+            self.append_journal({'op': 'clear', 'target': 'transactions'})
+        else:
+            self.save_transactions(self.transaction_id_counter)
+
+    def clear_owned_stocks_history(self):
+        """Clear owned stocks history."""
+        self._set_history([])
+        if self.use_journal:
+            self.append_journal({'op': 'clear', 'target': 'owned_stocks_history'})
+        else:
+            self.save_owned_stocks_history()
+
+    def append_journal(self, record):
+        """Append a single compact record to the write-ahead journal."""
+        self.journal_seq += 1
+        record = {'seq': self.journal_seq, **record}
+        self._pending_journal.append(json.dumps(record, separators=(',', ':')) + '\n')
+        self._journal_records += 1
+        if self.autoflush:
+            self.flush()
+
+    def load_journal(self):
+        """Load the latest snapshot and replay the journal records written after it."""
+        try:
+            if self.snapshot_format == 'binary':
+                snapshot = read_snapshot(self.snapshot_file)
+                self.transactions = snapshot['transactions']
+            else:
+                with open(self.snapshot_file, 'r') as file:
+                    snapshot = json.load(file)
+                self._set_transactions(snapshot.get('transactions', []))
+            self.transaction_id_counter = snapshot.get('transaction_id_counter', 1)
+            self.owned_stocks = snapshot.get('owned_stocks', {})
+            self._set_history(snapshot.get('owned_stocks_history', []))
+            self.account_balance = snapshot.get('account_balance', 0.0)
+            self.journal_seq = snapshot.get('journal_seq', 0)
+        except FileNotFoundError:
+            # No snapshot yet, start from the regular JSON files
+            self._read_files()
+
+        self._journal_records = 0
+        valid_bytes = 0
+        try:
+            with open(self.journal_file, 'rb') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # Torn write at the end of the journal
+                    valid_bytes += len(line)
+                    if record['seq'] <= self.journal_seq:
+                        continue  # Already folded into the snapshot
+                    self.replay_journal_record(record)
+                    self.journal_seq = record['seq']
+                    self._journal_records += 1
+        except FileNotFoundError:
+            pass
+
+        self._journal = open(self.journal_file, 'a')
+        self._journal.truncate(valid_bytes)  # Drop a torn tail so new records start on a clean line
+
+    def replay_journal_record(self, record):
+        """Apply a single journal record to the in-memory state."""
+        op = record['op']
+        if op == 'trade':
+            transaction = record['transaction']
+            if record['position'] is None:
+                self.owned_stocks.pop(transaction['symbol'], None)
+            else:
+                self.owned_stocks[transaction['symbol']] = record['position']
+            self._append_transaction(transaction, self.owned_stocks, record['account_balance'])
+        elif op == 'trades':
+            for symbol, position in record['positions'].items():
+                if position is None:
+                    self.owned_stocks.pop(symbol, None)
+                else:
+                    self.owned_stocks[symbol] = position
+            self._append_transactions(record['transactions'], self.owned_stocks, record['account_balance'])
+        elif op == 'balance':
+            self.account_balance = record['account_balance']
+        elif op == 'owned_stocks':
+            self.owned_stocks = record['owned_stocks']
+        elif op == 'history':
+            self._append_history_entry(record['timestamp'], self.owned_stocks, self.account_balance)
+        elif op == 'clear':
+            if record['target'] == 'transactions':
+                self._set_transactions([])
+                self.transaction_id_counter = 1
+            elif record['target'] == 'owned_stocks_history':
+                self._set_history([])
+        else:
+            raise ValueError(f"Unknown journal record type: {op}")
+
+    def compact_journal(self):
+        """Fold the journal into a snapshot and truncate it."""
+        self.begin_compaction()()
+
+    def begin_compaction(self):
+        """Capture pending writes and a snapshot, and return a function that writes them and truncates the journal."""
+        return self.begin_flush(compact=True)
+
+    def close(self):
+        """Flush pending writes and close the journal file if journal mode is enabled."""
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,26 @@
+from .delta_history import DEFAULT_CHECKPOINT_INTERVAL
+from .json_storage import JsonStorage
+
+class MemoryStorage(JsonStorage):
+    """
+    Keeps the trading data in memory only, without reading or writing any files.
+
+    It shares the in-memory structures and queries of JsonStorage, so a database backed by
+    it behaves the same apart from persistence. Used for backtests and other throwaway runs.
+    """
+
+    def __init__(self, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL):
+        super().__init__(None, None, None, None, checkpoint_interval=checkpoint_interval)
+
+    @staticmethod
+    def _read_json(path, default):
+        return default
+
+    def _save(self, *paths):
+        pass
+
+    def begin_flush(self, compact=False):
+        return lambda: None
+
+    def close(self):
+        pass
@@ -0,0 +1,384 @@
+import functools
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from .base_storage import StorageBackend, to_timestamp
+from .delta_history import DEFAULT_CHECKPOINT_INTERVAL, HistoryEncoder, expand_history, rebuild_state
+
+def synchronized(method):
+    """Serialize access to the shared connection, which sqlite3 does not do for us."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._connection_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Stores the trading data in an indexed SQLite database.
+
+    Transactions and history stay on disk and are only read when queried, so lookups by id
+    use the primary key index and symbol or time range queries use their own indexes
+    instead of scanning the whole history. History entries are delta encoded (see
+    delta_history); checkpoint rows store the full owned stocks and delta rows only the
+    changed positions.
+    """
+
+    def __init__(self, database_file, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL):
+        self.database_file = database_file
+        self.history_encoder = HistoryEncoder(checkpoint_interval)
+        self._unobserved_history = []  # Records inserted by the current write, observed once it succeeds
+        self._connection_lock = threading.RLock()
+        self.connection = sqlite3.connect(database_file, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.create_tables()
+        self._prime_history_encoder()
+
+    def create_tables(self):
+        """Create the tables and indexes if they do not exist yet."""
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS transactions (
+                    id INTEGER PRIMARY KEY,
+                    symbol TEXT NOT NULL,
+                    quantity NUMERIC NOT NULL,
+                    price REAL NOT NULL,
+                    transaction_type TEXT NOT NULL,
+                    timestamp TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_transactions_symbol ON transactions (symbol, id);
+                CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions (timestamp);
+
+                CREATE TABLE IF NOT EXISTS owned_stocks (
+                    symbol TEXT PRIMARY KEY,
+                    quantity NUMERIC NOT NULL,
+                    purchase_price REAL NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS owned_stocks_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    owned_stocks TEXT,  -- Full owned stocks, only set on checkpoints
+                    changes TEXT,  -- Changed positions, only set on deltas
+                    account_balance REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_history_timestamp ON owned_stocks_history (timestamp);
+                CREATE INDEX IF NOT EXISTS idx_history_checkpoints ON owned_stocks_history (id)
+                    WHERE owned_stocks IS NOT NULL;
+
+                CREATE TABLE IF NOT EXISTS metadata (
+                    key TEXT PRIMARY KEY,
+                    value
+                );
+            """)
+
+    @contextmanager
+    def _write(self):
+        """
+        Run statements in a savepoint, committing unless autoflush is disabled.
+
+        A failing write only rolls back its own statements; the writes held back while
+        autoflush is disabled stay in the open transaction.
+        """
+        if not self.connection.in_transaction:
+            # Otherwise releasing the savepoint would commit
+            self.connection.execute("BEGIN")
+        self.connection.execute("SAVEPOINT write")
+        try:
+            yield
+        except Exception:
+            self._unobserved_history = []
+            self.connection.execute("ROLLBACK TO write")
+            self.connection.execute("RELEASE write")
+            raise
+        self.connection.execute("RELEASE write")
+        for record in self._unobserved_history:
+            self.history_encoder.observe(record)
+        self._unobserved_history = []
+        if self.autoflush:
+            self.connection.commit()
+
+    @synchronized
+    def flush(self):
+        """Commit the writes held back while autoflush is disabled."""
+        if self.connection is not None:
+            self.connection.commit()
+
+    def _get_metadata(self, key, default):
+        row = self.connection.execute("SELECT value FROM metadata WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row['value']
+
+    def _set_metadata(self, key, value):
+        self.connection.execute(
+            "INSERT INTO metadata (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    def _write_owned_stocks(self, owned_stocks):
+        self.connection.execute("DELETE FROM owned_stocks")
+        self.connection.executemany(
+            "INSERT INTO owned_stocks (symbol, quantity, purchase_price) VALUES (?, ?, ?)",
+            [(symbol, stock['quantity'], stock['purchase_price']) for symbol, stock in owned_stocks.items()]
+        )
+
+    def _write_position(self, symbol, position):
+        if position is None:
+            self.connection.execute("DELETE FROM owned_stocks WHERE symbol = ?", (symbol,))
+        else:
+            self.connection.execute(
+                "INSERT INTO owned_stocks (symbol, quantity, purchase_price) VALUES (?, ?, ?) "
+                "ON CONFLICT(symbol) DO UPDATE SET quantity = excluded.quantity, "
+                "purchase_price = excluded.purchase_price",
+                (symbol, position['quantity'], position['purchase_price'])
+            )
+
+    def _prime_history_encoder(self):
+        checkpoint = self._last_checkpoint_id()
+        if checkpoint is not None:
+            for record in self._history_records(checkpoint):
+                self.history_encoder.observe(record)
+
+    def _last_checkpoint_id(self, before_id=None):
+        query = "SELECT max(id) AS id FROM owned_stocks_history WHERE owned_stocks IS NOT NULL"
+        params = []
+        if before_id is not None:
+            query += " AND id <= ?"
+            params.append(before_id)
+        return self.connection.execute(query, params).fetchone()['id']
+
+    def _history_records(self, first_id, last_id=None):
+        query = "SELECT * FROM owned_stocks_history WHERE id >= ?"
+        params = [first_id]
+        if last_id is not None:
+            query += " AND id <= ?"
+            params.append(last_id)
+        rows = self.connection.execute(query + " ORDER BY id", params)
+        return [self._record_from_row(row) for row in rows]
+
+    def _insert_history(self, timestamp, owned_stocks, account_balance, symbols=None):
+        record = self.history_encoder.encode(timestamp, owned_stocks, account_balance, symbols, update=False)
+        self.connection.execute(
+            "INSERT INTO owned_stocks_history (timestamp, owned_stocks, changes, account_balance) VALUES (?, ?, ?, ?)",
+            (
+                timestamp,
+                json.dumps(record['owned_stocks'], separators=(',', ':')) if 'owned_stocks' in record else None,
+                json.dumps(record['changes'], separators=(',', ':')) if 'changes' in record else None,
+                account_balance
+            )
+        )
+        self._unobserved_history.append(record)
+
+    @staticmethod
+    def _transaction_from_row(row):
+        return {
+            'id': row['id'],
+            'symbol': row['symbol'],
+            'quantity': row['quantity'],
+            'price': row['price'],
+            'transaction_type': row['transaction_type'],
+            'timestamp': row['timestamp']
+        }
+
+    @staticmethod
+    def _record_from_row(row):
+        record = {'timestamp': row['timestamp'], 'account_balance': row['account_balance']}
+        if row['owned_stocks'] is not None:
+            record['owned_stocks'] = json.loads(row['owned_stocks'])
+        else:
+            record['changes'] = json.loads(row['changes'])
+        return record
+
+    @staticmethod
+    def _range_clause(start, end, conditions, params):
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(to_timestamp(start))
+        if end is not None:
+            conditions.append("timestamp <= ?")
+            params.append(to_timestamp(end))
+
+    @staticmethod
+    def _page_clause(limit, offset):
+        if limit is None and not offset:
+            return "", []
+        return " LIMIT ? OFFSET ?", [-1 if limit is None else limit, offset]
+
+    @synchronized
+    def load_transactions(self):
+        """Return the next transaction id."""
+        return self._get_metadata('transaction_id_counter', 1)
+
+    @synchronized
+    def save_transactions(self, transaction_id_counter):
+        """Store the transaction id counter; transactions are written as they are recorded."""
+        with self._write():
+            self._set_metadata('transaction_id_counter', transaction_id_counter)
+
+    @synchronized
+    def load_owned_stocks(self):
+        """Load the currently owned stocks."""
+        rows = self.connection.execute("SELECT symbol, quantity, purchase_price FROM owned_stocks")
+        return {row['symbol']: {'quantity': row['quantity'], 'purchase_price': row['purchase_price']}
+                for row in rows}
+
+    @synchronized
+    def save_owned_stocks(self, owned_stocks):
+        """Replace the stored owned stocks."""
+        with self._write():
+            self._write_owned_stocks(owned_stocks)
+
+    @synchronized
+    def load_owned_stocks_history(self):
+        """History is read on demand, nothing to load."""
+        pass
+
+    @synchronized
+    def save_owned_stocks_history(self):
+        """History entries are written as they are recorded."""
+        pass
+
+    @synchronized
+    def load_account_balance(self):
+        """Load the account balance."""
+        return self._get_metadata('account_balance', 0.0)
+
+    @synchronized
+    def save_account_balance(self, account_balance):
+        """Store the account balance."""
+        with self._write():
+            self._set_metadata('account_balance', account_balance)
+
+    @synchronized
+    def record_transaction(self, transaction, owned_stocks, account_balance):
+        """Store a transaction, the changed position, the balance and a history entry in one commit."""
+        with self._write():
+            self.connection.execute(
+                "INSERT INTO transactions (id, symbol, quantity, price, transaction_type, timestamp) "
+                "VALUES (:id, :symbol, :quantity, :price, :transaction_type, :timestamp)",
+                transaction
+            )
+            self._write_position(transaction['symbol'], owned_stocks.get(transaction['symbol']))
+            self._insert_history(transaction['timestamp'], owned_stocks, account_balance, [transaction['symbol']])
+            self._set_metadata('transaction_id_counter', transaction['id'] + 1)
+            self._set_metadata('account_balance', account_balance)
+
+    @synchronized
+    def record_transactions(self, transactions, owned_stocks, account_balance):
+        """Store a batch of transactions, the changed positions, the balance and one history entry in one commit."""
+        symbols = {transaction['symbol'] for transaction in transactions}
+        with self._write():
+            self.connection.executemany(
+                "INSERT INTO transactions (id, symbol, quantity, price, transaction_type, timestamp) "
+                "VALUES (:id, :symbol, :quantity, :price, :transaction_type, :timestamp)",
+                transactions
+            )
+            for symbol in symbols:
+                self._write_position(symbol, owned_stocks.get(symbol))
+            self._insert_history(transactions[-1]['timestamp'], owned_stocks, account_balance, symbols)
+            self._set_metadata('transaction_id_counter', transactions[-1]['id'] + 1)
+            self._set_metadata('account_balance', account_balance)
+
+    @synchronized
+    def record_history(self, timestamp, owned_stocks, account_balance):
+        """Append a history entry with the given state."""
+        with self._write():
+            self._insert_history(timestamp, owned_stocks, account_balance)
+
+    @synchronized
+    def get_transaction(self, transaction_id):
+        """Retrieve a transaction by its ID."""
+        row = self.connection.execute("SELECT * FROM transactions WHERE id = ?", (transaction_id,)).fetchone()
+        return None if row is None else self._transaction_from_row(row)
+
+    @synchronized
+    def list_transactions(self):
+        """List all transactions."""
+        return self.query_transactions()
+
+    @synchronized
+    def query_transactions(self, symbol=None, start=None, end=None, limit=None, offset=0, after_id=None):
+        """List transactions filtered by symbol and time range."""
+        conditions, params = [], []
+        if symbol is not None:
+            conditions.append("symbol = ?")
+            params.append(symbol)
+        if after_id is not None:
+            conditions.append("id > ?")
+            params.append(after_id)
+        self._range_clause(start, end, conditions, params)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        page, page_params = self._page_clause(limit, offset)
+        rows = self.connection.execute(
+            "SELECT * FROM transactions" + where + " ORDER BY id" + page, params + page_params
+        )
+        return [self._transaction_from_row(row) for row in rows]
+
+    @synchronized
+    def list_owned_stocks_history(self):
+        """List all historical records of owned stocks and account balance."""
+        return self.query_owned_stocks_history()
+
+    @synchronized
+    def query_owned_stocks_history(self, start=None, end=None, limit=None, offset=0):
+        """List history entries within a time range."""
+        conditions, params = [], []
+        self._range_clause(start, end, conditions, params)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        page, page_params = self._page_clause(limit, offset)
+        bounds = self.connection.execute(
+            "SELECT min(id) AS first, max(id) AS last FROM "
+            "(SELECT id FROM owned_stocks_history" + where + " ORDER BY id" + page + ")",
+            params + page_params
+        ).fetchone()
+        if bounds['first'] is None:
+            return []
+
+        # Entries are appended in time order, so the matching ids form a contiguous range
+        checkpoint = self._last_checkpoint_id(bounds['first'])
+        records = self._history_records(checkpoint, bounds['last'])
+        skip = len(records) - (bounds['last'] - bounds['first'] + 1)
+        previous = rebuild_state(records[:skip])
+        return list(expand_history(records[skip:], None if previous is None else previous['owned_stocks']))
+
+    @synchronized
+    def state_at(self, timestamp):
+        """Return the owned stocks and account balance as of the given time."""
+        row = self.connection.execute(
+            "SELECT id FROM owned_stocks_history WHERE timestamp <= ? ORDER BY timestamp DESC, id DESC LIMIT 1",
+            (to_timestamp(timestamp),)
+        ).fetchone()
+        if row is None:
+            return None
+        return rebuild_state(self._history_records(self._last_checkpoint_id(row['id']), row['id']))
+
+    @synchronized
+    def clear_transactions(self):
+        """Remove all transactions."""
+        with self._write():
+            self.connection.execute("DELETE FROM transactions")
+            self._set_metadata('transaction_id_counter', 1)
+
+    @synchronized
+    def clear_owned_stocks_history(self):
+        """Remove all history entries."""
+        with self._write():
+            self.connection.execute("DELETE FROM owned_stocks_history")
+            self.history_encoder.reset()
+
+    @synchronized
+    def compact_journal(self):
+        """Checkpoint the SQLite write-ahead log into the database file."""
+        self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    @synchronized
+    def close(self):
+        """Commit pending writes and close the database connection."""
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
@@ -1,75 +1,329 @@
-import json
 import datetime
+import functools
+import logging
 import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    from .storage.json_storage import JsonStorage
+    from .storage.memory_storage import MemoryStorage
+except ImportError:
+    from storage.json_storage import JsonStorage
+    from storage.memory_storage import MemoryStorage
+
+try:
+    from .change_feed import DEFAULT_BUFFER_SIZE, ChangeFeed
+    from .history_index import HistoryIndex
+    from .ledger import PositionLedger
+    from .metrics import REGISTRY, log_event
+    from .net_worth import net_worth_series, to_datetime64
+except ImportError:
+    from change_feed import DEFAULT_BUFFER_SIZE, ChangeFeed
+    from history_index import HistoryIndex
+    from ledger import PositionLedger
+    from metrics import REGISTRY, log_event
+    from net_worth import net_worth_series, to_datetime64
+
+
+def instrumented(operation):
+    """Record a TradingDatabase method's latency, and its failures, under the given operation name."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self.metrics.enabled:
+                return method(self, *args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            except Exception:
+                self._operation_errors.labels(operation=operation).inc()
+                raise
+            finally:
+                series = self._operation_series.get(operation)
+                if series is None:
+                    series = self._operation_series[operation] = self._operation_seconds.labels(operation=operation)
+                series.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
 
 class TradingDatabase:
-    def __init__(self, transactions_file='transactions.json', 
+    def __init__(self, transactions_file='transactions.json',
                        owned_stocks_file='owned_stocks.json',
                        owned_stocks_history_file='owned_stocks_history.json',
-                       account_balance_file='account_balance.json'):
+                       account_balance_file='account_balance.json',
+                       journal_file='journal.jsonl',
+                       snapshot_file=None,
+                       use_journal=False,
+                       compact_threshold=None,
+                       history_checkpoint_interval=100,
+                       group_commit_interval=None,
+                       background_writer=False,
+                       storage=None,
+                       in_memory=False,
+                       clock=None,
+                       verbose=None,
+                       metrics=None,
+                       lot_method='fifo',
+                       snapshot_format='json',
+                       change_buffer_size=DEFAULT_BUFFER_SIZE):
         # Define the directory and file paths
         self.data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
-        self.transactions_file = os.path.join(self.data_dir, transactions_file)
-        self.owned_stocks_file = os.path.join(self.data_dir, owned_stocks_file)
-        self.owned_stocks_history_file = os.path.join(self.data_dir, owned_stocks_history_file)
-        self.account_balance_file = os.path.join(self.data_dir, account_balance_file)
 
-        # Ensure the data directory exists
-        if not os.path.exists(self.data_dir):
-            os.makedirs(self.data_dir)
+        if storage is None and in_memory:
+            storage = MemoryStorage(history_checkpoint_interval)
+        elif storage is None:
+            # Ensure the data directory exists
+            if not os.path.exists(self.data_dir):
+                os.makedirs(self.data_dir)
+
+            if snapshot_file is None:
+                snapshot_file = 'snapshot.bin' if snapshot_format == 'binary' else 'snapshot.json'
+            # Journal mode appends one compact record per change instead of rewriting every file
+            storage = JsonStorage(
+                transactions_file=os.path.join(self.data_dir, transactions_file),
+                owned_stocks_file=os.path.join(self.data_dir, owned_stocks_file),
+                owned_stocks_history_file=os.path.join(self.data_dir, owned_stocks_history_file),
+                account_balance_file=os.path.join(self.data_dir, account_balance_file),
+                journal_file=os.path.join(self.data_dir, journal_file),
+                snapshot_file=os.path.join(self.data_dir, snapshot_file),
+                use_journal=use_journal,
+                compact_threshold=compact_threshold,
+                checkpoint_interval=history_checkpoint_interval,
+                snapshot_format=snapshot_format
+            )
+        self.storage = storage
+
+        # Operation latencies, trade counts and bytes written go to the metrics registry
+        self.metrics = metrics or REGISTRY
+        self.storage.metrics = self.metrics
+        self._operation_seconds = self.metrics.histogram('tradingbot_db_operation_seconds', 'Time spent in TradingDatabase operations')
+        self._operation_errors = self.metrics.counter('tradingbot_db_operation_errors_total', 'TradingDatabase operations that raised an error')
+        self._transactions_total = self.metrics.counter('tradingbot_db_transactions_total', 'Transactions recorded, by transaction type')
+        self._operation_series = {}  # operation -> its latency series, to skip the label lookup
+
+        # Returns the current time for timestamps; a backtest passes the simulated time instead
+        self.clock = clock or datetime.datetime.now
+        # Verbose databases log every history entry at INFO instead of DEBUG level
+        self.verbose = not in_memory if verbose is None else verbose
+
+        # Group commit: hold writes back and flush them together once the window has passed
+        self.group_commit_interval = group_commit_interval
+        self.storage.autoflush = group_commit_interval is None and not background_writer
+        self._flush_timer = None
+
+        # _lock guards the in-memory state and is only held for in-memory work; _io_lock
+        # orders flushes so that a newer capture is never overwritten by an older one
+        self._lock = threading.RLock()
+        self._io_lock = threading.Lock()
+
+        # Background writer: a single thread that coalesces and performs all disk writes
+        self._writer = None
+        self._write_requested = threading.Event()
+        self._closing = threading.Event()
+        if background_writer:
+            self._writer = threading.Thread(target=self._writer_loop, name='TradingDatabaseWriter', daemon=True)
+            self._writer.start()
+
+        # Bumped whenever transactions or history are cleared, so cached readers know to start over
+        self.transactions_generation = 0
+        self.history_generation = 0
+
+        # Trades, balance changes, history entries and clears are published here for subscribers
+        self.changes = ChangeFeed(change_buffer_size)
 
-        self.transactions = []
         self.owned_stocks = {}  # {symbol: {'quantity': int, 'purchase_price': float}}
-        self.owned_stocks_history = []
+        # Per-symbol lots and P&L; built from the transactions on first use, then updated with every trade
+        self.lot_method = lot_method
+        PositionLedger(lot_method)  # Reject an unknown method right away
+        self._ledger = None
+        # Time index and downsampled aggregates of the history; built on first use, then updated with every entry
+        self._history_index = None
         self.transaction_id_counter = 1
         self.account_balance = 0.0  # Initialize account balance
 
-        self.load_transactions()
-        self.load_owned_stocks()
-        self.load_owned_stocks_history()
-        self.load_account_balance()
+        with self._operation_seconds.time(operation='load'):
+            self.load_transactions()
+            self.load_owned_stocks()
+            self.load_owned_stocks_history()
+            self.load_account_balance()
+
+    @property
+    def transactions(self):
+        """All transactions, as stored by the storage backend."""
+        return self.storage.list_transactions()
+
+    @property
+    def owned_stocks_history(self):
+        """All history entries, as stored by the storage backend."""
+        return self.storage.list_owned_stocks_history()
+
+    @owned_stocks_history.setter
+    def owned_stocks_history(self, entries):
+        with self._lock:
+            self.storage.clear_owned_stocks_history()
+            self.history_generation += 1
+            for entry in entries:
+                self.storage.record_history(entry['timestamp'], entry['owned_stocks'], entry['account_balance'])
+            self._reset_history_index()
+            self.changes.publish('clear', target='owned_stocks_history')
+            self._schedule_flush()
 
     def validate_transaction(self, symbol, quantity, price, transaction_type):
         """Validate input values."""
         if not symbol or quantity <= 0 or price <= 0 or transaction_type not in ['buy', 'sell']:
             raise ValueError("Invalid input values: Symbol, quantity, and price must be positive. Transaction type must be 'buy' or 'sell'.")
 
+    def _log_history(self, timestamp, **fields):
+        log_event('history_recorded', logging.INFO if self.verbose else logging.DEBUG, timestamp=timestamp, **fields)
+
+    @instrumented('add_transaction')
     def add_transaction(self, symbol, quantity, price, transaction_type):
         """Add a new transaction to the database."""
         self.validate_transaction(symbol, quantity, price, transaction_type)
-        
-        if transaction_type == 'buy':
-            total_cost = quantity * price
-            if total_cost > self.account_balance:
-                raise ValueError("Insufficient account balance to complete the transaction.")
-            self.account_balance -= total_cost
-        elif transaction_type == 'sell':
-            if symbol not in self.owned_stocks or quantity > self.owned_stocks[symbol]['quantity']:
-                raise ValueError("Insufficient stock quantity to complete the transaction.")
-            total_income = quantity * price
-            self.account_balance += total_income
-
-        transaction = {
-            'id': self.transaction_id_counter,
-            'symbol': symbol,
-            'quantity': quantity,
-            'price': price,
-            'transaction_type': transaction_type,  # 'buy' or 'sell'
-            'timestamp': datetime.datetime.now().isoformat()
-        }
-        self.transactions.append(transaction)
-        self.transaction_id_counter += 1
-        self.save_transactions()
-        self.update_owned_stocks(symbol, quantity, price, transaction_type)
-        self.save_owned_stocks()
-        self.record_owned_stocks_history()
-        self.save_account_balance()
+
+        with self._lock:
+            if transaction_type == 'buy':
+                total_cost = quantity * price
+                if total_cost > self.account_balance:
+                    raise ValueError("Insufficient account balance to complete the transaction.")
+                self.account_balance -= total_cost
+            elif transaction_type == 'sell':
+                if symbol not in self.owned_stocks or quantity > self.owned_stocks[symbol]['quantity']:
+                    raise ValueError("Insufficient stock quantity to complete the transaction.")
+                total_income = quantity * price
+                self.account_balance += total_income
+
+            transaction = {
+                'id': self.transaction_id_counter,
+                'symbol': symbol,
+                'quantity': quantity,
+                'price': price,
+                'transaction_type': transaction_type,  # 'buy' or 'sell'
+                'timestamp': self.clock().isoformat()
+            }
+            self.transaction_id_counter += 1
+            self.update_owned_stocks(symbol, quantity, price, transaction_type)
+            if self._ledger is not None:
+                self._ledger.apply(transaction)
+            self.storage.record_transaction(transaction, self.owned_stocks, self.account_balance)
+            if self._history_index is not None:
+                self._history_index.add(transaction['timestamp'], self.account_balance, len(self.owned_stocks))
+            self.changes.publish('trade', transaction=transaction, position=self.owned_stocks.get(symbol),
+                                 account_balance=self.account_balance)
+            self._schedule_flush()
+        self._transactions_total.labels(transaction_type=transaction_type).inc()
+        self._log_history(transaction['timestamp'], transaction_id=transaction['id'], symbol=symbol,
+                          quantity=quantity, price=price, transaction_type=transaction_type)
         return transaction['id']
 
+    @instrumented('add_transactions')
+    def add_transactions(self, batch):
+        """
+        Add several transactions at once, all or nothing.
+
+        The whole batch is validated against the projected balance and owned stocks before
+        anything is applied, then persisted with a single write and a single history entry.
+
+        :param batch: A list of (symbol, quantity, price, transaction_type) tuples or dictionaries with those keys.
+        :return: The list of transaction IDs, in batch order.
+        """
+        trades = [
+            (item['symbol'], item['quantity'], item['price'], item['transaction_type']) if isinstance(item, dict) else tuple(item)
+            for item in batch
+        ]
+        if not trades:
+            return []
+
+        with self._lock:
+            projected_balance = self.account_balance
+            projected_quantities = {symbol: stock['quantity'] for symbol, stock in self.owned_stocks.items()}
+            for index, (symbol, quantity, price, transaction_type) in enumerate(trades):
+                self.validate_transaction(symbol, quantity, price, transaction_type)
+                if transaction_type == 'buy':
+                    if quantity * price > projected_balance:
+                        raise ValueError(f"Batch item {index}: Insufficient account balance to complete the transaction.")
+                    projected_balance -= quantity * price
+                    projected_quantities[symbol] = projected_quantities.get(symbol, 0) + quantity
+                else:
+                    if quantity > projected_quantities.get(symbol, 0):
+                        raise ValueError(f"Batch item {index}: Insufficient stock quantity to complete the transaction.")
+                    projected_balance += quantity * price
+                    projected_quantities[symbol] -= quantity
+
+            timestamp = self.clock().isoformat()
+            transactions = []
+            events = []  # (transaction, position, account_balance) after each trade
+            for symbol, quantity, price, transaction_type in trades:
+                if transaction_type == 'buy':
+                    self.account_balance -= quantity * price
+                else:
+                    self.account_balance += quantity * price
+                transactions.append({
+                    'id': self.transaction_id_counter,
+                    'symbol': symbol,
+                    'quantity': quantity,
+                    'price': price,
+                    'transaction_type': transaction_type,
+                    'timestamp': timestamp
+                })
+                self.transaction_id_counter += 1
+                self.update_owned_stocks(symbol, quantity, price, transaction_type)
+                if self._ledger is not None:
+                    self._ledger.apply(transactions[-1])
+                events.append((transactions[-1], self.owned_stocks.get(symbol), self.account_balance))
+
+            self.storage.record_transactions(transactions, self.owned_stocks, self.account_balance)
+            if self._history_index is not None:
+                self._history_index.add(timestamp, self.account_balance, len(self.owned_stocks))
+            for transaction, position, account_balance in events:
+                self.changes.publish('trade', transaction=transaction, position=position, account_balance=account_balance)
+            self._schedule_flush()
+        for transaction in transactions:
+            self._transactions_total.labels(transaction_type=transaction['transaction_type']).inc()
+        self._log_history(timestamp, transaction_ids=[transaction['id'] for transaction in transactions])
+        return [transaction['id'] for transaction in transactions]
+
+    def _schedule_flush(self):
+        """Wake the background writer, or start the group commit window if one is configured."""
+        if self._writer is not None:
+            self._write_requested.set()
+            return
+        if self.group_commit_interval is None:
+            return
+        with self._lock:
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.group_commit_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _writer_loop(self):
+        """Flush pending changes whenever they are signalled, until the database is closed."""
+        while not self._closing.is_set():
+            self._write_requested.wait()
+            if self.group_commit_interval:
+                self._closing.wait(self.group_commit_interval)  # Let more changes join this write
+            self._write_requested.clear()
+            self.flush()
+
+    @instrumented('flush')
+    def flush(self):
+        """Write all changes held back by the group commit window or the background writer."""
+        with self._io_lock:
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                write = self.storage.begin_flush()
+            write()
+
     def update_owned_stocks(self, symbol, quantity, price, transaction_type):
         """Update currently owned stocks based on transaction type."""
         self.validate_transaction(symbol, quantity, price, transaction_type)
-        
+
         if transaction_type == 'buy':
             if symbol in self.owned_stocks:
                 current_quantity = self.owned_stocks[symbol]['quantity']
@@ -88,119 +342,229 @@ class TradingDatabase:
                 if quantity >= current_quantity:
                     del self.owned_stocks[symbol]
                 else:
-                    self.owned_stocks[symbol]['quantity'] -= quantity
+                    # Replace rather than mutate so earlier history entries keep their quantities
+                    self.owned_stocks[symbol] = {**self.owned_stocks[symbol], 'quantity': current_quantity - quantity}
 
+    @instrumented('record_owned_stocks_history')
     def record_owned_stocks_history(self):
         """Record the current state of owned stocks and account balance in history."""
-        print(f"Recording history at: {datetime.datetime.now().isoformat()}")
-        self.owned_stocks_history.append({
-            'timestamp': datetime.datetime.now().isoformat(),
-            'owned_stocks': self.owned_stocks.copy(),
-            'account_balance': self.account_balance  # Record the account balance
-        })
-        self.save_owned_stocks_history()
+        timestamp = self.clock().isoformat()
+        with self._lock:
+            self.storage.record_history(timestamp, self.owned_stocks, self.account_balance)
+            if self._history_index is not None:
+                self._history_index.add(timestamp, self.account_balance, len(self.owned_stocks))
+            self.changes.publish('history', timestamp=timestamp, owned_stocks=dict(self.owned_stocks),
+                                 account_balance=self.account_balance)
+            self._schedule_flush()
+        self._log_history(timestamp)
 
+    @instrumented('calculate_net_worth')
     def calculate_net_worth(self, current_prices):
         """Calculate the total net worth based on current stock prices and account balance."""
-        net_worth = self.account_balance
-        for symbol, stock in self.owned_stocks.items():
-            if symbol in current_prices:
-                net_worth += stock['quantity'] * current_prices[symbol]
+        with self._lock:
+            net_worth = self.account_balance
+            for symbol, stock in self.owned_stocks.items():
+                if symbol in current_prices:
+                    net_worth += stock['quantity'] * current_prices[symbol]
         return net_worth
 
+    @instrumented('calculate_net_worth_series')
+    def calculate_net_worth_series(self, timestamps, symbols, prices):
+        """
+        Calculate net worth at every timestamp of a (timestamps x symbols) price matrix.
+
+        Holdings and account balance are forward-filled from the owned stocks history and the
+        valuation runs as NumPy array operations (see net_worth.net_worth_series).
+
+        :return: A float64 array of net worth per timestamp.
+        """
+        timestamps = to_datetime64(timestamps)
+        # Entries after the last price timestamp cannot affect the series
+        end = np.datetime_as_string(timestamps.max(), unit='us') if len(timestamps) else None
+        history = self.query_owned_stocks_history(end=end) if end else []
+        return net_worth_series(history, timestamps, symbols, prices)
+
+    @property
+    def ledger(self):
+        """The PositionLedger, replayed from the stored transactions the first time it is needed."""
+        with self._lock:
+            if self._ledger is None:
+                transactions = self.storage.list_transactions()
+                if hasattr(transactions, 'to_records'):
+                    transactions = transactions.to_records()  # Much faster to replay than row views
+                ledger = PositionLedger(self.lot_method)
+                ledger.rebuild(transactions, self.owned_stocks)
+                self._ledger = ledger
+            return self._ledger
+
+    def _reset_ledger(self):
+        """Rebuild the ledger on next use, after positions changed other than by a trade."""
+        self._ledger = None
+
+    @instrumented('get_position')
+    def get_position(self, symbol, current_price=None):
+        """
+        Return a symbol's position from the lot ledger, in O(1).
+
+        :param current_price: The market price for the unrealized P&L (the last traded price by default).
+        :return: A dictionary with the quantity, average cost, cost basis, market value and
+            realized and unrealized P&L, or None if the symbol was never traded.
+        """
+        with self._lock:
+            return self.ledger.position(symbol, current_price)
+
+    def get_lots(self, symbol):
+        """Return the open lots of a symbol, in the order they were bought."""
+        with self._lock:
+            return self.ledger.lots(symbol)
+
+    @instrumented('get_portfolio_pnl')
+    def get_portfolio_pnl(self, current_prices=None):
+        """
+        Summarize P&L over the open positions, in O(positions).
+
+        :param current_prices: Market prices by symbol; other positions are valued at their last traded price.
+        :return: A dictionary with the open 'positions' by symbol and the portfolio's cost basis,
+            market value and realized, unrealized and total P&L.
+        """
+        with self._lock:
+            return self.ledger.summary(current_prices)
+
+    @instrumented('get_transaction')
     def get_transaction(self, transaction_id):
         """Retrieve a transaction by its ID."""
-        for transaction in self.transactions:
-            if transaction['id'] == transaction_id:
-                return transaction
-        return None
+        return self.storage.get_transaction(transaction_id)
 
     def list_transactions(self):
         """List all transactions."""
-        return self.transactions
+        return self.storage.list_transactions()
+
+    @instrumented('query_transactions')
+    def query_transactions(self, symbol=None, start=None, end=None, limit=None, offset=0, after_id=None):
+        """List transactions filtered by symbol and time range, with limit and offset."""
+        return self.storage.query_transactions(symbol=symbol, start=start, end=end, limit=limit, offset=offset, after_id=after_id)
 
     def list_owned_stocks(self):
         """List all currently owned stocks."""
-        return self.owned_stocks
+        with self._lock:
+            return dict(self.owned_stocks)  # A copy, so callers can iterate while trades come in
 
     def list_owned_stocks_history(self):
         """List all historical records of owned stocks and account balance."""
-        return self.owned_stocks_history
+        return self.storage.list_owned_stocks_history()
+
+    @instrumented('query_owned_stocks_history')
+    def query_owned_stocks_history(self, start=None, end=None, limit=None, offset=0):
+        """List historical records within a time range, with limit and offset."""
+        return self.storage.query_owned_stocks_history(start=start, end=end, limit=limit, offset=offset)
+
+    @property
+    def history_index(self):
+        """The HistoryIndex, built from the stored history the first time it is needed."""
+        with self._lock:
+            if self._history_index is None:
+                index = HistoryIndex()
+                index.rebuild(self.storage.history_points())
+                self._history_index = index
+            return self._history_index
+
+    def _reset_history_index(self):
+        """Rebuild the history index on next use, after the history changed other than by appending."""
+        self._history_index = None
+
+    @instrumented('query_history_points')
+    def query_history_points(self, start=None, end=None, limit=None, offset=0):
+        """
+        List the account balance and number of positions of the history entries within a time range.
+
+        Uses the time index, so neither the history records nor their timestamps are parsed.
+
+        :return: Dictionaries with timestamp, account_balance and positions, oldest first.
+        """
+        with self._lock:
+            return self.history_index.query(start, end, limit, offset)
+
+    @instrumented('query_history_aggregates')
+    def query_history_aggregates(self, resolution='hour', start=None, end=None):
+        """
+        Return the history downsampled per minute, hour or day.
+
+        :param resolution: 'minute', 'hour' or 'day'.
+        :return: One dictionary per bucket with entries, the last, min and max account balance and
+            the last, min and max number of positions, oldest first.
+        """
+        with self._lock:
+            return self.history_index.series(resolution, start, end)
+
+    @instrumented('state_at')
+    def state_at(self, timestamp):
+        """Rebuild owned stocks and account balance as of the given time from the nearest history checkpoint."""
+        return self.storage.state_at(timestamp)
 
     def save_transactions(self):
-        """Save transactions to the JSON file."""
-        with open(self.transactions_file, 'w') as file:
-            json.dump({
-                'transaction_id_counter': self.transaction_id_counter,
-                'transactions': self.transactions
-            }, file, indent=4)
+        """Save transactions to the storage backend."""
+        with self._lock:
+            self.storage.save_transactions(self.transaction_id_counter)
+            self._schedule_flush()
 
     def load_transactions(self):
-        """Load transactions from the JSON file."""
-        try:
-            with open(self.transactions_file, 'r') as file:
-                data = json.load(file)
-                self.transactions = data.get('transactions', [])
-                self.transaction_id_counter = data.get('transaction_id_counter', 1)
-        except FileNotFoundError:
-            self.transactions = []
-            self.transaction_id_counter = 1
+        """Load transactions from the storage backend."""
+        self.transaction_id_counter = self.storage.load_transactions()
+        self._reset_ledger()
 
     def save_owned_stocks(self):
-        """Save currently owned stocks to the JSON file."""
-        with open(self.owned_stocks_file, 'w') as file:
-            json.dump(self.owned_stocks, file, indent=4)
+        """Save currently owned stocks to the storage backend."""
+        with self._lock:
+            self.storage.save_owned_stocks(self.owned_stocks)
+            self._schedule_flush()
 
     def load_owned_stocks(self):
-        """Load currently owned stocks from the JSON file."""
-        try:
-            with open(self.owned_stocks_file, 'r') as file:
-                self.owned_stocks = json.load(file)
-        except FileNotFoundError:
-            self.owned_stocks = {}
+        """Load currently owned stocks from the storage backend."""
+        self.owned_stocks = self.storage.load_owned_stocks()
+        self._reset_ledger()
 
     def save_owned_stocks_history(self):
-        """Save the historical records of owned stocks and account balance to the JSON file."""
-        with open(self.owned_stocks_history_file, 'w') as file:
-            json.dump(self.owned_stocks_history, file, indent=4)
+        """Save the historical records of owned stocks and account balance to the storage backend."""
+        with self._lock:
+            self.storage.save_owned_stocks_history()
+            self._schedule_flush()
 
     def load_owned_stocks_history(self):
-        """Load historical records of owned stocks and account balance from the JSON file."""
-        try:
-            with open(self.owned_stocks_history_file, 'r') as file:
-                self.owned_stocks_history = json.load(file)
-        except FileNotFoundError:
-            self.owned_stocks_history = []
+        """Load historical records of owned stocks and account balance from the storage backend."""
+        self.storage.load_owned_stocks_history()
+        self._reset_history_index()
 
     def save_account_balance(self):
-        """Save the account balance to the JSON file."""
-        with open(self.account_balance_file, 'w') as file:
-            json.dump({'account_balance': self.account_balance}, file, indent=4)
+        """Save the account balance to the storage backend."""
+        with self._lock:
+            self.storage.save_account_balance(self.account_balance)
+            self._schedule_flush()
 
     def load_account_balance(self):
-        """Load the account balance from the JSON file."""
-        try:
-            with open(self.account_balance_file, 'r') as file:
-                data = json.load(file)
-                self.account_balance = data.get('account_balance', 0.0)
-        except FileNotFoundError:
-            self.account_balance = 0.0
+        """Load the account balance from the storage backend."""
+        self.account_balance = self.storage.load_account_balance()
 
+    @instrumented('add_account_balance')
     def add_account_balance(self, amount):
         """Add money to the account balance."""
         if amount <= 0:
             raise ValueError("Amount to add must be positive.")
-        self.account_balance += amount
-        self.save_account_balance()
+        with self._lock:
+            self.account_balance += amount
+            self.save_account_balance()
+            self.changes.publish('balance', account_balance=self.account_balance)
 
+    @instrumented('remove_account_balance')
     def remove_account_balance(self, amount):
         """Remove money from the account balance."""
         if amount <= 0:
             raise ValueError("Amount to remove must be positive.")
-        if amount > self.account_balance:
-            raise ValueError("Insufficient account balance.")
-        self.account_balance -= amount
-        self.save_account_balance()
+        with self._lock:
+            if amount > self.account_balance:
+                raise ValueError("Insufficient account balance.")
+            self.account_balance -= amount
+            self.save_account_balance()
+            self.changes.publish('balance', account_balance=self.account_balance)
 
     def get_account_balance(self):
         """Get account balance"""
@@ -208,21 +572,67 @@ class TradingDatabase:
 
     def clear_transactions(self):
         """Clear all transactions."""
-        self.transactions = []
-        self.transaction_id_counter = 1
-        self.save_transactions()
+        with self._lock:
+            self.transaction_id_counter = 1
+            self.storage.clear_transactions()
+            self.transactions_generation += 1
+            self._reset_ledger()
+            self.changes.publish('clear', target='transactions')
+            self._schedule_flush()
 
     def clear_owned_stocks(self):
         """Clear owned stocks."""
-        self.owned_stocks = {}
-        self.save_owned_stocks()
+        with self._lock:
+            self.owned_stocks = {}
+            self._reset_ledger()
+            self.save_owned_stocks()
+            self.changes.publish('clear', target='owned_stocks')
 
     def clear_owned_stocks_history(self):
         """Clear owned stocks history."""
-        self.owned_stocks_history = []
-        self.save_owned_stocks_history()
+        with self._lock:
+            self.storage.clear_owned_stocks_history()
+            self.history_generation += 1
+            self._reset_history_index()
+            self.changes.publish('clear', target='owned_stocks_history')
+            self._schedule_flush()
 
     def reset_account_balance(self):
         """Reset the account balance to zero."""
-        self.account_balance = 0.0
-        self.save_account_balance()
\ No newline at end of file
+        with self._lock:
+            self.account_balance = 0.0
+            self.save_account_balance()
+            self.changes.publish('balance', account_balance=self.account_balance)
+
+    def subscribe(self, after_seq=None):
+        """
+        Subscribe to the change feed.
+
+        Events are ChangeEvent(seq, type, data) tuples of type 'trade' (data holds the
+        transaction, the symbol's resulting position and the account balance), 'balance',
+        'history' or 'clear' (with the cleared 'target'). Sequence numbers restart with the process.
+
+        :param after_seq: Resume after this sequence number instead of starting with the next event.
+        :return: A change_feed.Subscription; iterate it or call get()/poll().
+        """
+        return self.changes.subscribe(after_seq)
+
+    @instrumented('compact_journal')
+    def compact_journal(self):
+        """Fold the storage backend's write-ahead journal into its main storage."""
+        with self._io_lock:
+            with self._lock:
+                write = self.storage.begin_compaction()
+            write()
+
+    def close(self):
+        """Stop the background writer, flush pending writes and close the storage backend."""
+        if self._writer is not None:
+            self._closing.set()
+            self._write_requested.set()
+            self._writer.join()
+            self._writer = None
+        self.flush()
+        with self._io_lock, self._lock:
+            self.storage.close()
+        self.changes.close()
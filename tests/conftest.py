@@ -0,0 +1,25 @@
+import pytest
+from src.trading_database import TradingDatabase
+
+DATA_FILES = {
+    'transactions_file': 'transactions.json',
+    'owned_stocks_file': 'owned_stocks.json',
+    'owned_stocks_history_file': 'owned_stocks_history.json',
+    'account_balance_file': 'account_balance.json',
+    'journal_file': 'journal.jsonl',
+}
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    """
+    Factory for TradingDatabases whose data files are in tmp_path.
+
+    Keyword arguments are passed to TradingDatabase and override the file paths and
+    verbose=False; calling it again with the same arguments reopens the same files.
+    """
+    def make(**kwargs):
+        files = {name: str(tmp_path / filename) for name, filename in DATA_FILES.items()}
+        files['snapshot_file'] = str(tmp_path / ('snapshot.bin' if kwargs.get('snapshot_format') == 'binary' else 'snapshot.json'))
+        return TradingDatabase(**{**files, 'verbose': False, **kwargs})
+    return make
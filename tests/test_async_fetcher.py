@@ -0,0 +1,142 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+from src.fetcher.abastract_fetcher import FinancialDataFetcher
+from src.fetcher.async_fetcher import ENDPOINTS, AsyncFetcherAdapter, HTTPFinancialDataFetcher
+
+DELAY = 0.05
+
+
+class StubProvider(BaseHTTPRequestHandler):
+    """Stand-in data provider that answers every request after a short delay."""
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so pooled connections can be reused
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.connections.add(self.client_address)
+        time.sleep(DELAY)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        status = 500 if query['symbol'][0] == 'FAIL' else 200
+        body = json.dumps({'endpoint': url.path.strip('/'), 'symbol': query['symbol'][0], 'key': query['apikey'][0]}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with server.lock:
+            server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class StubFetcher(HTTPFinancialDataFetcher):
+    def build_request(self, endpoint, symbol):
+        return endpoint, {'symbol': symbol, 'apikey': self.api_keys['stub']}
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubProvider)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.in_flight = server.max_in_flight = 0
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def fetcher_for(server, max_concurrency):
+    fetcher = StubFetcher(f'http://127.0.0.1:{server.server_address[1]}', max_concurrency=max_concurrency)
+    fetcher.set_api_keys({'stub': 'secret'})
+    return fetcher
+
+def test_fetch_many_is_concurrent_bounded_and_pooled(server):
+    symbols = [f'SYM{index}' for index in range(20)]
+
+    async def run():
+        async with fetcher_for(server, max_concurrency=8) as fetcher:
+            started = time.perf_counter()
+            results = await fetcher.fetch_many(symbols)
+            return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(run())
+
+    assert list(results) == symbols
+    assert results['SYM3']['balance_sheet'] == {'endpoint': 'balance_sheet', 'symbol': 'SYM3', 'key': 'secret'}
+    assert all(set(endpoints) == set(ENDPOINTS) for endpoints in results.values())
+    # 100 requests one at a time would take 100 * DELAY
+    assert elapsed < 100 * DELAY / 3
+    assert server.max_in_flight <= 8
+    assert len(server.connections) <= 8
+
+def test_fetch_many_reports_failures(server):
+    async def run(**kwargs):
+        async with fetcher_for(server, max_concurrency=4) as fetcher:
+            return await fetcher.fetch_many(['AAPL', 'FAIL'], ['income_statement'], **kwargs)
+
+    results = asyncio.run(run(return_exceptions=True))
+    assert results['AAPL']['income_statement']['symbol'] == 'AAPL'
+    assert isinstance(results['FAIL']['income_statement'], Exception)
+
+    with pytest.raises(Exception):
+        asyncio.run(run())
+
+def test_close_waits_for_requests_in_flight(server):
+    async def run():
+        fetcher = fetcher_for(server, max_concurrency=2)
+        request = asyncio.ensure_future(fetcher.fetch('AAPL', 'balance_sheet'))
+        while not server.in_flight:
+            await asyncio.sleep(0.001)
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        ticker = asyncio.ensure_future(tick())
+        await fetcher.close()
+        ticker.cancel()
+        # The request finished on the open session, and the loop kept running while close() waited
+        assert request.done() and request.result()['symbol'] == 'AAPL'
+        assert ticks > 1
+
+    asyncio.run(run())
+
+def test_adapter_runs_synchronous_fetchers_concurrently():
+    class SlowFetcher(FinancialDataFetcher):
+        def fetch_income_statement(self, symbol):
+            time.sleep(DELAY)
+            return {'symbol': symbol}
+        fetch_balance_sheet = fetch_stock_price_history = fetch_news_and_events = fetch_analyst_reports = fetch_income_statement
+
+        def set_api_keys(self, api_keys):
+            pass
+
+    async def run():
+        async with AsyncFetcherAdapter(SlowFetcher(), max_concurrency=10) as fetcher:
+            started = time.perf_counter()
+            results = await fetcher.fetch_many(['A', 'B'], max_concurrency=10)
+            return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(run())
+    assert results['B']['analyst_reports'] == {'symbol': 'B'}
+    assert elapsed < 10 * DELAY / 2
+
+    with pytest.raises(ValueError):
+        asyncio.run(AsyncFetcherAdapter(SlowFetcher()).fetch('A', 'dividends'))
+    with pytest.raises(ValueError, match='above'):
+        asyncio.run(AsyncFetcherAdapter(SlowFetcher(), max_concurrency=2).fetch_many(['A'], max_concurrency=4))
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.backtest import Backtest, parse_decision, run_parameter_sweep
+from src.decision_maker.base_decision_maker import BaseDecisionMaker
+from src.decision_maker.indicators import SMA
+from src.storage.json_storage import JsonStorage
+from src.trading_database import TradingDatabase
+
+
+class MovingAverageCross:
+    """Buys when the fast average is above the slow one, sells otherwise."""
+
+    def __init__(self, fast, slow):
+        self.fast, self.slow = fast, slow
+
+    def __call__(self, symbol, data):
+        prices = data['stock_price_history']['prices']
+        if len(prices) < self.slow:
+            return 'hold'
+        return 'buy' if prices[-self.fast:].mean() > prices[-self.slow:].mean() else {'action': 'sell', 'quantity': 1000}
+
+
+class BuyTheDip(BaseDecisionMaker):
+    def analyze_financial_data(self, symbol, income_statement, balance_sheet, stock_price_history):
+        prices = stock_price_history['prices']
+        return {'drop': prices[-1] / prices.max() - 1}
+
+    def analyze_news(self, symbol, recent_news):
+        return {}
+
+    def generate_recommendations(self, symbol, metrics, news_analysis):
+        return {'recommendation': 'buy', 'quantity': 2} if metrics['drop'] < -0.05 else 'hold'
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(3)
+    index = pd.date_range('2024-01-01', periods=300, freq='h')
+    data = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (300, 3)), axis=0))
+    frame = pd.DataFrame(data, index=index, columns=['AAPL', 'MSFT', 'GOOG'])
+    frame.iloc[:50, 2] = np.nan  # Listed later
+    return frame
+
+@pytest.fixture
+def no_disk_writes(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('the in-memory database wrote to disk')
+    monkeypatch.setattr(JsonStorage, '_write_file', staticmethod(fail))
+
+def test_in_memory_database_does_not_persist(no_disk_writes, capsys):
+    database = TradingDatabase(in_memory=True)
+    database.add_account_balance(100)
+    database.add_transaction('AAPL', 1, 10.0, 'buy')
+    assert database.list_transactions()[0]['symbol'] == 'AAPL'
+    database.close()
+    assert capsys.readouterr().out == ''
+    assert TradingDatabase(in_memory=True).list_transactions() == []
+
+def test_backtest_produces_equity_curve_and_trade_log(prices, no_disk_writes):
+    result = Backtest(MovingAverageCross(5, 20), prices, initial_balance=10000.0).run()
+
+    equity = result['equity_curve']
+    assert list(equity.index) == list(prices.index)
+    assert equity.iloc[0] == 10000.0
+    trades = result['trades']
+    assert trades and {trade['symbol'] for trade in trades} == {'AAPL', 'MSFT', 'GOOG'}
+    assert trades[0]['timestamp'] >= prices.index[19].isoformat()
+    assert min(trade['timestamp'] for trade in trades if trade['symbol'] == 'GOOG') >= prices.index[69].isoformat()
+
+    # Replaying the trade log reproduces the final net worth
+    cash, holdings = 10000.0, {}
+    for trade in trades:
+        sign = 1 if trade['transaction_type'] == 'buy' else -1
+        cash -= sign * trade['quantity'] * trade['price']
+        holdings[trade['symbol']] = holdings.get(trade['symbol'], 0) + sign * trade['quantity']
+    assert result['final_net_worth'] == pytest.approx(cash + sum(quantity * prices[symbol].iloc[-1] for symbol, quantity in holdings.items()))
+    assert result['trade_count'] == len(trades)
+    assert 0 <= result['max_drawdown'] < 1
+
+def test_backtest_runs_decision_makers(prices):
+    result = Backtest(BuyTheDip(), prices, initial_balance=500.0).run()
+    assert all(trade['quantity'] == 2 for trade in result['trades'])
+    assert result['rejected_orders'] > 0  # The money runs out
+
+def test_decision_makers_get_streaming_indicators(prices):
+    class SmaCross(BuyTheDip):
+        indicator_factories = {'sma': lambda: SMA(10)}
+        seen = []
+
+        def analyze_financial_data(self, symbol, income_statement, balance_sheet, stock_price_history):
+            sma = stock_price_history['indicators']['sma']
+            if symbol == 'AAPL':
+                self.seen.append(sma)
+            return {'drop': 0.0 if sma is None else stock_price_history['current_price'] / sma - 1}
+
+    Backtest(SmaCross(), prices, initial_balance=500.0).run()
+    assert SmaCross.seen[:9] == [None] * 9
+    assert SmaCross.seen[-1] == pytest.approx(prices['AAPL'].iloc[-10:].mean())
+
+def test_parse_decision():
+    assert parse_decision('Buy more', 3) == ('buy', 3)
+    assert parse_decision({'action': 'sell', 'quantity': 5}, 1) == ('sell', 5)
+    assert parse_decision('hold', 1) is None and parse_decision(None, 1) is None
+
+def test_parameter_sweep_across_processes(prices):
+    grid = {'fast': [3, 5], 'slow': [20, 40]}
+    results = run_parameter_sweep(MovingAverageCross, grid, prices, processes=2, initial_balance=10000.0)
+
+    assert sorted((result['params']['fast'], result['params']['slow']) for result in results) == [(3, 20), (3, 40), (5, 20), (5, 40)]
+    assert [result['total_return'] for result in results] == sorted((result['total_return'] for result in results), reverse=True)
+    single = Backtest(MovingAverageCross(5, 40), prices, initial_balance=10000.0).run()
+    assert next(result for result in results if result['params'] == {'fast': 5, 'slow': 40})['final_net_worth'] == pytest.approx(single['final_net_worth'])
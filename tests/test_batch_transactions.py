@@ -0,0 +1,84 @@
+import json
+import threading
+import time
+import pytest
+from src.trading_database import TradingDatabase
+from src.storage.json_storage import JsonStorage
+from src.storage.sqlite_storage import SQLiteStorage
+
+
+@pytest.fixture
+def db(make_db):
+    db = make_db()
+    db.add_account_balance(10000.0)
+    yield db
+    db.close()
+
+def test_batch_applies_all_with_one_write(db, monkeypatch):
+    db.add_transaction('AAPL', 10, 100.0, 'buy')
+    writes = []
+    original = JsonStorage._write_file
+    monkeypatch.setattr(JsonStorage, '_write_file', staticmethod(lambda path, contents, atomic=False: (writes.append(path), original(path, contents, atomic))))
+
+    ids = db.add_transactions([
+        ('AAPL', 10, 110.0, 'sell'),
+        {'symbol': 'MSFT', 'quantity': 5, 'price': 300.0, 'transaction_type': 'buy'},
+        ('GOOG', 2, 500.0, 'buy'),
+    ])
+
+    assert ids == [2, 3, 4]
+    assert db.list_owned_stocks() == {
+        'MSFT': {'quantity': 5, 'purchase_price': 300.0},
+        'GOOG': {'quantity': 2, 'purchase_price': 500.0}
+    }
+    assert db.get_account_balance() == 10000.0 - 1000.0 + 1100.0 - 1500.0 - 1000.0
+    assert len(writes) == 4  # Each file written once
+    assert len(db.list_owned_stocks_history()) == 2
+
+def test_batch_is_validated_against_projected_state(db):
+    # Selling shares bought earlier in the same batch is allowed
+    db.add_transactions([('AAPL', 5, 100.0, 'buy'), ('AAPL', 5, 101.0, 'sell')])
+    assert db.list_owned_stocks() == {}
+
+    before = (db.get_account_balance(), dict(db.list_owned_stocks()), len(db.list_transactions()))
+    with pytest.raises(ValueError, match='Batch item 2'):
+        db.add_transactions([('AAPL', 50, 100.0, 'buy'), ('MSFT', 45, 100.0, 'buy'), ('GOOG', 6, 100.0, 'buy')])
+    with pytest.raises(ValueError, match='Batch item 1'):
+        db.add_transactions([('AAPL', 1, 100.0, 'buy'), ('AAPL', 2, 100.0, 'sell')])
+    with pytest.raises(ValueError, match='Invalid input'):
+        db.add_transactions([('AAPL', 1, 100.0, 'buy'), ('AAPL', -1, 100.0, 'buy')])
+    assert (db.get_account_balance(), dict(db.list_owned_stocks()), len(db.list_transactions())) == before
+
+def test_batch_in_journal_and_sqlite(make_db, tmp_path):
+    journal_db = make_db(use_journal=True)
+    sqlite_db = TradingDatabase(storage=SQLiteStorage(str(tmp_path / 'trading.db')))
+    for db in (journal_db, sqlite_db):
+        db.add_account_balance(1000.0)
+        db.add_transactions([('AAPL', 2, 100.0, 'buy'), ('MSFT', 1, 200.0, 'buy')])
+        db.close()
+
+    for db in (make_db(use_journal=True), TradingDatabase(storage=SQLiteStorage(str(tmp_path / 'trading.db')))):
+        assert [t['id'] for t in db.list_transactions()] == [1, 2]
+        assert db.get_account_balance() == 600.0
+        assert set(db.list_owned_stocks()) == {'AAPL', 'MSFT'}
+        assert len(db.list_owned_stocks_history()) == 1
+        db.close()
+
+def test_group_commit_flushes_concurrent_trades_together(make_db, tmp_path):
+    db = make_db(group_commit_interval=0.2)
+    db.add_account_balance(10000.0)
+
+    threads = [threading.Thread(target=db.add_transaction, args=('AAPL', 1, 10.0, 'buy')) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not (tmp_path / 'transactions.json').exists()  # Still inside the window
+
+    time.sleep(0.4)
+    with open(tmp_path / 'transactions.json') as file:
+        assert len(json.load(file)['transactions']) == 8
+
+    db.add_transaction('AAPL', 1, 10.0, 'sell')
+    db.close()  # Flushes the pending write
+    assert make_db().list_owned_stocks()['AAPL']['quantity'] == 7
@@ -0,0 +1,22 @@
+from benchmarks.suite import compare, run_suite
+
+
+def test_suite_runs_every_benchmark():
+    results = run_suite({'tiny': 50}, budget=0)
+    timings = results['results']['tiny']
+    assert set(timings) == {
+        'cold_start', 'add_transaction', 'cold_start_journal', 'add_transaction_journal', 'cold_start_binary',
+        'view_data_first_page', 'view_data_next_page', 'calculate_net_worth', 'net_worth_series',
+        'run_tracking_analysis', 'run_tracking_analysis_metrics_disabled'
+    }
+    assert all(timing['seconds'] > 0 and timing['runs'] >= 1 for timing in timings.values())
+
+def test_compare_flags_slowdowns_beyond_the_threshold():
+    baseline = {'results': {'1k': {'cold_start': {'seconds': 1.0}, 'add_transaction': {'seconds': 1.0}}}}
+    results = {'results': {'1k': {
+        'cold_start': {'seconds': 1.1},
+        'add_transaction': {'seconds': 1.5},
+        'calculate_net_worth': {'seconds': 9.0},  # Not in the baseline
+    }}}
+    regressions = compare(results, baseline, threshold=0.2)
+    assert [(regression['benchmark'], regression['ratio']) for regression in regressions] == [('add_transaction', 1.5)]
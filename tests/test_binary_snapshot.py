@@ -0,0 +1,128 @@
+import os
+import threading
+import pytest
+from src.storage import json_storage
+from src.storage.binary_snapshot import HistoryView, convert_json_files, read_snapshot, write_snapshot
+from src.storage.columnar import TransactionStore
+from src.storage.delta_history import HistoryEncoder
+
+
+def trade_some(db):
+    db.add_account_balance(10000.0)
+    db.add_transaction('AAPL', 10, 150.0, 'buy')
+    db.add_transaction('MSFT', 5, 300.5, 'buy')
+    db.add_transaction('AAPL', 4, 160.0, 'sell')
+    db.add_transactions([('MSFT', 5, 310.0, 'sell'), ('GOOG', 2.5, 100.0, 'buy')])
+    db.record_owned_stocks_history()
+
+
+def assert_same_state(db, other):
+    assert other.list_transactions() == db.list_transactions()
+    assert other.list_owned_stocks() == db.list_owned_stocks()
+    assert other.list_owned_stocks_history() == db.list_owned_stocks_history()
+    assert other.get_account_balance() == db.get_account_balance()
+
+
+def test_round_trip(tmp_path):
+    encoder = HistoryEncoder(2)
+    history = [encoder.encode('2024-01-01T09:30:00', {'AAPL': {'quantity': 1, 'purchase_price': 10.0}}, 90.0),
+               encoder.encode('2024-01-01T09:31:00.250000', {}, 100.5),
+               encoder.encode('2024-01-01T09:32:00', {'MSFT': {'quantity': 1.5, 'purchase_price': 20.0}}, 70.5)]
+    transactions = [{'id': 1, 'symbol': 'AAPL', 'quantity': 1, 'price': 10.0, 'transaction_type': 'buy', 'timestamp': '2024-01-01T09:30:00'},
+                    {'id': 2, 'symbol': 'AAPL', 'quantity': 1, 'price': 20.5, 'transaction_type': 'sell', 'timestamp': '2024-01-01T09:31:00.250000'}]
+    state = {'journal_seq': 7, 'transaction_id_counter': 3, 'transactions': TransactionStore(transactions),
+             'owned_stocks': {'MSFT': {'quantity': 1.5, 'purchase_price': 20.0}}, 'owned_stocks_history': history,
+             'account_balance': 70.5}
+    path = str(tmp_path / 'snapshot.bin')
+    assert write_snapshot(path, state) == os.path.getsize(path)
+
+    loaded = read_snapshot(path)
+    assert loaded['transactions'] == transactions
+    assert list(loaded['owned_stocks_history']) == history
+    assert list(loaded['owned_stocks_history'].timestamps) == [record['timestamp'] for record in history]
+    assert {key: loaded[key] for key in ('journal_seq', 'transaction_id_counter', 'owned_stocks', 'account_balance')} == \
+           {key: state[key] for key in ('journal_seq', 'transaction_id_counter', 'owned_stocks', 'account_balance')}
+
+    # Appending copies the mapped columns instead of writing to them
+    loaded['transactions'].append({**transactions[0], 'id': 3})
+    assert len(loaded['transactions']) == 3
+    assert len(read_snapshot(path)['transactions']) == 2
+
+
+def test_history_view_reencodes_appended_records(tmp_path):
+    path = str(tmp_path / 'snapshot.bin')
+    history = [{'timestamp': '2024-01-01T09:30:00', 'owned_stocks': {'AAPL': {'quantity': 1, 'purchase_price': 10.0}}, 'account_balance': 1.0}]
+    write_snapshot(path, {'transaction_id_counter': 1, 'transactions': TransactionStore(), 'owned_stocks': {},
+                          'owned_stocks_history': history, 'account_balance': 1.0})
+    view = read_snapshot(path)['owned_stocks_history']
+    assert isinstance(view, HistoryView)
+    view.append({'timestamp': '2024-01-01T09:31:00', 'changes': {'AAPL': None, 'MSFT': {'quantity': 2, 'purchase_price': 5.0}}, 'account_balance': 2.0})
+
+    write_snapshot(path, {'transaction_id_counter': 1, 'transactions': TransactionStore(), 'owned_stocks': {},
+                          'owned_stocks_history': view, 'account_balance': 2.0})
+    assert list(read_snapshot(path)['owned_stocks_history']) == list(view)
+    assert view.checkpoint_indexes() == [0]
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / 'snapshot.bin'
+    path.write_bytes(b'{"transactions": []}')
+    with pytest.raises(ValueError):
+        read_snapshot(str(path))
+
+
+def test_database_restarts_from_binary_snapshot(make_db, tmp_path):
+    db = make_db(use_journal=True, snapshot_format='binary', history_checkpoint_interval=3)
+    trade_some(db)
+    db.compact_journal()
+    assert os.path.getsize(tmp_path / 'journal.jsonl') == 0
+    assert not os.path.exists(tmp_path / 'transactions.json')  # Compaction only writes the snapshot
+    db.add_transaction('AAPL', 1, 170.0, 'sell')  # In the journal, replayed over the snapshot
+    db.close()
+
+    reopened = make_db(use_journal=True, snapshot_format='binary', history_checkpoint_interval=3)
+    assert_same_state(db, reopened)
+    assert reopened.state_at('2100-01-01')['owned_stocks'] == db.list_owned_stocks()
+    assert reopened.add_transaction('GOOG', 1, 90.0, 'buy') == 7
+
+    # Compacting a database loaded from a snapshot keeps everything
+    reopened.compact_journal()
+    reopened.close()
+    again = make_db(use_journal=True, snapshot_format='binary', history_checkpoint_interval=3)
+    assert_same_state(reopened, again)
+    again.close()
+
+
+def test_snapshot_is_encoded_outside_the_lock(make_db, monkeypatch):
+    db = make_db(use_journal=True, snapshot_format='binary')
+    trade_some(db)
+    original = json_storage.encode_snapshot
+    def trade_while_encoding(state):
+        # A trade from another thread goes through while the snapshot is encoded, and is not in it
+        trader = threading.Thread(target=db.add_transaction, args=('AAPL', 1, 170.0, 'sell'))
+        trader.start()
+        trader.join(timeout=5)
+        assert not trader.is_alive()
+        return original(state)
+    monkeypatch.setattr(json_storage, 'encode_snapshot', trade_while_encoding)
+    for _ in range(2):
+        db.compact_journal()
+        db.close()
+        reopened = make_db(use_journal=True, snapshot_format='binary')
+        assert_same_state(db, reopened)
+        db = reopened  # Compacts a HistoryView next
+    assert len(db.list_transactions()) == 7
+    db.close()
+
+
+def test_convert_json_files(make_db, tmp_path):
+    db = make_db(history_checkpoint_interval=3)
+    trade_some(db)
+    db.close()
+
+    convert_json_files(str(tmp_path), str(tmp_path / 'snapshot.bin'))
+    for name in ('transactions.json', 'owned_stocks.json', 'owned_stocks_history.json', 'account_balance.json'):
+        os.remove(tmp_path / name)  # Everything must come from the snapshot
+    converted = make_db(use_journal=True, snapshot_format='binary', history_checkpoint_interval=3)
+    assert_same_state(db, converted)
+    converted.close()
@@ -0,0 +1,126 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src.fetcher.abastract_fetcher import FinancialDataFetcher
+from src.fetcher.cached_fetcher import CachedFinancialDataFetcher
+
+
+class CountingFetcher(FinancialDataFetcher):
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def _fetch(self, endpoint, symbol):
+        with self.lock:
+            self.calls.append((endpoint, symbol))
+        time.sleep(self.delay)
+        if symbol == 'FAIL':
+            raise ConnectionError('provider down')
+        return {'endpoint': endpoint, 'symbol': symbol, 'call': len(self.calls)}
+
+    def fetch_income_statement(self, symbol):
+        return self._fetch('income_statement', symbol)
+
+    def fetch_balance_sheet(self, symbol):
+        return self._fetch('balance_sheet', symbol)
+
+    def fetch_stock_price_history(self, symbol):
+        return self._fetch('stock_price_history', symbol)
+
+    def fetch_news_and_events(self, symbol):
+        return self._fetch('news_and_events', symbol)
+
+    def fetch_analyst_reports(self, symbol):
+        return self._fetch('analyst_reports', symbol)
+
+    def set_api_keys(self, api_keys):
+        self.api_keys = api_keys
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_results_expire_per_endpoint():
+    clock = FakeClock()
+    fetcher = CountingFetcher()
+    cache = CachedFinancialDataFetcher(fetcher, ttls={'stock_price_history': 60, 'balance_sheet': 3600}, clock=clock)
+
+    first = cache.fetch_balance_sheet('AAPL')
+    cache.fetch_stock_price_history('AAPL')
+    clock.now += 120
+    assert cache.fetch_balance_sheet('AAPL') == first
+    cache.fetch_stock_price_history('AAPL')
+
+    assert fetcher.calls == [('balance_sheet', 'AAPL'), ('stock_price_history', 'AAPL'), ('stock_price_history', 'AAPL')]
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 3)
+    assert stats['hit_rate'] == pytest.approx(0.25)
+
+def test_lru_is_bounded_and_disk_tier_survives_restarts(tmp_path):
+    clock = FakeClock()
+    fetcher = CountingFetcher()
+    cache = CachedFinancialDataFetcher(fetcher, max_entries=2, cache_dir=str(tmp_path), clock=clock)
+    for symbol in ['AAPL', 'MSFT', 'GOOG']:
+        cache.fetch_income_statement(symbol)
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['evictions'] == 1
+
+    # Evicted from memory, but still on disk
+    assert cache.fetch_income_statement('AAPL')['symbol'] == 'AAPL'
+    assert cache.stats()['disk_hits'] == 1
+
+    restarted = CachedFinancialDataFetcher(fetcher, cache_dir=str(tmp_path), clock=clock)
+    assert restarted.fetch_income_statement('MSFT')['call'] == 2
+    assert len(fetcher.calls) == 3
+
+    restarted.invalidate(symbol='MSFT')
+    restarted.fetch_income_statement('MSFT')
+    restarted.fetch_income_statement('GOOG')
+    assert len(fetcher.calls) == 4
+
+def test_concurrent_duplicate_requests_are_collapsed():
+    fetcher = CountingFetcher(delay=0.1)
+    cache = CachedFinancialDataFetcher(fetcher)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: cache.fetch_analyst_reports('AAPL'), range(8)))
+
+    assert fetcher.calls == [('analyst_reports', 'AAPL')]
+    assert all(result == results[0] for result in results)
+    stats = cache.stats()
+    assert stats['misses'] == 1 and stats['hits'] + stats['coalesced'] == 7
+
+def test_failures_are_not_cached():
+    fetcher = CountingFetcher()
+    cache = CachedFinancialDataFetcher(fetcher)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            cache.fetch_balance_sheet('FAIL')
+    assert len(fetcher.calls) == 2
+    assert not cache.in_flight
+
+def test_hits_do_not_wait_for_disk_writes_and_are_copies(tmp_path, monkeypatch):
+    cache = CachedFinancialDataFetcher(CountingFetcher(), cache_dir=str(tmp_path))
+    cache.fetch_income_statement('AAPL')['symbol'] = 'changed'
+    assert cache.fetch_income_statement('AAPL')['symbol'] == 'AAPL'
+
+    original = cache._write_disk
+    writing = threading.Event()
+    def slow_write(*args):
+        writing.set()
+        time.sleep(0.3)
+        original(*args)
+    monkeypatch.setattr(cache, '_write_disk', slow_write)
+    writer = threading.Thread(target=cache.fetch_income_statement, args=('MSFT',))
+    writer.start()
+    writing.wait()
+    started = time.perf_counter()
+    assert cache.fetch_income_statement('AAPL')['symbol'] == 'AAPL'
+    assert time.perf_counter() - started < 0.1
+    writer.join()
@@ -0,0 +1,91 @@
+import threading
+import pytest
+from src.change_feed import ChangeFeed, EventsLost
+from src.data_views import RecentTransactions
+
+
+def test_sequence_and_resume():
+    feed = ChangeFeed(buffer_size=10)
+    subscription = feed.subscribe()
+    for amount in range(3):
+        feed.publish('balance', account_balance=amount)
+    events = subscription.poll()
+    assert [event.seq for event in events] == [1, 2, 3]
+    assert events[-1].data == {'account_balance': 2}
+    assert subscription.poll() == []
+
+    # A consumer that stopped after event 1 picks up where it left off
+    assert [event.seq for event in feed.subscribe(after_seq=1).poll(limit=1)] == [2]
+
+
+def test_overflow_raises_events_lost():
+    feed = ChangeFeed(buffer_size=3)
+    subscription = feed.subscribe()
+    for amount in range(5):
+        feed.publish('balance', account_balance=amount)
+    with pytest.raises(EventsLost) as error:
+        subscription.poll()
+    assert error.value.first_seq == 3
+    assert [event.seq for event in feed.subscribe(after_seq=2).poll()] == [3, 4, 5]
+
+
+def test_get_waits_for_publish_and_close_ends_iteration():
+    feed = ChangeFeed()
+    subscription = feed.subscribe()
+    assert subscription.get(timeout=0.01) == []
+
+    received = []
+    reader = threading.Thread(target=lambda: received.extend(subscription))
+    reader.start()
+    feed.publish('trade', transaction={'id': 1})
+    feed.publish('clear', target='transactions')
+    feed.close()
+    reader.join(timeout=5)
+    assert not reader.is_alive()
+    assert [event.type for event in received] == ['trade', 'clear']
+
+
+@pytest.fixture
+def db(make_db):
+    database = make_db()
+    yield database
+    database.close()
+
+
+def test_database_events(db):
+    subscription = db.subscribe()
+    db.add_account_balance(10000.0)
+    db.add_transaction('AAPL', 10, 150.0, 'buy')
+    db.add_transactions([('AAPL', 4, 160.0, 'sell'), ('MSFT', 5, 300.0, 'buy')])
+    db.record_owned_stocks_history()
+    db.clear_transactions()
+
+    events = subscription.poll()
+    assert [event.type for event in events] == ['balance', 'trade', 'trade', 'trade', 'history', 'clear']
+    assert [event.data['transaction']['id'] for event in events[1:4]] == [1, 2, 3]
+    # Each trade in a batch carries the balance and position right after it
+    assert events[2].data['account_balance'] == 10000.0 - 1500.0 + 640.0
+    assert events[2].data['position'] == {'quantity': 6, 'purchase_price': 150.0}
+    assert events[3].data['account_balance'] == db.get_account_balance()
+    assert events[4].data['owned_stocks'] == db.list_owned_stocks()
+    assert events[5].data == {'target': 'transactions'}
+
+
+def test_recent_transactions(db):
+    db.add_account_balance(10000.0)
+    for price in (10.0, 11.0, 12.0):
+        db.add_transaction('AAPL', 1, price, 'buy')
+    recent = RecentTransactions(db, max_rows=2)
+    assert recent.frame()['id'].tolist() == [3, 2]
+
+    db.add_transaction('AAPL', 1, 13.0, 'sell')
+    db.remove_account_balance(100.0)
+    assert recent.update(timeout=0) is True
+    assert recent.frame()['id'].tolist() == [4, 3]
+    assert recent.account_balance == db.get_account_balance()
+    assert recent.update(timeout=0) is False
+
+    db.clear_transactions()
+    recent.update(timeout=0)
+    assert recent.frame().empty
+    recent.close()
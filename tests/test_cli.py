@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from src.cli import main
+from src.rpc_server import RpcClient, RpcError, start_rpc_server
+from src.trading_database import TradingDatabase
+
+SRC = os.path.join(os.path.dirname(__file__), '..', 'src')
+
+
+def run(tmp_path, capsys, *argv):
+    status = main(['--data-dir', str(tmp_path), *argv])
+    return status, capsys.readouterr()
+
+
+def test_commands(make_db, tmp_path, capsys):
+    assert run(tmp_path, capsys, 'balance', 'add', '10000')[1].out == '10000.00\n'
+    assert run(tmp_path, capsys, 'trade', 'buy', 'AAPL', '10', '150.5')[0] == 0
+    run(tmp_path, capsys, 'trade', 'buy', 'MSFT', '2', '300')
+    status, output = run(tmp_path, capsys, 'trade', 'sell', 'AAPL', '11', '160')
+    assert status == 1 and 'Insufficient stock quantity' in output.err
+
+    rows = [json.loads(line) for line in run(tmp_path, capsys, 'list', 'transactions', '--symbol', 'AAPL', '--json')[1].out.splitlines()]
+    assert [(row['id'], row['quantity'], row['price']) for row in rows] == [(1, 10, 150.5)]
+    table = run(tmp_path, capsys, 'list', 'owned')[1].out.splitlines()
+    assert table[0].split() == ['symbol', 'quantity', 'purchase_price'] and table[2].split() == ['MSFT', '2', '300.0']
+
+    export = tmp_path / 'history.csv'
+    run(tmp_path, capsys, 'export', 'history', '--output', str(export))
+    lines = export.read_text().splitlines()
+    assert lines[0] == 'timestamp,account_balance,owned_stocks' and len(lines) == 3
+
+    database = make_db()
+    assert database.get_account_balance() == 10000 - 1505 - 600
+    database.close()
+
+
+def test_headless_imports(tmp_path):
+    code = ("import sys; sys.path.insert(0, sys.argv[1]); import cli, rpc_server; "
+            "cli.main(['--data-dir', sys.argv[2], 'balance']); "
+            "print(sorted(name for name in ('gradio', 'pandas', 'interface') if name in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', code, SRC, str(tmp_path)], capture_output=True, text=True, check=True).stdout
+    assert output.splitlines() == ['0.00', '[]']
+
+
+@pytest.fixture
+def server(tmp_path):
+    database = TradingDatabase(in_memory=True)
+    server = start_rpc_server(database, port=0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_rpc(server):
+    with RpcClient(port=server.server_address[1]) as client:
+        assert client.call('ping') == 'pong'
+        client.call('add_account_balance', 10000.0)
+        assert client.call('add_transaction', 'AAPL', 10, 100.0, 'buy') == 1
+        assert client.call('get_transaction', transaction_id=1)['symbol'] == 'AAPL'
+        with pytest.raises(RpcError) as error:
+            client.call('add_transaction', 'AAPL', 100, 100.0, 'sell')
+        assert error.value.type == 'ValueError'
+        with pytest.raises(RpcError):
+            client.call('clear_transactions')  # Not exposed
+
+        # Streamed calls come back in order, with failures in place
+        results = client.call_many([('add_transaction', ['MSFT', 1, 10.0, 'buy'])] * 600 +
+                                   [('add_transaction', ['MSFT', 1000, 10.0, 'sell'])], window=128)
+        assert results[:600] == list(range(2, 602))
+        assert isinstance(results[-1], RpcError)
+        assert client.call('list_owned_stocks')['MSFT']['quantity'] == 600
+        assert client.call('get_account_balance') == pytest.approx(10000.0 - 1000.0 - 6000.0)
@@ -0,0 +1,64 @@
+import json
+import pytest
+from src.storage.columnar import TransactionStore
+
+
+@pytest.fixture
+def transactions():
+    return [{
+        'id': index + 1,
+        'symbol': ['AAPL', 'MSFT', 'GOOG'][index % 3],
+        'quantity': index % 7 + 1 if index % 5 else 0.5,
+        'price': 100.0 + index,
+        'transaction_type': 'buy' if index % 4 else 'sell',
+        'timestamp': f'2024-01-{index // 10 + 1:02d}T10:00:{index % 60:02d}' + ('.250000' if index % 2 else '')
+    } for index in range(50)]
+
+def test_rows_read_back_like_the_original_dicts(transactions):
+    store = TransactionStore(transactions[:20], capacity=4)
+    for transaction in transactions[20:]:
+        store.append(transaction)
+
+    assert len(store) == 50
+    assert store == transactions
+    assert list(store[10:13]) == transactions[10:13] and store[-1] == transactions[-1]
+    assert json.loads(json.dumps(store.to_records())) == transactions
+    assert store.get(17) == transactions[16] and store.get(99) is None
+    assert store.nbytes() == 42 * 50
+    assert len(store.symbols) == 3
+
+    with pytest.raises(ValueError):
+        store.append(transactions[0])
+
+def test_query_matches_filtering_the_dicts(transactions):
+    store = TransactionStore(transactions)
+    expected = [transaction for transaction in transactions
+                if transaction['symbol'] == 'MSFT' and '2024-01-02' <= transaction['timestamp'] <= '2024-01-04T10:00:30'
+                and transaction['id'] > 15]
+    result = store.rows(store.query(symbol='MSFT', start='2024-01-02', end='2024-01-04T10:00:30', after_id=15))
+    assert result == expected
+    assert len(store.query(symbol='TSLA')) == 0
+
+def test_utc_offsets_and_quantity_types_are_kept():
+    transactions = [{'id': 1, 'symbol': 'A', 'quantity': 1, 'price': 1.0, 'transaction_type': 'buy',
+                     'timestamp': '2024-01-01T10:00:00+02:00'},
+                    {'id': 2, 'symbol': 'A', 'quantity': 2.0, 'price': 1.0, 'transaction_type': 'buy',
+                     'timestamp': '2024-01-01T09:30:00.500000'}]
+    appended = TransactionStore()
+    for transaction in transactions:
+        appended.append(transaction)
+    for store in (TransactionStore(transactions), appended):
+        assert store == transactions and store.to_records() == transactions
+        assert type(store[0]['quantity']) is int and type(store[1]['quantity']) is float
+    # Queries compare instants, so the offset timestamp sorts as 08:00 UTC
+    assert list(store.query(end='2024-01-01T08:00:00')) == [0]
+
+def test_database_keeps_transactions_columnar(make_db, tmp_path):
+    db = make_db()
+    db.add_account_balance(1000)
+    db.add_transaction('AAPL', 2, 100.0, 'buy')
+    assert isinstance(db.transactions, TransactionStore)
+    assert db.get_transaction(1)['quantity'] == 2
+    with open(tmp_path / 'transactions.json') as file:
+        assert json.load(file)['transactions'] == [dict(db.get_transaction(1))]
+    db.close()
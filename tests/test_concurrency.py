@@ -0,0 +1,96 @@
+import threading
+import time
+import pytest
+from src.trading_database import TradingDatabase
+from src.storage.json_storage import JsonStorage
+from src.storage.sqlite_storage import SQLiteStorage
+
+THREADS = 8
+TRADES_PER_THREAD = 250
+
+
+@pytest.fixture(params=['journal', 'sqlite'])
+def open_db(request, make_db, tmp_path):
+    if request.param == 'journal':
+        return lambda: make_db(use_journal=True, compact_threshold=500, background_writer=True)
+    return lambda: TradingDatabase(storage=SQLiteStorage(str(tmp_path / 'trading.db')), background_writer=True)
+
+def run_stress(db):
+    """Every thread buys two shares and sells one, repeatedly, on a shared symbol and its own one."""
+    db.add_account_balance(1e9)
+    start = threading.Barrier(THREADS)
+
+    def worker(index):
+        start.wait()
+        for _ in range(TRADES_PER_THREAD // 5):
+            db.add_transaction('SHARED', 2, 10.0, 'buy')
+            db.add_transaction('SHARED', 1, 12.0, 'sell')
+            db.add_transactions([(f'OWN{index}', 1, 5.0, 'buy'), (f'OWN{index}', 1, 6.0, 'sell')])
+            db.add_account_balance(1.0)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(THREADS)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    trades = THREADS * TRADES_PER_THREAD // 5 * 4
+    print(f"\n{type(db.storage).__name__}: {trades / elapsed:.0f} trades/sec with {THREADS} threads")
+
+def test_concurrent_trades_lose_no_updates(open_db):
+    db = open_db()
+    run_stress(db)
+
+    rounds = THREADS * TRADES_PER_THREAD // 5
+    expected_balance = 1e9 + rounds * (-20.0 + 12.0 + 1.0 + 1.0)
+    ids = [transaction['id'] for transaction in db.list_transactions()]
+    assert ids == list(range(1, rounds * 4 + 1))
+    assert db.get_account_balance() == pytest.approx(expected_balance)
+    assert db.list_owned_stocks()['SHARED']['quantity'] == rounds
+    assert not any(symbol.startswith('OWN') for symbol in db.list_owned_stocks())
+    db.close()
+
+    reopened = open_db()
+    assert len(reopened.list_transactions()) == rounds * 4
+    assert reopened.get_account_balance() == pytest.approx(expected_balance)
+    assert reopened.list_owned_stocks()['SHARED']['quantity'] == rounds
+    reopened.close()
+
+def test_disk_writes_happen_on_the_writer_thread(make_db, monkeypatch):
+    writers = set()
+    original = JsonStorage._write_file
+    def record_thread(path, contents, atomic=False):
+        writers.add(threading.current_thread().name)
+        original(path, contents, atomic)
+    monkeypatch.setattr(JsonStorage, '_write_file', staticmethod(record_thread))
+
+    db = make_db(background_writer=True)
+    run_stress(db)
+    db.close()
+
+    # close() flushes whatever is left from the calling thread after stopping the writer
+    assert writers <= {'TradingDatabaseWriter', threading.current_thread().name}
+    assert 'TradingDatabaseWriter' in writers
+    assert len(make_db().list_transactions()) == THREADS * TRADES_PER_THREAD // 5 * 4
+
+def test_files_are_serialized_outside_the_lock(make_db, monkeypatch):
+    db = make_db()
+    db.add_account_balance(1000.0)
+    db.storage.autoflush = False  # Flushed by hand below, like the background writer does
+    db.add_transaction('AAPL', 2, 100.0, 'buy')
+    original = JsonStorage._file_contents
+    def trade_while_serializing(storage, path, state):
+        if path.endswith('transactions.json') and len(db.list_transactions()) == 1:
+            # A trade from another thread goes through while the files are serialized, and is not in them
+            trader = threading.Thread(target=db.add_transaction, args=('MSFT', 1, 50.0, 'buy'))
+            trader.start()
+            trader.join(timeout=5)
+            assert not trader.is_alive()
+        return original(storage, path, state)
+    monkeypatch.setattr(JsonStorage, '_file_contents', trade_while_serializing)
+    db.flush()
+    assert [row['symbol'] for row in make_db().list_transactions()] == ['AAPL']
+    db.flush()
+    db.close()
+    assert make_db().get_account_balance() == 750.0
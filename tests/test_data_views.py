@@ -0,0 +1,90 @@
+import datetime
+import pandas as pd
+import pytest
+from src.data_views import OwnedStocksHistoryView, TransactionsView
+
+
+@pytest.fixture
+def db(make_db):
+    db = make_db()
+    db.add_account_balance(1e6)
+    for i in range(30):
+        db.add_transaction('AAPL' if i % 3 else 'MSFT', i + 1, 100.0 + i, 'buy')
+    yield db
+    db.close()
+
+def test_transactions_are_paged_filtered_and_sorted(db):
+    view = TransactionsView(db)
+
+    rows, total, pages = view.page(page=2, page_size=7)
+    assert list(rows['id']) == [8, 9, 10, 11, 12, 13, 14]
+    assert (total, pages) == (30, 5)
+
+    rows, total, _ = view.page(symbol='msft', sort_by='price', descending=True, page_size=3)
+    assert total == 10
+    assert list(rows['price']) == [127.0, 124.0, 121.0]
+    assert '_time' not in rows.columns
+
+    today = db.list_transactions()[0]['timestamp'][:10]
+    assert view.page(start=today, end=today)[1] == 30
+    assert view.page(end='2000-01-01')[1] == 0
+
+def test_refresh_only_converts_new_transactions(db, monkeypatch):
+    view = TransactionsView(db)
+    view.page()
+    cached = view.frame
+
+    calls = []
+    original = db.query_transactions
+    monkeypatch.setattr(db, 'query_transactions', lambda **kwargs: calls.append(kwargs) or original(**kwargs))
+    db.add_transaction('GOOG', 1, 50.0, 'buy')
+    rows, total, _ = view.page(symbol='GOOG')
+
+    assert calls == [{'after_id': 30}]
+    assert total == 1 and rows['id'].iloc[0] == 31
+    assert view.frame.iloc[:30].equals(cached)
+
+    db.clear_transactions()
+    db.add_transaction('AAPL', 1, 50.0, 'sell')
+    assert list(view.page()[0]['id']) == [1]
+
+def test_history_view_is_incremental(db):
+    view = OwnedStocksHistoryView(db)
+    rows, total, _ = view.page(page_size=10, page=3)
+    assert total == 30
+    assert list(rows['positions'][:2]) == [2, 2]
+
+    db.add_transaction('GOOG', 1, 50.0, 'buy')
+    rows, total, _ = view.page(symbol='goog')
+    assert total == 1
+    assert rows['positions'].iloc[0] == 3
+    assert rows['owned_stocks'].iloc[0] == db.list_owned_stocks()
+
+def test_mixed_naive_and_offset_timestamps_are_filtered(make_db):
+    clock = iter([
+        datetime.datetime(2024, 1, 1, 12),
+        datetime.datetime(2024, 1, 2, 12, tzinfo=datetime.timezone(datetime.timedelta(hours=-5))),
+    ])
+    db = make_db(clock=lambda: next(clock))
+    db.add_account_balance(1e6)
+    for _ in range(2):
+        db.add_transaction('AAPL', 1, 100.0, 'buy')
+    view = TransactionsView(db)
+    assert view.page()[1] == 2
+    # 2024-01-02 12:00-05:00 is 17:00 UTC
+    assert list(view.page(start='2024-01-02T16:00')[0]['id']) == [2]
+    assert list(view.page(end='2024-01-02T12:00-05:00')[0]['id']) == [1, 2]
+    db.close()
+
+def test_refreshes_are_concatenated_when_read(db, monkeypatch):
+    view = TransactionsView(db)
+    view.refresh()
+    concats = []
+    original = pd.concat
+    monkeypatch.setattr(pd, 'concat', lambda frames, **kwargs: concats.append(len(frames)) or original(frames, **kwargs))
+    for i in range(3):
+        db.add_transaction('GOOG', 1, 50.0 + i, 'buy')
+        view.refresh()
+    assert concats == []
+    assert list(view.page(symbol='goog')[0]['price']) == [50.0, 51.0, 52.0]
+    assert concats == [4]
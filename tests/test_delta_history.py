@@ -0,0 +1,73 @@
+import json
+import pytest
+from src.trading_database import TradingDatabase
+from src.storage.sqlite_storage import SQLiteStorage
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def open_db(request, make_db, tmp_path):
+    if request.param == 'json':
+        return lambda: make_db(history_checkpoint_interval=5)
+    return lambda: TradingDatabase(storage=SQLiteStorage(str(tmp_path / 'trading.db'), checkpoint_interval=5))
+
+def trade_and_snapshot(db, count=23):
+    """Make trades across many symbols and return the expected state after each one."""
+    db.add_account_balance(1e6)
+    expected = []
+    for i in range(count):
+        symbol = f'SYM{i % 7}'
+        if i % 3 == 2 and symbol in db.list_owned_stocks():
+            db.add_transaction(symbol, 1, 10.0 + i, 'sell')
+        else:
+            db.add_transaction(symbol, 2, 10.0 + i, 'buy')
+        expected.append((db.list_transactions()[-1]['timestamp'], dict(db.list_owned_stocks()), db.get_account_balance()))
+    return expected
+
+def test_state_at_rebuilds_every_point(open_db):
+    db = open_db()
+    expected = trade_and_snapshot(db)
+
+    for timestamp, owned_stocks, balance in expected:
+        state = db.state_at(timestamp)
+        assert state['owned_stocks'] == owned_stocks
+        assert state['account_balance'] == balance
+    assert db.state_at('2000-01-01T00:00:00') is None
+    db.close()
+
+def test_full_history_and_pages_match(open_db):
+    db = open_db()
+    expected = trade_and_snapshot(db)
+
+    history = db.list_owned_stocks_history()
+    assert [entry['owned_stocks'] for entry in history] == [owned for _, owned, _ in expected]
+    assert db.query_owned_stocks_history(limit=4, offset=7) == history[7:11]
+    assert db.query_owned_stocks_history(start=expected[12][0], end=expected[15][0]) == history[12:16]
+    db.close()
+
+    reopened = open_db()
+    assert reopened.list_owned_stocks_history() == history
+    reopened.add_transaction('NEW', 1, 1.0, 'buy')
+    assert reopened.list_owned_stocks_history()[-1]['owned_stocks'] == {**expected[-1][1], 'NEW': {'quantity': 1, 'purchase_price': 1.0}}
+    reopened.close()
+
+def test_history_is_stored_as_deltas(make_db, tmp_path):
+    db = make_db(history_checkpoint_interval=5)
+    trade_and_snapshot(db, count=10)
+
+    with open(tmp_path / 'owned_stocks_history.json') as file:
+        records = json.load(file)
+    checkpoints = [record for record in records if 'owned_stocks' in record]
+    assert len(checkpoints) == 2
+    assert all(len(record['changes']) == 1 for record in records if 'changes' in record)
+
+def test_legacy_full_history_is_read_as_checkpoints(make_db, tmp_path):
+    legacy = [
+        {'timestamp': '2024-01-01T10:00:00', 'owned_stocks': {'AAPL': {'quantity': 1, 'purchase_price': 1.0}}, 'account_balance': 5.0},
+        {'timestamp': '2024-01-02T10:00:00', 'owned_stocks': {}, 'account_balance': 6.0}
+    ]
+    with open(tmp_path / 'owned_stocks_history.json', 'w') as file:
+        json.dump(legacy, file)
+
+    db = make_db(history_checkpoint_interval=5)
+    assert db.list_owned_stocks_history() == legacy
+    assert db.state_at('2024-01-01T12:00:00') == legacy[0]
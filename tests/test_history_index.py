@@ -0,0 +1,73 @@
+import datetime
+import pytest
+from src.history_index import HistoryIndex
+
+
+def test_range_queries_and_buckets():
+    index = HistoryIndex()
+    index.add('2024-01-01T09:30:10', 100.0, 1)
+    index.add('2024-01-01T09:30:50', 80.0, 2)
+    index.add('2024-01-01T10:15:00', 120.0, 0)
+    index.add('2024-01-01T09:31:00', 90.0, 1)  # Out of order
+
+    assert [entry['timestamp'] for entry in index.query('2024-01-01T09:30:50', '2024-01-01T10:00:00')] == \
+           ['2024-01-01T09:30:50', '2024-01-01T09:31:00']
+    assert index.query(limit=1, offset=3) == [{'timestamp': '2024-01-01T10:15:00', 'account_balance': 120.0, 'positions': 0}]
+    assert index.query('2024-02-01') == []
+
+    minutes = index.series('minute')
+    assert [row['timestamp'] for row in minutes] == ['2024-01-01T09:30:00', '2024-01-01T09:31:00', '2024-01-01T10:15:00']
+    assert minutes[0] == {'timestamp': '2024-01-01T09:30:00', 'entries': 2, 'account_balance': 80.0, 'min_balance': 80.0,
+                          'max_balance': 100.0, 'positions': 2, 'min_positions': 1, 'max_positions': 2}
+    hours = index.series('hour', start='2024-01-01T09:45:00')  # The 09:00 bucket ends after start
+    assert [(row['timestamp'], row['entries'], row['account_balance']) for row in hours] == \
+           [('2024-01-01T09:00:00', 3, 90.0), ('2024-01-01T10:00:00', 1, 120.0)]
+    assert index.series('day')[0]['min_balance'] == 80.0
+    with pytest.raises(ValueError):
+        index.series('week')
+
+
+def test_database_keeps_index_current(make_db):
+    now = [datetime.datetime(2024, 1, 1, 9, 30)]
+    db = make_db(clock=lambda: now[0], history_checkpoint_interval=3)
+    db.add_account_balance(10000.0)
+    db.add_transaction('AAPL', 10, 100.0, 'buy')
+    assert len(db.history_index) == 1  # Built from the stored history
+    for minutes, trade in enumerate([('MSFT', 5, 200.0, 'buy'), ('AAPL', 10, 110.0, 'sell'), ('GOOG', 1, 50.0, 'buy')], 1):
+        now[0] += datetime.timedelta(minutes=minutes * 20)
+        db.add_transaction(*trade)
+    db.add_transactions([('GOOG', 1, 60.0, 'sell'), ('MSFT', 1, 210.0, 'sell')])
+    db.record_owned_stocks_history()
+
+    expected = [{'timestamp': entry['timestamp'], 'account_balance': entry['account_balance'],
+                 'positions': len(entry['owned_stocks'])} for entry in db.list_owned_stocks_history()]
+    assert db.query_history_points() == expected
+    hours = db.query_history_aggregates('hour')
+    assert [row['entries'] for row in hours] == [2, 1, 3]
+    assert hours[-1]['account_balance'] == db.get_account_balance()
+    assert hours[0]['max_positions'] == 2 and hours[-1]['min_positions'] == 1
+
+    # A fresh database builds the same index from the delta encoded records
+    db.close()
+    reopened = make_db()
+    assert reopened.query_history_points() == expected
+    assert reopened.query_history_aggregates('hour') == hours
+    reopened.clear_owned_stocks_history()
+    assert reopened.query_history_aggregates('day') == []
+    reopened.close()
+
+
+def test_index_from_binary_snapshot(make_db):
+    db = make_db(use_journal=True, snapshot_format='binary', history_checkpoint_interval=2)
+    db.add_account_balance(10000.0)
+    for trade in [('AAPL', 10, 100.0, 'buy'), ('MSFT', 5, 200.0, 'buy'), ('AAPL', 10, 110.0, 'sell')]:
+        db.add_transaction(*trade)
+    db.compact_journal()
+    db.add_transaction('GOOG', 1, 50.0, 'buy')  # Appended after the snapshot
+    expected = db.query_history_points()
+    db.close()
+
+    reopened = make_db(use_journal=True, snapshot_format='binary')
+    assert [entry['positions'] for entry in expected] == [1, 2, 1, 2]
+    assert reopened.query_history_points() == expected
+    reopened.close()
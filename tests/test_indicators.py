@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.decision_maker.indicators import EMA, RSI, SMA, VWAP, BollingerBands, Indicator, IndicatorEngine, Volatility
+
+
+@pytest.fixture
+def bars():
+    rng = np.random.default_rng(7)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 500)))
+    volumes = rng.integers(100, 1000, 500)
+    return [{'close': float(close), 'volume': int(volume)} for close, volume in zip(closes, volumes)]
+
+def stream(indicator, bars):
+    return [indicator.update(bar) for bar in bars]
+
+def test_indicators_match_full_recomputation(bars):
+    closes = pd.Series([bar['close'] for bar in bars])
+    volumes = pd.Series([bar['volume'] for bar in bars])
+
+    assert stream(SMA(20), bars)[-1] == pytest.approx(closes.rolling(20).mean().iloc[-1])
+    assert stream(SMA(20), bars)[18] is None
+
+    ema = closes.copy()
+    ema.iloc[:10] = np.nan
+    ema.iloc[9] = closes.iloc[:10].mean()
+    assert stream(EMA(10), bars)[-1] == pytest.approx(ema.ewm(span=10, adjust=False, ignore_na=True).mean().iloc[-1])
+
+    log_returns = np.log(closes).diff()
+    assert stream(Volatility(30), bars)[-1] == pytest.approx(log_returns.rolling(30).std().iloc[-1])
+
+    assert stream(VWAP(), bars)[-1] == pytest.approx((closes * volumes).sum() / volumes.sum())
+    assert stream(VWAP(50), bars)[-1] == pytest.approx((closes * volumes)[-50:].sum() / volumes[-50:].sum())
+
+    bands = stream(BollingerBands(20, 2), bars)[-1]
+    std = closes.rolling(20).std(ddof=0).iloc[-1]
+    assert bands.middle == pytest.approx(closes.rolling(20).mean().iloc[-1])
+    assert bands.upper - bands.middle == pytest.approx(2 * std)
+
+def test_rsi_uses_wilder_smoothing():
+    rsi = RSI(3)
+    values = stream(rsi, [10, 11, 12, 11, 13])
+    assert values[:3] == [None, None, None]
+    # First averages: gain (1 + 1 + 0) / 3, loss 1 / 3; then Wilder: gain (2/3 * 2 + 2) / 3, loss (1/3 * 2) / 3
+    assert values[3] == pytest.approx(100 - 100 / (1 + 2))
+    assert values[4] == pytest.approx(100 - 100 / (1 + (10 / 9) / (2 / 9)))
+    assert RSI(2).initialize([1, 2, 3]) == 100.0
+
+def test_initialize_then_stream_matches_streaming_everything(bars):
+    for make in (lambda: SMA(20), lambda: EMA(10), lambda: RSI(14), lambda: Volatility(30),
+                 lambda: VWAP(50), lambda: BollingerBands(20)):
+        warmed, streamed = make(), make()
+        warmed.initialize(bars[:400])
+        expected = stream(streamed, bars)[-1]
+        assert stream(warmed, bars[400:])[-1] == pytest.approx(expected)
+
+def test_engine_keeps_state_per_symbol(bars):
+    engine = IndicatorEngine({'sma': lambda: SMA(3), 'vwap': VWAP})
+    engine.initialize('AAPL', [1, 2, 3])
+    engine.update('MSFT', {'close': 50.0, 'volume': 10})
+
+    values = engine.update('AAPL', {'close': 7.0, 'volume': 1})
+    assert values['sma'] == 4.0
+    assert values['vwap'] == pytest.approx(13 / 4)
+    assert engine.values('MSFT') == {'sma': None, 'vwap': 50.0}
+
+def test_indicator_is_abstract():
+    with pytest.raises(TypeError):
+        Indicator(3)
@@ -0,0 +1,115 @@
+import os
+import threading
+import pytest
+from src.storage.json_storage import JsonStorage
+
+
+@pytest.fixture
+def db(make_db):
+    db = make_db(use_journal=True)
+    yield db
+    db.close()
+
+def test_journal_replays_state(db, make_db, tmp_path):
+    db.add_account_balance(10000.0)
+    db.add_transaction('AAPL', 10, 150.0, 'buy')
+    db.add_transaction('MSFT', 5, 300.0, 'buy')
+    db.add_transaction('AAPL', 4, 160.0, 'sell')
+    db.record_owned_stocks_history()
+    db.close()
+
+    # Only the journal is written in journal mode
+    assert not os.path.exists(tmp_path / 'transactions.json')
+
+    new_db = make_db(use_journal=True)
+    assert new_db.list_transactions() == db.list_transactions()
+    assert new_db.list_owned_stocks() == db.list_owned_stocks()
+    assert new_db.list_owned_stocks_history() == db.list_owned_stocks_history()
+    assert new_db.get_account_balance() == db.get_account_balance()
+    assert new_db.add_transaction('AAPL', 1, 150.0, 'buy') == 4
+    new_db.close()
+
+def test_journal_write_cost_is_constant(db, tmp_path):
+    db.add_account_balance(1e9)
+    journal_path = tmp_path / 'journal.jsonl'
+    sizes = []
+    for _ in range(200):
+        before = os.path.getsize(journal_path)
+        db.add_transaction('AAPL', 1, 100.0, 'buy')
+        sizes.append(os.path.getsize(journal_path) - before)
+    # Only the id and sequence digits grow, not the size of the history
+    assert max(sizes[-50:]) - min(sizes[:50]) <= 16
+
+def test_compaction_folds_journal_into_snapshot(db, make_db, tmp_path):
+    db.add_account_balance(1000.0)
+    db.add_transaction('AAPL', 2, 100.0, 'buy')
+    db.compact_journal()
+    assert os.path.getsize(tmp_path / 'journal.jsonl') == 0
+
+    db.add_transaction('AAPL', 1, 120.0, 'sell')
+    db.close()
+
+    new_db = make_db(use_journal=True)
+    assert new_db.list_owned_stocks() == {'AAPL': {'quantity': 1, 'purchase_price': 100.0}}
+    assert new_db.get_account_balance() == 920.0
+    assert len(new_db.list_transactions()) == 2
+    new_db.close()
+
+def test_compact_threshold_and_torn_tail(make_db, tmp_path):
+    db = make_db(use_journal=True, compact_threshold=3)
+    db.add_account_balance(1000.0)
+    db.add_transaction('AAPL', 1, 10.0, 'buy')
+    db.add_transaction('AAPL', 1, 10.0, 'buy')  # Triggers compaction
+    db.add_transaction('AAPL', 1, 10.0, 'buy')
+    db.close()
+
+    with open(tmp_path / 'journal.jsonl', 'a') as file:
+        file.write('{"seq": 99, "op": "tra')
+
+    new_db = make_db(use_journal=True)
+    assert new_db.list_owned_stocks()['AAPL']['quantity'] == 3
+    assert new_db.get_account_balance() == 970.0
+    new_db.add_transaction('AAPL', 1, 10.0, 'sell')
+    new_db.close()
+
+    reopened = make_db(use_journal=True)
+    assert reopened.list_owned_stocks()['AAPL']['quantity'] == 2
+    reopened.close()
+
+def test_trade_during_compaction_is_kept(db, make_db, tmp_path, monkeypatch):
+    db.add_account_balance(1000.0)
+    db.add_transaction('AAPL', 2, 100.0, 'buy')
+
+    original = JsonStorage._write_file
+    def trade_while_writing_snapshot(path, contents, atomic=False):
+        if path.endswith('snapshot.json'):
+            # Another thread trades after the snapshot was captured, before the journal is cut
+            trader = threading.Thread(target=db.add_transaction, args=('MSFT', 1, 50.0, 'buy'))
+            trader.start()
+            trader.join()
+        original(path, contents, atomic)
+    monkeypatch.setattr(JsonStorage, '_write_file', staticmethod(trade_while_writing_snapshot))
+    db.compact_journal()
+    monkeypatch.undo()
+    db.close()
+
+    new_db = make_db(use_journal=True)
+    assert new_db.list_owned_stocks()['MSFT']['quantity'] == 1
+    assert new_db.get_account_balance() == 750.0
+    new_db.close()
+
+
+def test_compaction_keeps_records_written_in_another_layout(db, make_db, tmp_path):
+    db.add_account_balance(1000.0)
+    db.compact_journal()
+    db.close()
+    # A hand-edited journal with spaces and another key order
+    with open(tmp_path / 'journal.jsonl', 'a') as file:
+        file.write('{"op": "balance", "seq": 2, "account_balance": 900.0}\n')
+    reopened = make_db(use_journal=True)
+    reopened.add_transaction('AAPL', 1, 100.0, 'buy')
+    reopened.compact_journal()
+    reopened.close()
+    new_db = make_db(use_journal=True)
+    assert new_db.get_account_balance() == 800.0
+    new_db.close()
@@ -0,0 +1,87 @@
+import pytest
+from src.ledger import PositionLedger
+
+
+def trade(symbol, quantity, price, transaction_type, transaction_id=None):
+    return {'id': transaction_id, 'symbol': symbol, 'quantity': quantity, 'price': price, 'transaction_type': transaction_type}
+
+
+@pytest.mark.parametrize('method, realized, cost_basis', [
+    ('fifo', 3 * (130 - 100) + 2 * (130 - 110), 3 * 110 + 7 * 120),
+    ('lifo', 5 * (130 - 120), 3 * 100 + 5 * 110 + 2 * 120),
+    ('average', 5 * (130 - 1690 / 15), 10 * 1690 / 15),
+])
+def test_lot_methods(method, realized, cost_basis):
+    ledger = PositionLedger(method)
+    for quantity, price in ((3, 100.0), (5, 110.0), (7, 120.0)):
+        ledger.apply(trade('AAPL', quantity, price, 'buy'))
+    ledger.apply(trade('AAPL', 5, 130.0, 'sell'))
+
+    position = ledger.position('AAPL')
+    assert position['quantity'] == 10
+    assert position['realized_pnl'] == pytest.approx(realized)
+    assert position['cost_basis'] == pytest.approx(cost_basis)
+    assert position['unrealized_pnl'] == pytest.approx(10 * 130 - cost_basis)  # At the last traded price
+    assert position['unrealized_pnl'] + position['realized_pnl'] == pytest.approx(15 * 130 - 3 * 100 - 5 * 110 - 7 * 120)
+
+
+def test_lots_and_closed_positions():
+    ledger = PositionLedger()
+    ledger.apply(trade('AAPL', 3, 100.0, 'buy', 1))
+    ledger.apply(trade('AAPL', 5, 110.0, 'buy', 2))
+    ledger.apply(trade('AAPL', 4, 120.0, 'sell', 3))
+    assert ledger.lots('AAPL') == [{'quantity': 4, 'price': 110.0, 'transaction_id': 2}]
+
+    ledger.apply(trade('AAPL', 4, 90.0, 'sell', 4))
+    summary = ledger.summary()
+    assert summary['positions'] == {}
+    assert summary['realized_pnl'] == pytest.approx(3 * 20 + 1 * 10 - 4 * 20)
+    assert ledger.position('AAPL')['quantity'] == 0
+    assert ledger.position('MSFT') is None
+
+    with pytest.raises(ValueError):
+        PositionLedger('hifo')
+
+
+def test_rebuild_reconciles_with_owned_stocks():
+    ledger = PositionLedger()
+    ledger.rebuild([trade('AAPL', 2, 100.0, 'buy')], {'AAPL': {'quantity': 2, 'purchase_price': 100.0},
+                                                       'MSFT': {'quantity': 1, 'purchase_price': 50.0}})
+    assert ledger.position('AAPL')['cost_basis'] == 200.0
+    assert ledger.lots('MSFT') == [{'quantity': 1, 'price': 50.0, 'transaction_id': None}]
+
+    ledger.rebuild([trade('AAPL', 2, 100.0, 'buy')], {})
+    assert ledger.summary()['positions'] == {}
+
+
+@pytest.fixture
+def db(make_db):
+    database = make_db()
+    database.add_account_balance(100000)
+    yield database
+    database.close()
+
+
+def test_database_pnl(db, make_db):
+    db.add_transaction('AAPL', 10, 100.0, 'buy')
+    assert db.get_position('AAPL')['quantity'] == 10  # Builds the ledger
+    db.add_transaction('AAPL', 10, 120.0, 'buy')
+    db.add_transactions([('AAPL', 15, 130.0, 'sell'), ('MSFT', 2, 300.0, 'buy')])
+
+    position = db.get_position('AAPL', current_price=125.0)
+    assert position['quantity'] == db.list_owned_stocks()['AAPL']['quantity'] == 5
+    assert position['realized_pnl'] == pytest.approx(10 * 30 + 5 * 10)
+    assert position['unrealized_pnl'] == pytest.approx(5 * 5)
+
+    summary = db.get_portfolio_pnl({'AAPL': 125.0, 'MSFT': 310.0})
+    assert set(summary['positions']) == {'AAPL', 'MSFT'}
+    assert summary['unrealized_pnl'] == pytest.approx(25 + 20)
+    assert summary['total_pnl'] == pytest.approx(350 + 45)
+
+    # A fresh database replays the same ledger from the stored transactions
+    db.close()
+    reopened = make_db()
+    assert reopened.get_portfolio_pnl({'AAPL': 125.0, 'MSFT': 310.0}) == summary
+    reopened.clear_owned_stocks()
+    assert reopened.get_portfolio_pnl()['positions'] == {}
+    reopened.close()
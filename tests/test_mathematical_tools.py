@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.decision_maker.mathematical_tools import MathematicalTools, RATIOS, safe_divide
+
+
+@pytest.fixture
+def universe():
+    return pd.DataFrame({
+        'net_income': [5e9, 0.0, np.nan, -2e8],
+        'current_price': [150.0, 20.0, 30.0, 12.0],
+        'shareholder_equity': [5e10, 1e9, 2e9, 0.0],
+        'revenue': [4e10, 1e9, np.nan, 3e9],
+        'shares_outstanding': [1.6e10, 1e8, 2e8, 5e8],
+    }, index=['AAPL', 'ZERO', 'MISS', 'NEG'])
+
+def test_safe_divide_gives_nan_for_bad_denominators():
+    result = safe_divide([1.0, 2.0, 3.0, np.nan], [2.0, 0.0, np.nan, 4.0])
+    assert result[0] == 0.5
+    assert np.isnan(result[1:]).all()
+
+def test_batch_matches_scalar_versions(universe):
+    valuation = MathematicalTools.calculate_valuation_ratios_batch(universe)
+    profitability = MathematicalTools.calculate_profitability_ratios_batch(universe)
+
+    scalar = MathematicalTools.calculate_valuation_ratios({'net_income': 5e9}, {'current_price': 150.0})
+    assert valuation.loc['AAPL', 'P/E Ratio'] == pytest.approx(scalar['P/E Ratio'])
+    assert profitability.loc['ZERO', 'ROE'] == 0.0
+    assert np.isnan(valuation.loc['ZERO', 'P/E Ratio']) and np.isnan(valuation.loc['MISS', 'P/E Ratio'])
+    assert np.isnan(profitability.loc['NEG', 'ROE'])
+    assert list(profitability.index) == list(universe.index)
+
+def test_broad_ratio_set_accepts_dicts_of_arrays(universe):
+    data = {column: universe[column].to_numpy() for column in universe.columns}
+    ratios = MathematicalTools.calculate_ratios_batch(data)
+
+    assert set(ratios) == set(RATIOS)
+    assert ratios['Net Margin'][0] == pytest.approx(0.125)
+    assert ratios['P/B Ratio'][0] == pytest.approx(150.0 * 1.6e10 / 5e10)
+    assert ratios['EPS'][3] == pytest.approx(-0.4)
+    # No asset or liability columns given
+    assert np.isnan(ratios['Current Ratio']).all() and np.isnan(ratios['ROA']).all()
+
+    subset = MathematicalTools.calculate_ratios_batch(universe, ratios=['ROE', 'P/S Ratio'])
+    assert list(subset.columns) == ['ROE', 'P/S Ratio']
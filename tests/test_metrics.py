@@ -0,0 +1,221 @@
+import io
+import json
+import logging
+import threading
+import urllib.request
+import pytest
+from src.fetcher.abastract_fetcher import FinancialDataFetcher
+from src.fetcher.instrumented_fetcher import InstrumentedFinancialDataFetcher
+from src import metrics
+from src.bot.abstract_bot import TrackingTradingBot
+from src.metrics import MetricsRegistry, configure_logging, log_event, logger, start_metrics_server
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_counter_and_histogram(registry):
+    calls = registry.counter('calls_total', 'Calls')
+    calls.inc(endpoint='a')
+    calls.inc(2, endpoint='a')
+    calls.inc(endpoint='b')
+    assert calls.value(endpoint='a') == 3
+    assert calls.value(endpoint='missing') == 0
+    assert registry.counter('calls_total') is calls
+
+    latency = registry.histogram('latency_seconds', buckets=(0.1, 1.0))
+    for value in (0.05, 0.05, 0.5, 5.0):
+        latency.observe(value)
+    assert latency.count() == 4
+    assert latency.sum() == pytest.approx(5.6)
+    assert latency.quantile(0.5) == pytest.approx(0.1)
+    assert latency.quantile(0.6) == pytest.approx(0.1 + 0.9 * 0.4)
+    assert latency.quantile(1.0) == 1.0  # Above the largest bound
+
+    with pytest.raises(ValueError):
+        registry.histogram('calls_total')
+
+
+def test_buffered_observations_are_all_counted(registry, monkeypatch):
+    monkeypatch.setattr(metrics, 'FOLD_SIZE', 8)
+    latency = registry.histogram('latency_seconds', buckets=(0.1, 1.0))
+    stages = latency.group('stage', ('fetch', 'execute'))
+    assert latency.group('stage', ('fetch', 'execute')) is stages
+
+    def observe():
+        for _ in range(1000):
+            stages.observe(0.05, 0.5)
+            latency.observe(5.0, stage='execute')
+
+    threads = [threading.Thread(target=observe) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stages.observe(0.05, 0.05)  # Still buffered when read
+
+    assert latency.count(stage='fetch') == 4001
+    assert latency.sum(stage='fetch') == pytest.approx(4001 * 0.05)
+    assert latency.count(stage='execute') == 8001
+    lines = registry.render_prometheus().splitlines()
+    assert 'latency_seconds_bucket{stage="execute",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{stage="execute",le="1.0"} 4001' in lines
+
+
+def test_histogram_timer(registry):
+    latency = registry.histogram('latency_seconds')
+    with latency.time(stage='fetch'):
+        pass
+    with pytest.raises(KeyError):
+        with latency.time(stage='fetch'):
+            raise KeyError('boom')
+    assert latency.count(stage='fetch') == 2
+
+
+def test_render_prometheus(registry):
+    registry.counter('trades_total', 'Trades').inc(transaction_type='buy')
+    registry.counter('odd_total').inc(label='say "hi"\n')
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    latency.observe(0.05, operation='flush')
+    latency.observe(0.5, operation='flush')
+
+    lines = registry.render_prometheus().splitlines()
+    assert '# HELP trades_total Trades' in lines
+    assert '# TYPE trades_total counter' in lines
+    assert 'trades_total{transaction_type="buy"} 1' in lines
+    assert 'odd_total{label="say \\"hi\\"\\n"} 1' in lines
+    assert '# TYPE latency_seconds histogram' in lines
+    assert 'latency_seconds_bucket{operation="flush",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{operation="flush",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{operation="flush",le="+Inf"} 2' in lines
+    assert 'latency_seconds_sum{operation="flush"} 0.55' in lines
+    assert 'latency_seconds_count{operation="flush"} 2' in lines
+
+
+def test_metrics_server(registry):
+    registry.counter('trades_total').inc()
+    server = start_metrics_server(0, registry=registry)
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.server_port}/metrics') as response:
+            assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+            assert 'trades_total 1' in response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_structured_logs():
+    stream = io.StringIO()
+    handler = configure_logging(logging.DEBUG, stream)
+    try:
+        log_event('history_recorded', logging.INFO, timestamp='2024-01-01T09:30:00', symbol='AAPL')
+        record = json.loads(stream.getvalue())
+        assert record['event'] == 'history_recorded'
+        assert record['level'] == 'INFO'
+        assert record['symbol'] == 'AAPL'
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(logging.NOTSET)
+
+
+def test_database_instrumentation(make_db, tmp_path, registry):
+    db = make_db(metrics=registry)
+    db.add_account_balance(1000)
+    db.add_transaction('AAPL', 2, 100.0, 'buy')
+    db.add_transactions([('AAPL', 1, 110.0, 'sell'), ('MSFT', 1, 50.0, 'buy')])
+    with pytest.raises(ValueError):
+        db.add_transaction('AAPL', 100, 100.0, 'sell')
+    db.close()
+
+    operations = registry.histogram('tradingbot_db_operation_seconds')
+    assert operations.count(operation='load') == 1
+    assert operations.count(operation='add_transaction') == 2
+    assert operations.count(operation='add_transactions') == 1
+    assert registry.counter('tradingbot_db_operation_errors_total').value(operation='add_transaction') == 1
+    transactions = registry.counter('tradingbot_db_transactions_total')
+    assert transactions.value(transaction_type='buy') == 2
+    assert transactions.value(transaction_type='sell') == 1
+
+    # Every file write is counted with its size
+    written = registry.counter('tradingbot_storage_bytes_written_total')
+    for name in ('transactions.json', 'owned_stocks.json', 'owned_stocks_history.json', 'account_balance.json'):
+        assert written.value(target=name) > 0
+    assert written.value(target='transactions.json') >= (tmp_path / 'transactions.json').stat().st_size
+
+
+class StubFetcher(FinancialDataFetcher):
+    def fetch_income_statement(self, symbol):
+        return {'symbol': symbol}
+
+    def fetch_balance_sheet(self, symbol):
+        raise ConnectionError('provider down')
+
+    def fetch_stock_price_history(self, symbol):
+        return {}
+
+    def fetch_news_and_events(self, symbol):
+        return []
+
+    def fetch_analyst_reports(self, symbol):
+        return []
+
+    def set_api_keys(self, api_keys):
+        pass
+
+
+def test_fetcher_instrumentation(registry):
+    fetcher = InstrumentedFinancialDataFetcher(StubFetcher(), metrics=registry)
+    assert fetcher.fetch_income_statement('AAPL') == {'symbol': 'AAPL'}
+    with pytest.raises(ConnectionError):
+        fetcher.fetch_balance_sheet('AAPL')
+
+    calls = registry.counter('tradingbot_fetch_calls_total')
+    assert calls.value(fetcher='StubFetcher', endpoint='income_statement', outcome='ok') == 1
+    assert calls.value(fetcher='StubFetcher', endpoint='balance_sheet', outcome='error') == 1
+    assert registry.histogram('tradingbot_fetch_seconds').count(fetcher='StubFetcher', endpoint='balance_sheet') == 1
+
+
+class StubBot(TrackingTradingBot):
+    def fetch_current_data(self, symbol):
+        return {'symbol': symbol}
+
+    def analyze_stock_performance(self, data):
+        if data['symbol'] == 'FAIL':
+            raise ValueError('no data')
+        return data
+
+    def make_tracking_decision(self, analysis_results):
+        return 'hold'
+
+    def execute_trade(self, decision):
+        return decision
+
+
+def test_bot_stage_instrumentation(registry):
+    bot = StubBot({}, None)
+    bot.metrics = registry
+    bot.run_tracking_analysis('AAPL')
+    bot.run_portfolio_analysis(['MSFT', 'FAIL'], use_processes=False)
+
+    stages = registry.histogram('tradingbot_bot_stage_seconds')
+    assert stages.count(stage='fetch') == 3
+    assert stages.count(stage='execute') == 2
+    assert registry.counter('tradingbot_bot_stage_errors_total').value(stage='analyze') == 1
+
+def test_disabled_registry_skips_timing(make_db):
+    registry = MetricsRegistry(enabled=False)
+    bot = StubBot({}, None)
+    bot.metrics = registry
+    assert bot.run_tracking_analysis('AAPL') == 'hold'
+    result = bot.run_portfolio_analysis(['MSFT', 'FAIL'], use_processes=False)
+    assert result['timings']['fetch']['calls'] == 2 and list(result['errors']) == ['FAIL']
+    db = make_db(metrics=registry)
+    db.add_account_balance(1000)
+    db.close()
+
+    assert registry.histogram('tradingbot_bot_stage_seconds').count(stage='fetch') == 0
+    assert registry.histogram('tradingbot_db_operation_seconds').count(operation='add_account_balance') == 0
+    # Counters are still kept
+    assert registry.counter('tradingbot_bot_stage_errors_total').value(stage='analyze') == 1
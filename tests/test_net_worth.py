@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from src import net_worth
+from src.net_worth import forward_fill, net_worth_series
+
+
+def entry(timestamp, balance, **quantities):
+    return {
+        'timestamp': timestamp,
+        'account_balance': balance,
+        'owned_stocks': {symbol: {'quantity': quantity, 'purchase_price': 1.0} for symbol, quantity in quantities.items()}
+    }
+
+def test_forward_fill_keeps_leading_gaps():
+    prices = np.array([[np.nan, 1.0], [2.0, np.nan], [np.nan, np.nan], [3.0, 4.0]])
+    expected = np.array([[np.nan, 1.0], [2.0, 1.0], [2.0, 1.0], [3.0, 4.0]])
+    np.testing.assert_array_equal(forward_fill(prices), expected)
+
+def test_holdings_are_forward_filled_between_history_entries():
+    history = [
+        entry('2024-01-01T10:00:00', 1000.0, AAPL=2),
+        entry('2024-01-01T10:02:30', 500.0, AAPL=2, MSFT=5, TSLA=1),
+        entry('2024-01-01T10:04:00', 900.0)
+    ]
+    timestamps = [f'2024-01-01T10:0{minute}:00' for minute in range(6)]
+    timestamps[0] = '2024-01-01T09:59:00'
+    prices = np.array([
+        [10.0, np.nan],
+        [11.0, 100.0],
+        [12.0, np.nan],
+        [13.0, 101.0],
+        [14.0, 102.0],
+        [15.0, np.nan],
+    ])
+    series = net_worth_series(history, timestamps, ['AAPL', 'MSFT'], prices)
+
+    assert np.isnan(series[0])  # Before the first history entry
+    np.testing.assert_allclose(series[1:], [1022.0, 1024.0, 500.0 + 26.0 + 505.0, 900.0, 900.0])
+
+def test_unpriced_held_position_is_nan_and_shape_is_checked():
+    history = [entry('2024-01-01', 0.0, MSFT=1)]
+    series = net_worth_series(history, ['2024-01-02', '2024-01-03'], ['MSFT'], [[np.nan], [5.0]])
+    assert np.isnan(series[0]) and series[1] == 5.0
+
+    with pytest.raises(ValueError):
+        net_worth_series(history, ['2024-01-02'], ['MSFT', 'AAPL'], [[1.0]])
+
+def test_database_series_matches_calculate_net_worth(make_db):
+    db = make_db()
+    db.add_account_balance(10000)
+    db.add_transaction('AAPL', 10, 150.0, 'buy')
+    db.add_transaction('MSFT', 4, 300.0, 'buy')
+    db.add_transaction('AAPL', 3, 160.0, 'sell')
+    db.add_transaction('GOOG', 1, 100.0, 'buy')
+
+    prices = {'AAPL': 170.0, 'MSFT': 310.0}
+    now = np.datetime64(db.list_owned_stocks_history()[-1]['timestamp'], 'ns')
+    series = db.calculate_net_worth_series([now - np.timedelta64(1, 'D'), now], list(prices), [list(prices.values())] * 2)
+
+    assert np.isnan(series[0])
+    assert series[1] == pytest.approx(db.calculate_net_worth(prices))
+    db.close()
+
+def test_chunks_are_sized_by_the_element_budget(monkeypatch):
+    monkeypatch.setattr(net_worth, 'CHUNK_ELEMENTS', 7)  # Two rows of three symbols per chunk
+    history = [entry('2024-01-01T10:00:00', 100.0, A=1, C=2), entry('2024-01-01T10:03:00', 50.0, B=4)]
+    timestamps = [f'2024-01-01T10:0{minute}:00' for minute in range(5)]
+    prices = np.arange(15, dtype=np.float64).reshape(5, 3) + 1  # Row 3 is [10, 11, 12]
+    series = net_worth_series(history, timestamps, ['A', 'B', 'C'], prices)
+
+    assert series[2] == 100.0 + 1 * 7.0 + 2 * 9.0
+    assert series[3] == 50.0 + 4 * 11.0
+    np.testing.assert_allclose(series, [100.0 + 1 + 6, 100.0 + 4 + 12, 125.0, 94.0, 50.0 + 4 * 14.0])
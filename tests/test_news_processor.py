@@ -0,0 +1,144 @@
+import threading
+import time
+import pytest
+from src.bot.abstract_bot import TrackingTradingBot
+from src.decision_maker.base_decision_maker import BaseDecisionMaker
+from src.decision_maker.news_processor import NewsProcessor, article_fingerprint
+
+
+class CountingAnalyzer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, article):
+        self.calls.append(article['title'])
+        return {'sentiment': -0.8 if 'recall' in article['title'].lower() else 0.5}
+
+
+def article(title, url=None, **fields):
+    return {'title': title, 'url': url, **fields}
+
+
+def test_fingerprint_ignores_tracking_and_formatting():
+    assert article_fingerprint(article('A', 'https://www.news.com/story/?utm_source=x')) == \
+           article_fingerprint(article('B', 'http://news.com/story'))
+    assert article_fingerprint(article('Chip Maker Beats Estimates!', source='Wire')) == \
+           article_fingerprint(article('chip maker  beats estimates', source='wire'))
+    assert article_fingerprint(article('A', 'https://news.com/story?id=1')) != article_fingerprint(article('A', 'https://news.com/story?id=2'))
+
+
+def test_each_article_is_analyzed_once(tmp_path):
+    analyze = CountingAnalyzer()
+    processor = NewsProcessor(analyze, index_file=str(tmp_path / 'news_index.jsonl'))
+    merger = article('Chip merger announced', 'https://news.com/merger', tickers=['NVDA'])
+    recall = article('Car recall widens', 'https://news.com/recall')
+    results = processor.process({'AAPL': [merger], 'msft': [merger, recall]})
+
+    assert analyze.calls == ['Chip merger announced', 'Car recall widens']
+    assert set(results) == {'AAPL', 'MSFT', 'NVDA'}  # Tagged symbols get the score too
+    assert processor.sentiment('msft') == {'articles': 2, 'mean_sentiment': pytest.approx(-0.15),
+                                           'recent_sentiment': pytest.approx(0.5 + 0.2 * (-0.8 - 0.5)),
+                                           'positive': 1, 'negative': 1, 'neutral': 0}
+
+    # The next run only analyzes the new article; an old one fetched for a new symbol reuses its score
+    update = article('Chip demand rises', 'https://news.com/demand')
+    results = processor.process({'AAPL': [merger, update], 'MSFT': [merger, recall], 'TSLA': [recall]})
+    assert analyze.calls[2:] == ['Chip demand rises']
+    assert {symbol: [item['fingerprint'] for item in items] for symbol, items in results.items()} == \
+           {'AAPL': [article_fingerprint(update)], 'TSLA': [article_fingerprint(recall)]}
+    assert processor.sentiment('TSLA')['mean_sentiment'] == -0.8
+    assert processor.process({'AAPL': [merger]}) == {}
+
+    # The seen-index and the aggregates survive a restart without re-analyzing anything
+    restarted = NewsProcessor(CountingAnalyzer(), index_file=str(tmp_path / 'news_index.jsonl'))
+    assert restarted.summary() == processor.summary()
+    assert restarted.process({'AAPL': [merger, update]}) == {}
+    assert restarted.analyze.calls == []
+
+    restarted.reset()
+    assert restarted.summary() == {}
+    assert not (tmp_path / 'news_index.jsonl').exists()
+
+
+def test_concurrent_calls_analyze_an_article_once():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    def slow_analyze(item):
+        calls.append(item['title'])
+        started.set()
+        release.wait(5)
+        return 0.5
+    processor = NewsProcessor(slow_analyze)
+    merger = article('Chip merger announced', 'https://news.com/merger')
+    first = threading.Thread(target=processor.process, args=({'AAPL': [merger]},))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=processor.process, args=({'MSFT': [merger]},))
+    second.start()
+    release.set()
+    first.join()
+    second.join()
+    assert calls == ['Chip merger announced']
+    assert set(processor.summary()) == {'AAPL', 'MSFT'}
+
+
+def test_seen_index_is_capped_and_index_file_compacted(tmp_path):
+    index_file = tmp_path / 'news_index.jsonl'
+    processor = NewsProcessor(CountingAnalyzer(), index_file=str(index_file), max_articles=3)
+    stories = [article(f'Story {number}', f'https://news.com/{number}') for number in range(10)]
+    for story in stories:
+        for symbol in ('AAPL', 'MSFT', 'GOOG'):
+            processor.process({symbol: [story]})
+    assert list(processor.seen) == [article_fingerprint(story) for story in stories[-3:]]
+    assert len(index_file.read_text().splitlines()) <= 2 * 3 + 1
+    assert processor.sentiment('AAPL')['articles'] == 10
+
+    restarted = NewsProcessor(CountingAnalyzer(), index_file=str(index_file), max_articles=3)
+    assert restarted.summary() == processor.summary()
+    assert restarted.process({'AAPL': stories[-3:], 'TSLA': stories[-1:]}).keys() == {'TSLA'}
+    assert restarted.analyze.calls == []
+
+
+class NewsBot(TrackingTradingBot):
+    def fetch_current_data(self, symbol):
+        return {'symbol': symbol, 'news': [article('Chip merger announced', 'https://news.com/merger'),
+                                           article(f'{symbol} recall widens', f'https://news.com/{symbol}-recall')]}
+
+    def analyze_stock_performance(self, data):
+        return data['news_sentiment']
+
+    def make_tracking_decision(self, analysis_results):
+        return analysis_results
+
+    def execute_trade(self, decision):
+        return decision
+
+
+class SentimentDecisionMaker(BaseDecisionMaker):
+    def __init__(self):
+        self.calls = []
+
+    def analyze_financial_data(self, symbol, income_statement, balance_sheet, stock_price_history):
+        return {}
+
+    def analyze_news(self, symbol, recent_news):
+        self.calls.append(recent_news[0]['title'])
+        time.sleep(0.01)  # Long enough for the fetch threads to overlap
+        return {'sentiment': -0.8 if 'recall' in recent_news[0]['title'] else 0.5}
+
+    def generate_recommendations(self, symbol, metrics, news_analysis):
+        return 'hold'
+
+
+def test_bot_analyzes_each_article_once_across_symbols():
+    bot = NewsBot({}, None)
+    bot.decision_maker = SentimentDecisionMaker()
+    symbols = ['AAPL', 'MSFT', 'GOOG', 'TSLA']
+    run = bot.run_portfolio_analysis(symbols, fetch_workers=4, use_processes=False)
+
+    assert sorted(bot.decision_maker.calls) == sorted(['Chip merger announced'] + [f'{symbol} recall widens' for symbol in symbols])
+    assert run['errors'] == {}
+    assert {symbol: result['mean_sentiment'] for symbol, result in run['results'].items()} == \
+           {symbol: pytest.approx(-0.15) for symbol in symbols}
+    assert bot.run_tracking_analysis('AAPL')['articles'] == 2  # Nothing new to analyze or count
+    assert len(bot.decision_maker.calls) == 5
@@ -0,0 +1,91 @@
+import pytest
+from src.order_book import OrderBook
+
+
+@pytest.fixture
+def book(make_db):
+    db = make_db()
+    db.add_account_balance(10000.0)
+    db.add_transaction('AAPL', 20, 100.0, 'buy')
+    yield OrderBook(db)
+    db.close()
+
+
+def test_triggers(book):
+    buy_limit = book.place_order('AAPL', 'buy', 'limit', 5, 95.0)
+    sell_limit = book.place_order('AAPL', 'sell', 'limit', 5, 110.0)
+    stop_loss = book.place_order('AAPL', 'sell', 'stop', 5, 90.0)
+    take_profit = book.place_order('AAPL', 'sell', 'take_profit', 5, 120.0)
+    stop_buy = book.place_order('AAPL', 'buy', 'stop', 2, 115.0)
+
+    assert book.on_tick('AAPL', 100.0) == []
+    assert book.on_tick('MSFT', 1.0) == []
+    assert [order['id'] for order in book.on_tick('AAPL', 94.0)] == [buy_limit]
+    assert [order['id'] for order in book.on_tick('AAPL', 89.5)] == [stop_loss]
+    # One batch of ticks fills in tick order, at the tick price
+    fills = book.on_ticks([('AAPL', 112.0), ('AAPL', 125.0)])
+    assert [(order['id'], order['fill_price']) for order in fills] == [(sell_limit, 112.0), (stop_buy, 125.0), (take_profit, 125.0)]
+    assert book.open_orders() == []
+
+    transactions = book.database.list_transactions()[1:]
+    assert [(t['transaction_type'], t['price']) for t in transactions] == \
+           [('buy', 94.0), ('sell', 89.5), ('sell', 112.0), ('buy', 125.0), ('sell', 125.0)]
+    assert book.get_order(stop_buy)['transaction_id'] == transactions[3]['id']
+
+
+def test_reservations(book):
+    db = book.database
+    order_id = book.place_order('AAPL', 'buy', 'limit', 50, 100.0)  # Reserves 5000 of the 8000 balance
+    assert book.available_balance() == 3000.0
+    with pytest.raises(ValueError):
+        book.place_order('MSFT', 'buy', 'limit', 40, 100.0)
+    book.place_order('AAPL', 'sell', 'stop', 15, 80.0)
+    with pytest.raises(ValueError):
+        book.place_order('AAPL', 'sell', 'limit', 10, 150.0)  # Only 5 of the 20 shares are free
+    with pytest.raises(ValueError):
+        book.place_order('AAPL', 'buy', 'market', 1, 100.0)
+
+    assert book.cancel_order(order_id) is True
+    assert book.cancel_order(order_id) is False
+    assert book.available_balance() == db.get_account_balance()
+    assert book.available_quantity('AAPL') == 5
+    assert book.on_tick('AAPL', 50.0)[0]['quantity'] == 15  # The cancelled buy at 100 is skipped
+    assert book.reserved_quantities == {} and book.open_count == 0
+
+
+def test_gapped_buy_stop_never_spends_other_reservations(book):
+    limit = book.place_order('AAPL', 'buy', 'limit', 38, 90.0)  # Reserves 3420 of the 8000 balance
+    large_stop = book.place_order('AAPL', 'buy', 'stop', 40, 110.0)  # 4400, leaving 180
+    small_stop = book.place_order('AAPL', 'buy', 'stop', 1, 105.0)  # 105, leaving 75
+
+    # The price gaps over both stops: the spare 75 pays the small stop's extra 45, not the large one's 1600
+    assert [(order['id'], order['fill_price']) for order in book.on_tick('AAPL', 150.0)] == [(small_stop, 150.0)]
+    assert book.get_order(large_stop)['status'] == 'rejected' and 'gapped' in book.get_order(large_stop)['reason']
+    assert book.database.get_account_balance() == 7850.0
+    assert book.available_balance() == 7850.0 - 3420.0
+    assert book.on_tick('AAPL', 90.0)[0]['id'] == limit
+    assert book.database.get_account_balance() == 4430.0 and book.open_count == 0
+
+
+def test_rejects_fills_the_account_no_longer_covers(book):
+    first = book.place_order('AAPL', 'sell', 'limit', 10, 110.0)
+    second = book.place_order('AAPL', 'sell', 'limit', 10, 111.0)
+    book.database.add_transaction('AAPL', 15, 100.0, 'sell')  # Outside the order book
+    assert [order['id'] for order in book.on_tick('AAPL', 115.0)] == []
+    assert book.get_order(first)['status'] == 'rejected'
+    assert book.get_order(second)['status'] == 'rejected'
+
+    third = book.place_order('AAPL', 'sell', 'limit', 5, 120.0)
+    assert [order['id'] for order in book.on_tick('AAPL', 120.0)] == [third]
+
+
+def test_many_resting_orders(book):
+    book.database.add_account_balance(500000.0)
+    ids = [book.place_order('AAPL', 'buy', 'limit', 1, 50.0 + index / 1000) for index in range(5000)]
+    for order_id in ids[:3000]:
+        book.cancel_order(order_id)
+    assert sum(len(heap) for heap in book.heaps['AAPL']) < 5000  # Cancelled orders were compacted away
+    fills = book.on_tick('AAPL', 51.0)
+    assert len(fills) == 2000
+    assert fills[0]['id'] == ids[-1]  # Highest bid first
+    assert len(book.database.list_transactions()) == 2001
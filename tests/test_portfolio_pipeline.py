@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.bot.abstract_bot import TrackingTradingBot
+
+FETCH_DELAY = 0.05
+
+
+class RecordingDatabase:
+    """Stands in for TradingDatabase and notices if two trades ever run at once."""
+
+    def __init__(self):
+        self.trades = []
+        self.active = 0
+        self.overlapped = False
+        self.lock = threading.Lock()
+
+    def add_transaction(self, symbol, quantity, price, transaction_type):
+        with self.lock:
+            self.active += 1
+            self.overlapped |= self.active > 1
+        time.sleep(0.001)
+        self.trades.append((symbol, quantity, price, transaction_type))
+        with self.lock:
+            self.active -= 1
+
+
+class PipelineBot(TrackingTradingBot):
+    def fetch_current_data(self, symbol):
+        time.sleep(FETCH_DELAY)  # Network latency
+        if symbol == 'FAIL':
+            raise ConnectionError('provider down')
+        return {'symbol': symbol, 'prices': [float(index % 17) for index in range(2000)]}
+
+    def analyze_stock_performance(self, data):
+        assert self.database is None  # Analysis processes get the bot without its database
+        mean = sum(data['prices']) / len(data['prices'])
+        return {'symbol': data['symbol'], 'mean': mean, 'pid': os.getpid()}
+
+    def make_tracking_decision(self, analysis_results):
+        return {**analysis_results, 'action': 'buy' if analysis_results['mean'] > 7 else 'hold'}
+
+    def execute_trade(self, decision):
+        if decision['action'] == 'buy':
+            self.database.add_transaction(decision['symbol'], 1, decision['mean'], 'buy')
+        return decision
+
+def test_portfolio_analysis_pipelines_the_stages():
+    database = RecordingDatabase()
+    bot = PipelineBot({}, database)
+    symbols = [f'S{index}' for index in range(40)] + ['FAIL']
+
+    run = bot.run_portfolio_analysis(symbols, fetch_workers=10, analysis_workers=2, queue_size=4)
+
+    assert set(run['results']) == set(symbols) - {'FAIL'}
+    assert isinstance(run['errors']['FAIL'], ConnectionError)
+    assert run['results']['S3']['pid'] != os.getpid()
+    assert len(database.trades) == 40 and not database.overlapped
+
+    timings = run['timings']
+    assert timings['fetch']['calls'] == 40 and timings['execute']['calls'] == 40
+    assert timings['fetch']['mean_seconds'] >= FETCH_DELAY
+    # Sequentially the fetches alone would take 41 * FETCH_DELAY
+    assert timings['total_seconds'] < timings['fetch']['busy_seconds'] / 2
+
+def test_portfolio_analysis_can_analyze_on_threads():
+    class ThreadedBot(PipelineBot):
+        def analyze_stock_performance(self, data):
+            return {'symbol': data['symbol'], 'mean': 0.0, 'pid': os.getpid()}
+
+    database = RecordingDatabase()
+    run = ThreadedBot({}, database).run_portfolio_analysis(['A', 'B'], use_processes=False)
+    assert run['results']['A'] == {'symbol': 'A', 'mean': 0.0, 'pid': os.getpid(), 'action': 'hold'}
+    assert not run['errors'] and not database.trades
+
+def test_broken_analysis_pool_fails_the_remaining_symbols(monkeypatch):
+    class BreakingPool(ThreadPoolExecutor):
+        submitted = 0
+
+        def submit(self, *args):
+            BreakingPool.submitted += 1
+            if BreakingPool.submitted > 2:
+                raise BrokenProcessPool('A worker process died')
+            return super().submit(*args)
+    monkeypatch.setattr('src.bot.abstract_bot.ProcessPoolExecutor', BreakingPool)
+
+    class ThreadedBot(PipelineBot):
+        def analyze_stock_performance(self, data):
+            return {'symbol': data['symbol'], 'mean': 0.0}
+
+    symbols = [f'S{index}' for index in range(6)]
+    run = ThreadedBot({}, RecordingDatabase()).run_portfolio_analysis(symbols, fetch_workers=1, analysis_workers=1)
+    assert len(run['results']) == 2
+    assert len(run['errors']) == 4 and all(isinstance(error, BrokenProcessPool) for error in run['errors'].values())
@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import defaultdict, deque
+import pytest
+from src.fetcher.abastract_fetcher import FinancialDataFetcher
+from src.fetcher.rate_limiter import (RequestScheduler, ScheduledFinancialDataFetcher, SimulatedClock,
+                                      ThrottledError, TokenBucket)
+
+
+class SimulatedProvider(FinancialDataFetcher):
+    """
+    Stand-in provider that enforces a sliding-window limit per key on a simulated clock.
+
+    The scheduler calls a copy per key, so everything it records lives in shared containers.
+    """
+
+    def __init__(self, clock, requests_per_key, window, latency=0.1):
+        self.clock = clock
+        self.limit = requests_per_key
+        self.window = window
+        self.latency = latency
+        self.recent = defaultdict(deque)
+        self.log = []
+        self.rejections = []
+
+    @property
+    def rejected(self):
+        return len(self.rejections)
+
+    def set_api_keys(self, api_keys):
+        self.key = api_keys['sim']
+
+    def _fetch(self, endpoint, symbol):
+        now = self.clock.time()
+        recent = self.recent[self.key]
+        while recent and recent[0] <= now - self.window:
+            recent.popleft()
+        if len(recent) >= self.limit:
+            self.rejections.append((now, self.key))
+            raise ThrottledError(retry_after=recent[0] + self.window - now if recent else self.window)
+        recent.append(now)
+        self.clock.sleep(self.latency)
+        self.log.append((now, self.key, endpoint, symbol))
+        return f'{endpoint}:{symbol}'
+
+    def fetch_income_statement(self, symbol):
+        return self._fetch('income_statement', symbol)
+
+    def fetch_balance_sheet(self, symbol):
+        return self._fetch('balance_sheet', symbol)
+
+    def fetch_stock_price_history(self, symbol):
+        return self._fetch('stock_price_history', symbol)
+
+    def fetch_news_and_events(self, symbol):
+        return self._fetch('news_and_events', symbol)
+
+    def fetch_analyst_reports(self, symbol):
+        return self._fetch('analyst_reports', symbol)
+
+def make_fetcher(keys, key_limits, provider_limit=5, **kwargs):
+    clock = SimulatedClock()
+    provider = SimulatedProvider(clock, provider_limit, 60)
+    scheduler = RequestScheduler(keys, key_limits=key_limits, clock=clock, **kwargs)
+    return ScheduledFinancialDataFetcher(provider, 'sim', scheduler), provider, clock
+
+def test_token_bucket_refills_continuously():
+    clock = SimulatedClock()
+    bucket = TokenBucket(2, 10, clock)
+    bucket.acquire()
+    bucket.acquire()
+    assert bucket.wait_time() == pytest.approx(5)
+    clock.sleep(5)
+    assert bucket.wait_time() == 0
+
+    smooth = TokenBucket(2, 10, clock, burst=1)
+    smooth.acquire()
+    assert smooth.wait_time() == pytest.approx(5)
+
+def test_rotates_keys_at_the_sustained_limit_without_throttling():
+    # The provider counts requests in a sliding window, so requests are spread out rather than burst
+    fetcher, provider, clock = make_fetcher(['k1', 'k2', 'k3'], key_limits=[(5, 60, 1)])
+    results = fetcher.fetch_many([f'S{index}' for index in range(30)], ['stock_price_history', 'balance_sheet'])
+
+    assert results['S7']['balance_sheet'] == 'balance_sheet:S7'
+    assert provider.rejected == 0
+    assert fetcher.scheduler.stats()['requests_per_key'] == {'k1': 20, 'k2': 20, 'k3': 20}
+    # 15 requests per minute across three keys: one every 12 seconds on each key
+    assert clock.time() == pytest.approx(19 * 12, abs=1)
+
+def test_higher_priority_endpoints_run_first():
+    fetcher, provider, _ = make_fetcher(['k1'], key_limits=[(5, 60)])
+    fetcher.fetch_many(['AAPL', 'MSFT'], ['analyst_reports', 'income_statement', 'stock_price_history'])
+    assert [endpoint for _, _, endpoint, _ in provider.log] == (
+        ['stock_price_history'] * 2 + ['income_statement'] * 2 + ['analyst_reports'] * 2)
+
+def test_throttled_requests_back_off_and_move_to_other_keys():
+    # Configured more generously than the provider allows, so the provider throttles us
+    fetcher, provider, _ = make_fetcher(['k1', 'k2'], key_limits=[(10, 60)], backoff_base=2)
+    results = fetcher.fetch_many([f'S{index}' for index in range(24)], ['news_and_events'])
+
+    assert all(result == f'news_and_events:{symbol}' for symbol, result in ((s, r['news_and_events']) for s, r in results.items()))
+    stats = fetcher.scheduler.stats()
+    assert stats['throttled'] == provider.rejected > 0
+    assert stats['completed'] == 24 and stats['failed'] == 0
+    # Never more than the provider's 5 per minute on any key
+    for key in ('k1', 'k2'):
+        times = [now for now, used_key, _, _ in provider.log if used_key == key]
+        assert all(later - earlier >= 60 - 1e-9 for earlier, later in zip(times, times[5:]))
+
+def test_gives_up_after_max_retries():
+    fetcher, provider, _ = make_fetcher(['k1'], key_limits=[(10, 60)], provider_limit=0, max_retries=2)
+    with pytest.raises(ThrottledError):
+        fetcher.fetch_balance_sheet('AAPL')
+    assert provider.rejected == 3
+    assert fetcher.scheduler.stats()['failed'] == 1
+
+def test_keys_run_in_parallel_and_sleeps_release_the_lock():
+    with pytest.raises(ValueError):
+        RequestScheduler([])
+
+    running, overlapped, lock = set(), [], threading.Lock()
+    class SlowProvider(SimulatedProvider):
+        def _fetch(self, endpoint, symbol):
+            with lock:
+                overlapped.append(len(running))
+                running.add(self.key)
+            time.sleep(0.05)
+            with lock:
+                running.discard(self.key)
+            return f'{self.key}:{symbol}'
+
+    scheduler = RequestScheduler(['k1', 'k2', 'k3'], key_limits=[(100, 1)])
+    fetcher = ScheduledFinancialDataFetcher(SlowProvider(scheduler.clock, 100, 1), 'sim', scheduler)
+    started = time.perf_counter()
+    results = fetcher.fetch_many([f'S{index}' for index in range(6)], ['balance_sheet'], workers=3)
+    assert time.perf_counter() - started < 0.25  # Six 50 ms calls, three at a time
+    assert max(overlapped) == 2
+    assert {result['balance_sheet'].split(':')[0] for result in results.values()} == {'k1', 'k2', 'k3'}
+
+    # A request waiting for quota does not hold the lock, so other threads can still submit
+    slow = RequestScheduler(['k1'], key_limits=[(1, 0.3)])
+    slow.submit(lambda key: key)
+    slow.submit(lambda key: key)
+    runner = threading.Thread(target=slow.run)
+    runner.start()
+    time.sleep(0.05)
+    started = time.perf_counter()
+    slow.submit(lambda key: key)
+    assert time.perf_counter() - started < 0.05
+    runner.join()
+    assert slow.stats()['completed'] == 3
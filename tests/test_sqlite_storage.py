@@ -0,0 +1,91 @@
+import pytest
+from src.trading_database import TradingDatabase
+from src.storage.sqlite_storage import SQLiteStorage
+
+
+def open_db(tmp_path):
+    return TradingDatabase(storage=SQLiteStorage(str(tmp_path / 'trading.db')))
+
+@pytest.fixture
+def db(tmp_path):
+    db = open_db(tmp_path)
+    db.add_account_balance(100000.0)
+    yield db
+    db.close()
+
+def test_add_and_get_transaction(db):
+    transaction_id = db.add_transaction('AAPL', 10, 150.0, 'buy')
+
+    transaction = db.get_transaction(transaction_id)
+    assert transaction['symbol'] == 'AAPL'
+    assert transaction['quantity'] == 10
+    assert transaction['price'] == 150.0
+    assert db.get_transaction(999) is None
+    assert db.list_owned_stocks() == {'AAPL': {'quantity': 10, 'purchase_price': 150.0}}
+
+def test_state_survives_reopen(db, tmp_path):
+    db.add_transaction('AAPL', 10, 150.0, 'buy')
+    db.add_transaction('MSFT', 2, 300.0, 'buy')
+    db.add_transaction('AAPL', 10, 155.0, 'sell')
+    db.close()
+
+    new_db = open_db(tmp_path)
+    assert new_db.get_account_balance() == 100000.0 - 1500.0 - 600.0 + 1550.0
+    assert new_db.list_owned_stocks() == {'MSFT': {'quantity': 2, 'purchase_price': 300.0}}
+    assert [t['id'] for t in new_db.list_transactions()] == [1, 2, 3]
+    assert len(new_db.list_owned_stocks_history()) == 3
+    assert new_db.list_owned_stocks_history()[0]['owned_stocks'] == {'AAPL': {'quantity': 10, 'purchase_price': 150.0}}
+    assert new_db.add_transaction('MSFT', 1, 310.0, 'sell') == 4
+    new_db.close()
+
+def test_query_by_symbol_time_range_and_page(db):
+    for _ in range(5):
+        db.add_transaction('AAPL', 1, 100.0, 'buy')
+        db.add_transaction('MSFT', 1, 200.0, 'buy')
+
+    aapl = db.query_transactions(symbol='AAPL')
+    assert [t['id'] for t in aapl] == [1, 3, 5, 7, 9]
+    assert [t['id'] for t in db.query_transactions(symbol='AAPL', limit=2, offset=1)] == [3, 5]
+
+    transactions = db.list_transactions()
+    in_range = db.query_transactions(start=transactions[2]['timestamp'], end=transactions[4]['timestamp'])
+    assert [t['id'] for t in in_range] == [3, 4, 5]
+
+    history = db.query_owned_stocks_history(limit=3, offset=7)
+    assert len(history) == 3
+    assert history[-1]['owned_stocks']['MSFT']['quantity'] == 5
+
+def test_lookups_use_indexes(db):
+    plan = db.storage.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM transactions WHERE symbol = ? ORDER BY id", ('AAPL',)
+    ).fetchall()
+    assert any('idx_transactions_symbol' in row['detail'] for row in plan)
+
+def test_clear_data(db):
+    db.add_transaction('AAPL', 1, 100.0, 'buy')
+    db.clear_transactions()
+    db.clear_owned_stocks()
+    db.clear_owned_stocks_history()
+
+    assert db.list_transactions() == []
+    assert db.list_owned_stocks() == {}
+    assert db.list_owned_stocks_history() == []
+    assert db.add_transaction('AAPL', 1, 100.0, 'buy') == 1
+
+def test_failed_write_keeps_pending_writes_and_encoder_state(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'trading.db'), checkpoint_interval=3)
+    storage.autoflush = False  # As with group commit or the background writer
+    owned = {'AAPL': {'quantity': 1, 'purchase_price': 10.0}}
+    trade = {'id': 1, 'symbol': 'AAPL', 'quantity': 1, 'price': 10.0, 'transaction_type': 'buy', 'timestamp': '2024-01-01T10:00:00'}
+    storage.record_transaction(trade, owned, 90.0)
+    with pytest.raises(Exception):
+        storage.record_transaction(trade, {'AAPL': {'quantity': 2, 'purchase_price': 10.0}}, 80.0)  # Duplicate id
+    later = {**trade, 'id': 2, 'symbol': 'MSFT', 'timestamp': '2024-01-01T11:00:00'}
+    storage.record_transaction(later, {**owned, 'MSFT': {'quantity': 1, 'purchase_price': 10.0}}, 80.0)
+    storage.close()
+
+    reopened = SQLiteStorage(str(tmp_path / 'trading.db'))
+    assert [t['id'] for t in reopened.list_transactions()] == [1, 2]
+    # The failed write's history entry never reached the encoder, so the delta is against the stored entry
+    assert reopened.list_owned_stocks_history()[-1]['owned_stocks'] == {**owned, 'MSFT': {'quantity': 1, 'purchase_price': 10.0}}
+    reopened.close()